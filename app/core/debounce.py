@@ -0,0 +1,19 @@
+from typing import Literal, TypedDict
+
+class DebouncePolicy(TypedDict):
+    window: int
+    join: Literal["concat", "space", "last"]
+
+# Janela de agrupamento por estado (segundos).
+# - concat: junta sem separador (CPF digitado em pedaços: "123.456" + "789-09")
+# - space: junta com espaço (texto livre)
+# - last: fica só com a última mensagem ("oi" + "2" -> "2")
+DEBOUNCE_POLICIES = {
+    "MENU_APRESENTACAO": {"window": 3, "join": "last"},
+    "MENU_TIMEOUT_1": {"window": 3, "join": "last"},
+    "MENU_TIMEOUT_2": {"window": 3, "join": "last"},
+    "FGTS_AGUARDANDO_CPF": {"window": 4, "join": "concat"},
+    "FGTS_CPF_INVALIDO": {"window": 4, "join": "concat"},
+    "CLT_AGUARDANDO_CPF": {"window": 4, "join": "concat"},
+    "CLT_CPF_INVALIDO": {"window": 4, "join": "concat"},
+}
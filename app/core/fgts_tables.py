@@ -0,0 +1,41 @@
+import os
+import json
+import logging
+from typing import List, TypedDict
+
+logger = logging.getLogger(__name__)
+
+class FactaTable(TypedDict, total=False):
+    codigo: int
+    taxa: float
+    nome: str
+    saldo_min: float      # elegível a partir deste saldo bruto (padrão 0)
+    saldo_max: float      # elegível até este saldo bruto (padrão sem teto)
+
+# Tabelas FGTS da Facta simuladas em paralelo no /fgts/calculo.
+# Sobrescreva via .env com uma lista JSON no mesmo formato:
+# FACTA_FGTS_TABLES='[{"codigo": 62170, "taxa": 1.80, "nome": "Gold Preference"}, ...]'
+FACTA_FGTS_TABLES: List[FactaTable] = [
+    {"codigo": 62170, "taxa": 1.80, "nome": "Gold Preference"},
+]
+
+def load_tables() -> List[FactaTable]:
+    """Catálogo ativo (FACTA_FGTS_TABLES do .env ou o padrão acima)."""
+    raw = os.getenv("FACTA_FGTS_TABLES")
+    if not raw:
+        return FACTA_FGTS_TABLES
+
+    try:
+        tables = json.loads(raw)
+        if not tables or not all("codigo" in t and "taxa" in t for t in tables):
+            raise ValueError("cada tabela precisa de 'codigo' e 'taxa'")
+        return tables
+    except Exception as e:
+        logger.error(f"❌ [Tabelas FGTS] FACTA_FGTS_TABLES inválido ({e}). Usando o catálogo padrão.")
+        return FACTA_FGTS_TABLES
+
+def eligible_tables(tables: List[FactaTable], saldo_total: float) -> List[FactaTable]:
+    return [
+        t for t in tables
+        if t.get("saldo_min", 0) <= saldo_total <= t.get("saldo_max", float("inf"))
+    ]
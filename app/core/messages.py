@@ -0,0 +1,22 @@
+from typing import Dict, FrozenSet
+
+# Contrato entre o código e o catálogo de mensagens (Gist / messages.json):
+# variáveis que o código ENTREGA para cada mensagem (ver FGTSService -> CreditOffer.variables).
+# Um template só pode usar variáveis listadas aqui; mensagens fora do dict não recebem nenhuma.
+# Catálogos que quebram o contrato são rejeitados ao carregar.
+TEMPLATE_VARIABLES: Dict[str, FrozenSet[str]] = {
+    "com_saldo": frozenset({"valor", "banco"}),
+    "com_saldo_conta": frozenset({"valor", "dados_bancarios"}),
+    "aniversariante": frozenset({"data"}),
+    "retorno_desconhecido": frozenset({"erro"}),
+}
+
+# Chaves já usadas pelo código que ainda NÃO existem no Gist (fonte da verdade do texto).
+# O texto é do dono do conteúdo: até ele publicar no Gist, o build avisa em vez de reprovar
+# e o envio dessas mensagens é pulado (send_message loga o template ausente).
+# Remova a chave daqui assim que ela estiver no Gist.
+PENDING_CONTENT_KEYS: FrozenSet[str] = frozenset({
+    "requirements_fail",
+    "aniversariante",
+    "limite_excedido_fgts",
+})
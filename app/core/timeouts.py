@@ -1,8 +1,9 @@
 from typing import List, TypedDict, Literal
 
-class TimeoutStep(TypedDict):
-    delay_seconds: int
-    action: Literal["WARN", "KILL"]
+class TimeoutStep(TypedDict, total=False):
+    delay: int
+    action: Literal["TRANSITION", "KILL"]
+    new_state: str
     message_key: str
     tabulation_key: str | None
 
@@ -23,7 +24,7 @@ TIMEOUT_POLICES = {
         },
     "MENU_TIMEOUT_2":
         {
-            "delay_seconds": 18000, # 5 horas
+            "delay": 18000, # 5 horas
             "action": "KILL",
             "message_key": "timeout_finalizar",
             "tabulation_key": "SEM_RETORNO_DO_CLIENTE"
@@ -53,7 +54,8 @@ TIMEOUT_POLICES = {
         {
             "delay": 1800, # 30 minutos
             "action": "TRANSITION",
-            "message_key": ""
+            "new_state": "CPF_TIMEOUT",
+            "message_key": "timeout_1_cpf"
         }
     
 }
\ No newline at end of file
@@ -1,5 +1,6 @@
 import logging
 import os
+from typing import Iterator, List, Tuple
 from app.events.handlers import ClosedChatService, IncomingMessageService
 
 logger = logging.getLogger(__name__)
@@ -45,58 +46,83 @@ class EventDispatcher:
         return False
 
     @staticmethod
-    def should_filter_payload(payload: dict) -> bool:
+    def iter_events(payload: dict) -> Iterator[Tuple[str, dict]]:
         """
-        [NOVO MÉTODO PARA A API]
-        Analisa o payload BRUTO antes de enviar para o Celery.
+        Percorre TODOS os eventos do payload (a Huggy pode agrupar várias mensagens,
+        e vários tipos de evento, num único POST).
+        Gera tuplas (event_type, event_data).
+        """
+        messages = payload.get("messages") or {}
+        if not isinstance(messages, dict):
+            return
+
+        for event_type, content_list in messages.items():
+            if not isinstance(content_list, list):
+                logger.warning(f"⚠️ Conteúdo de {event_type} vazio ou inválido.")
+                continue
+            for event_data in content_list:
+                if isinstance(event_data, dict):
+                    yield event_type, event_data
 
+    @staticmethod
+    def should_ignore_event(event_type: str, event_data: dict) -> bool:
+        """
         Regra:
         - Se for 'receivedAllMessage': APLICA os filtros acima.
         - Se for 'closedChat' (ou outros): ACEITA TUDO (Retorna False)
         """
-        try:
-            messages = payload.get("messages", {})
-            if not messages: return True
-
-            event_type = next(iter(messages))
-
-            if event_type == "receivedAllMessage":
-                content_list = messages.get(event_type, [])
-                if not content_list: return True
+        if event_type == "receivedAllMessage":
+            return EventDispatcher.shoud_ignore_event_data(event_data)
+        return False
 
-                event_data = content_list[0]
-                return EventDispatcher.shoud_ignore_event_data(event_data)
-            
-            return False
-        
+    @staticmethod
+    def split_payload(payload: dict) -> List[dict]:
+        """
+        [MÉTODO DA API]
+        Quebra o payload BRUTO em payloads de UM evento cada, já filtrados,
+        no mesmo formato da Huggy: {"messages": {event_type: [event_data]}}.
+        Cada evento vira uma task (e vai para a fila-shard do seu chat).
+        """
+        try:
+            return [
+                {"messages": {event_type: [event_data]}}
+                for event_type, event_data in EventDispatcher.iter_events(payload)
+                if not EventDispatcher.should_ignore_event(event_type, event_data)
+            ]
         except Exception as e:
             logger.error(f"⚠️ Erro ao pré-filtrar payload: {e}")
-            return False
+            return [payload]
+
+    @staticmethod
+    def should_filter_payload(payload: dict) -> bool:
+        """
+        Analisa o payload BRUTO antes de enviar para o Celery.
+        Retorna True se NENHUM evento do payload deve ser processado.
+        """
+        return not EventDispatcher.split_payload(payload)
 
     @staticmethod
     def dispatch(payload: dict):
-        messages = payload.get("messages", {})
-        if not messages:
+        """
+        Processa todos os eventos do payload, na ordem em que chegaram.
+        (Payloads novos trazem 1 evento; tasks antigas ainda na fila podem trazer vários.)
+        """
+        if not payload.get("messages"):
             logger.warning("⚠️ Payload recebido sem bloco 'messages'. Ignorando.")
-            return 
-        
-        event_type = next(iter(messages))
-        logger.info(f"🔀 [Dispatcher] Roteando evento: {event_type}")
-
+            return
 
-        content_list = messages.get(event_type, [])
+        services = {}
+        for event_type, event_data in EventDispatcher.iter_events(payload):
+            logger.info(f"🔀 [Dispatcher] Roteando evento: {event_type}")
+            EventDispatcher._dispatch_event(event_type, event_data, services)
 
-        if not content_list or not isinstance(content_list, list):
-            logger.warning(f"⚠️ Conteúdo de {event_type} vazio ou inválido.")
-            return
-        
-        event_data = content_list[0]
-        
+    @staticmethod
+    def _dispatch_event(event_type: str, event_data: dict, services: dict):
         if event_type == "closedChat":
             chat_id = event_data.get("id", {})
-            service = ClosedChatService()
+            service = services.get(event_type) or services.setdefault(event_type, ClosedChatService())
             service.handle(chat_id)
-            
+
         elif event_type == "receivedAllMessage":
             if EventDispatcher.shoud_ignore_event_data(event_data):
                 return
@@ -104,9 +130,8 @@ class EventDispatcher:
             chat_id = event_data.get('chat', {}).get('id')
             logger.info(f"💬 [Dispatcher] Mensagem APROVADA para Chat ID: {chat_id}")
 
-            service = IncomingMessageService()
+            service = services.get(event_type) or services.setdefault(event_type, IncomingMessageService())
             service.handle(event_data)
-    
+
         else:
             logger.info(f"💤 Evento '{event_type}' não mapeado para ação. Ignorando.")
-    
\ No newline at end of file
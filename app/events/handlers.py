@@ -1,6 +1,10 @@
 import logging
 from app.services.bot.memory.session import SessionManager
+from app.services.bot.memory.debounce import MessageDebouncer
+from app.services.bot.effects import DeferredHuggy
+from app.services.bot.outbox import Outbox
 from app.integrations.huggy.service import HuggyService
+from app.infrastructure.timers import TimerService
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +15,9 @@ class ClosedChatService:
     def __init__(self):
         self.session = SessionManager()
         self.huggy = HuggyService()
+        self.timers = TimerService()
+        self.debouncer = MessageDebouncer()
+        self.outbox = Outbox()
     
     def handle(self, chat_id: int):
         """
@@ -22,14 +29,19 @@ class ClosedChatService:
         
         logger.info(f"📉 [ClosedChatService] Iniciando rotina para Chat ID: {chat_id}")
 
-        self.session.clear_session(chat_id)
+        # Sessão apagada + outbox do chat trocada pela saída do workflow, num único passo:
+        # mensagens e fechamentos ainda na fila não vão para um chat já fechado
+        chat_session = self.session.load(chat_id)
+        DeferredHuggy(chat_session, self.huggy, priority="low").remove_from_workflow(chat_id)
+        chat_session.close()
 
-        success = self.huggy.remove_from_workflow(chat_id)
+        self.timers.cancel("inactivity", chat_id)
+        # Mensagens ainda na janela de debounce reabririam o chat no START
+        self.timers.cancel("debounce", chat_id)
+        self.debouncer.discard(chat_id)
 
-        if success:
-            logger.info(f"✅ [ClosedChatService] Rotina finalizada com sucesso para Chat {chat_id}.")
-        else:
-            logger.warning(f"⚠️ [ClosedChatService] Rotina finalizada, mas API Huggy retornou erro/falha.")
+        self.outbox.dispatch(chat_id)
+        logger.info(f"✅ [ClosedChatService] Rotina finalizada para Chat {chat_id} (saída do workflow na outbox).")
     
 class IncomingMessageService:
     """
@@ -39,6 +51,8 @@ class IncomingMessageService:
     def __init__(self):
         from app.services.bot.engine import BotEngine
         self.engine = BotEngine()
+        self.debouncer = MessageDebouncer()
+        self.timers = TimerService()
     
     def handle(self, event_data: dict):
         """
@@ -53,4 +67,27 @@ class IncomingMessageService:
         
         logger.info(f"📨 [MessageService] Processando msg no Chat {chat_id}: '{message_text}'")
 
+        if self.debouncer.enabled:
+            policy = self.debouncer.policy_for(self.engine.session.get_state(chat_id))
+            if policy:
+                token = self.debouncer.buffer(chat_id, message_text, policy)
+                # Reagenda o flush do chat: só o timer da última mensagem dispara
+                self.timers.schedule("debounce", chat_id, policy["window"], [chat_id, token, policy["join"]])
+                logger.info(f"⏳ [MessageService] Chat {chat_id}: msg no buffer (janela {policy['window']}s).")
+                return
+
+        self.engine.process(chat_id, message_text)
+
+    def flush(self, chat_id: int, token: int, join: str):
+        """
+        Fim da janela de debounce: entrega ao Engine UMA entrada com as mensagens agrupadas.
+        """
+        messages = self.debouncer.drain(chat_id, token)
+        if messages is None:
+            logger.debug(f"💨 [MessageService] Chat {chat_id}: buffer já entregue ou mensagem mais nova pendente.")
+            return
+
+        message_text = self.debouncer.coalesce(messages, join)
+        logger.info(f"📦 [MessageService] Chat {chat_id}: {len(messages)} msg(s) agrupada(s) -> '{message_text}'")
+
         self.engine.process(chat_id, message_text)
\ No newline at end of file
@@ -1,13 +1,20 @@
 import os
 from celery import Celery
-from celery.signals import setup_logging, worker_process_init
+from celery.signals import setup_logging, worker_init, worker_process_init, worker_process_shutdown
 from dotenv import load_dotenv
 from app.core.logger import setup_logging as configure_custom_logging
+from app.infrastructure.http_clients import HttpClientRegistry
+from app.infrastructure.routing import route_task
+from app.integrations.facta.auth import FactaAuth
+from app.services.bot.content.message_loader import MessageLoader
+from app.utils.validators import cpf_hash_secret
 
 load_dotenv()
 
 BROKEN_URL = os.getenv("CELERY_BROKEN_URL")
 BACKEND_URL = os.getenv("CELERY_RESULT_BACKEND")
+TIMER_SWEEP_INTERVAL = float(os.getenv("TIMER_SWEEP_INTERVAL", "1"))
+OUTBOX_SWEEP_INTERVAL = float(os.getenv("OUTBOX_SWEEP_INTERVAL", "10"))
 
 # --- CONEXÃO DO BETTER STACK ---
 @setup_logging.connect
@@ -15,17 +22,48 @@ def config_loggers(*args, **kwargs):
     configure_custom_logging()
 # -------------------------------
 
+# --- SEGREDO DO HASH DO CPF (sem ele o worker não sobe) ---
+@worker_init.connect
+def check_cpf_hash_secret(*args, **kwargs):
+    cpf_hash_secret()
+# ----------------------------------------------------------
+
 @worker_process_init.connect
 def init_worker_logger(*args, **kwargs):
     configure_custom_logging()
 
+# --- CATÁLOGO DE MENSAGENS (pub/sub, 1 listener por processo) ---
+@worker_process_init.connect
+def init_worker_message_listener(*args, **kwargs):
+    MessageLoader.start_listener()
+# -----------------------------------------------------------------
+
+# --- TOKEN FACTA (cache por processo; a thread de renovação não sobrevive ao fork) ---
+@worker_process_init.connect
+def init_worker_facta_token(*args, **kwargs):
+    FactaAuth.reset_cache()
+# -----------------------------------------------------------------
+
+# --- POOLS HTTP (1 por processo) ---
+@worker_process_init.connect
+def init_worker_http_clients(*args, **kwargs):
+    HttpClientRegistry.reset_after_fork()
+    HttpClientRegistry.warm_up()
+
+@worker_process_shutdown.connect
+def close_worker_http_clients(*args, **kwargs):
+    HttpClientRegistry.close_all()
+# -----------------------------------
+
 celery_app = Celery(
     "worker",
     broker=BROKEN_URL,
     backend=BACKEND_URL,
     include=[
         "app.tasks.processor",
-        "app.tasks.monitor"
+        "app.tasks.monitor",
+        "app.tasks.timers",
+        "app.tasks.outbox"
     ],
 )
 
@@ -35,7 +73,22 @@ celery_app.conf.update(
     task_time_limit=120,      # Mata a task se demorar mais de 120s (evita zumbis)
     task_soft_time_limit=110,
     worker_prefetch_multiplier=1, # Garante que tasks longas não travem tasks rápidas
-    task_routes={
-        "process_webhook_event": {"queue": "main-queue"},
-    }
+    task_default_queue="main-queue",
+    # Afinidade por chat: hash consistente do chat.id -> main-queue-{shard}
+    # (CELERY_QUEUE_SHARDS=1 mantém tudo na 'main-queue')
+    task_routes=(route_task,),
+    # Timers (inatividade, debounce) ficam num ZSET do Redis; o Beat só varre os vencidos
+    beat_schedule={
+        "sweep-timers": {
+            "task": "sweep_timers",
+            "schedule": TIMER_SWEEP_INTERVAL,
+            "options": {"expires": TIMER_SWEEP_INTERVAL * 5},
+        },
+        # Outbox da Huggy: redrena chats com comandos parados
+        "sweep-outbox": {
+            "task": "sweep_outbox",
+            "schedule": OUTBOX_SWEEP_INTERVAL,
+            "options": {"expires": OUTBOX_SWEEP_INTERVAL * 5},
+        },
+    },
 )
\ No newline at end of file
@@ -0,0 +1,236 @@
+import os
+import math
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Tuple
+import httpx
+from app.infrastructure.metrics import Metrics
+from app.infrastructure.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(httpx.TransportError):
+    """
+    Circuito aberto: a chamada nem foi feita.
+    É um httpx.TransportError de propósito: cai nos mesmos tratamentos de "API fora"
+    (ERRO_TECNICO na Facta, autoretry_for=httpx.HTTPError nas tasks da Huggy).
+    """
+
+class CircuitBreaker:
+    """
+    Circuit breaker + timeout adaptativo por endpoint, com o estado no Redis
+    (API e todos os workers enxergam o mesmo circuito).
+
+    Layout (circuit:{serviço}:{endpoint}):
+        :calls:{fatia}  HASH ok/fail por fatia de tempo (janela deslizante de {PREFIX}_CIRCUIT_WINDOW s)
+        :latency        LIST latências recentes (ms), base do p99
+        :open           existe = ABERTO (TTL = {PREFIX}_CIRCUIT_OPEN_SECONDS)
+        :tripped        existe sem :open = MEIO-ABERTO: uma única chamada de teste (:probe) passa
+
+    Abre quando a taxa de falha da janela passa de {PREFIX}_CIRCUIT_ERROR_RATE (com pelo menos
+    {PREFIX}_CIRCUIT_MIN_CALLS chamadas). Falha = erro de transporte (timeout, conexão) ou HTTP 5xx.
+
+    Timeout de leitura = p99 observado x {PREFIX}_TIMEOUT_P99_MULTIPLIER, entre {PREFIX}_TIMEOUT_MIN
+    e o timeout fixo configurado do endpoint (teto). Sem amostras suficientes, usa o teto.
+
+    Falha no Redis = circuito fechado e timeout fixo (fail-open).
+    """
+    KEY_PREFIX = "circuit"
+    SLICE_SECONDS = 10
+    LATENCY_SAMPLES = 200
+    MIN_LATENCY_SAMPLES = 20
+    LATENCY_REFRESH_SECONDS = 10.0
+
+    _instances: Dict[Tuple[str, str], "CircuitBreaker"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, service: str, endpoint: str, max_timeout: float, env_prefix: str = None):
+        self.service = service
+        self.endpoint = endpoint
+        self.max_timeout = max_timeout
+
+        prefix = env_prefix or service.upper()
+        self.enabled = os.getenv(f"{prefix}_CIRCUIT", "true").lower() in ("1", "true", "yes")
+        self.error_rate = float(os.getenv(f"{prefix}_CIRCUIT_ERROR_RATE", "0.5"))
+        self.min_calls = int(os.getenv(f"{prefix}_CIRCUIT_MIN_CALLS", "10"))
+        self.window = int(os.getenv(f"{prefix}_CIRCUIT_WINDOW", "60"))
+        self.open_seconds = int(os.getenv(f"{prefix}_CIRCUIT_OPEN_SECONDS", "30"))
+        self.p99_multiplier = float(os.getenv(f"{prefix}_TIMEOUT_P99_MULTIPLIER", "1.5"))
+        self.min_timeout = min(float(os.getenv(f"{prefix}_TIMEOUT_MIN", "2")), max_timeout)
+
+        self._timeout = max_timeout
+        self._timeout_at = 0.0
+
+    @classmethod
+    def for_endpoint(cls, service: str, endpoint: str, max_timeout: float) -> "CircuitBreaker":
+        """Instância do processo para o endpoint (guarda o p99 em memória entre chamadas)."""
+        key = (service, endpoint)
+        breaker = cls._instances.get(key)
+        if breaker is None or breaker.max_timeout != max_timeout:
+            with cls._instances_lock:
+                breaker = cls._instances.get(key)
+                if breaker is None or breaker.max_timeout != max_timeout:
+                    breaker = cls(service, endpoint, max_timeout)
+                    cls._instances[key] = breaker
+        return breaker
+
+    @classmethod
+    def reset_instances(cls):
+        """Esquece configuração e p99 em memória (testes e pós-fork)."""
+        with cls._instances_lock:
+            cls._instances = {}
+
+    @classmethod
+    def tripped(cls) -> List[str]:
+        """Circuitos abertos ou meio-abertos agora: ['facta:fgts/saldo', ...] (/admin/metrics)."""
+        redis_client = get_redis(decode_responses=True)
+        suffix = ":tripped"
+        return sorted(
+            key[len(cls.KEY_PREFIX) + 1:-len(suffix)]
+            for key in redis_client.scan_iter(match=f"{cls.KEY_PREFIX}:*{suffix}", count=500)
+        )
+
+    @property
+    def name(self) -> str:
+        return f"{self.service}:{self.endpoint}"
+
+    def _key(self, suffix: str) -> str:
+        return f"{self.KEY_PREFIX}:{self.name}:{suffix}"
+
+    def _slice(self, now: float) -> int:
+        return int(now // self.SLICE_SECONDS)
+
+    # --- Timeout adaptativo ---
+
+    def _timeout_from_samples(self, samples: list) -> float:
+        if len(samples) < self.MIN_LATENCY_SAMPLES:
+            return self.max_timeout
+        latencies = sorted(float(sample) for sample in samples)
+        p99 = latencies[max(math.ceil(len(latencies) * 0.99) - 1, 0)] / 1000
+        return min(max(p99 * self.p99_multiplier, self.min_timeout), self.max_timeout)
+
+    def timeout(self) -> float:
+        """Timeout de leitura atual do endpoint (segundos)."""
+        return self._timeout
+
+    # --- Estado ---
+
+    def _admit(self) -> float:
+        """
+        Decide se a chamada pode sair (1 round trip; 2 no meio-aberto).
+        Retorna o timeout a usar ou levanta CircuitOpenError.
+        """
+        redis_client = get_redis()
+        refresh = time.monotonic() - self._timeout_at >= self.LATENCY_REFRESH_SECONDS
+
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.exists(self._key("open"))
+        pipe.exists(self._key("tripped"))
+        if refresh:
+            pipe.lrange(self._key("latency"), 0, -1)
+        results = pipe.execute()
+
+        if refresh:
+            self._timeout = self._timeout_from_samples(results[2])
+            self._timeout_at = time.monotonic()
+
+        if results[0] == 1:
+            raise CircuitOpenError(f"Circuito {self.name} aberto")
+        if results[1] == 1:
+            # Meio-aberto: só quem pegar o :probe testa a API; o resto continua falhando rápido
+            if not redis_client.set(self._key("probe"), 1, nx=True, ex=max(math.ceil(self.max_timeout), 1)):
+                raise CircuitOpenError(f"Circuito {self.name} em teste")
+            logger.info(f"🔌 [Circuit] {self.name} meio-aberto: enviando chamada de teste.")
+        return self._timeout
+
+    def _record(self, ok: bool, elapsed: float):
+        now = time.time()
+        current = self._slice(now)
+        slices = range(current - self.window // self.SLICE_SECONDS + 1, current + 1)
+        redis_client = get_redis()
+
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(self._key(f"calls:{current}"), "ok" if ok else "fail", 1)
+        pipe.expire(self._key(f"calls:{current}"), self.window + self.SLICE_SECONDS)
+        pipe.lpush(self._key("latency"), round(elapsed * 1000, 3))
+        pipe.ltrim(self._key("latency"), 0, self.LATENCY_SAMPLES - 1)
+        if ok:
+            pipe.delete(self._key("tripped"), self._key("probe"))
+        else:
+            for index in slices:
+                pipe.hmget(self._key(f"calls:{index}"), "ok", "fail")
+            pipe.exists(self._key("tripped"))
+        results = pipe.execute()
+
+        if ok:
+            if results[-1]:
+                # Fechou: as falhas da janela antiga não podem reabrir o circuito na hora
+                redis_client.delete(*[self._key(f"calls:{index}") for index in slices])
+                logger.info(f"✅ [Circuit] {self.name} respondeu de novo. Circuito fechado.")
+            return
+
+        was_tripped = results[-1] == 1
+        windows = results[4:-1]
+        total_ok = sum(int(ok_count or 0) for ok_count, _ in windows)
+        total_fail = sum(int(fail_count or 0) for _, fail_count in windows)
+        total = total_ok + total_fail
+
+        if was_tripped or (total >= self.min_calls and total_fail / total >= self.error_rate):
+            self._trip(total_fail, total, was_tripped)
+
+    def _trip(self, failures: int, total: int, reopening: bool):
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.set(self._key("open"), 1, ex=self.open_seconds)
+        pipe.set(self._key("tripped"), 1)
+        pipe.delete(self._key("probe"))
+        Metrics.incr(f"circuit_open:{self.name}", pipe=pipe)
+        pipe.execute()
+
+        if reopening:
+            logger.warning(f"🚧 [Circuit] {self.name} falhou na chamada de teste. Aberto por mais {self.open_seconds}s.")
+        else:
+            logger.warning(f"🚧 [Circuit] {self.name} ABERTO: {failures}/{total} falhas em {self.window}s. Falhando rápido por {self.open_seconds}s.")
+
+    # --- Chamada ---
+
+    def call(self, send: Callable[[float], httpx.Response], before: Callable[[], None] = None) -> httpx.Response:
+        """
+        Executa 'send(timeout)' sob o circuito. 'send' recebe o timeout de leitura adaptativo.
+        'before' roda depois da admissão e fora da medição de latência (ex: rate limit).
+        Circuito aberto -> CircuitOpenError sem chamar a API.
+        """
+        if not self.enabled:
+            if before is not None:
+                before()
+            return send(self.max_timeout)
+
+        try:
+            timeout = self._admit()
+        except CircuitOpenError:
+            Metrics.incr(f"circuit_rejected:{self.name}")
+            raise
+        except Exception as e:
+            logger.debug(f"⚠️ [Circuit] Falha ao ler estado de {self.name}, seguindo sem circuito: {e}")
+            timeout = self.max_timeout
+
+        if before is not None:
+            before()
+
+        started = time.monotonic()
+        try:
+            response = send(timeout)
+        except httpx.TransportError:
+            self._safe_record(False, time.monotonic() - started)
+            raise
+
+        status_code = getattr(response, "status_code", None)
+        server_error = isinstance(status_code, int) and status_code >= 500
+        self._safe_record(not server_error, time.monotonic() - started)
+        return response
+
+    def _safe_record(self, ok: bool, elapsed: float):
+        try:
+            self._record(ok, elapsed)
+        except Exception as e:
+            logger.debug(f"⚠️ [Circuit] Falha ao registrar chamada de {self.name}: {e}")
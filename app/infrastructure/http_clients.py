@@ -0,0 +1,95 @@
+import os
+import logging
+import threading
+from typing import Callable, Dict
+import httpx
+
+logger = logging.getLogger(__name__)
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def build_limits(prefix: str) -> httpx.Limits:
+    """
+    Monta os limites do pool a partir do .env (ex: HUGGY_HTTP_MAX_CONNECTIONS).
+    """
+    return httpx.Limits(
+        max_connections=int(os.getenv(f"{prefix}_HTTP_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv(f"{prefix}_HTTP_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv(f"{prefix}_HTTP_KEEPALIVE_EXPIRY", "60")),
+    )
+
+def use_http2(prefix: str) -> bool:
+    """
+    HTTP/2 é opcional: só liga se a flag estiver ativa E o pacote 'h2' estiver instalado.
+    """
+    enabled = os.getenv(f"{prefix}_HTTP2", "false").lower() in ("1", "true", "yes")
+    if enabled and not _http2_available():
+        logger.warning(f"⚠️ [HTTP] {prefix}_HTTP2 ativo, mas o pacote 'h2' não está instalado. Usando HTTP/1.1.")
+        return False
+    return enabled
+
+class HttpClientRegistry:
+    """
+    Guarda UM httpx.Client de longa duração por integração, por processo (worker).
+    Evita abrir um novo handshake TCP/TLS a cada chamada de API.
+
+    Ciclo de vida:
+    - Criado no 'worker_process_init' (após o fork do Celery) ou sob demanda.
+    - Fechado no 'worker_process_shutdown'.
+    """
+    _factories: Dict[str, Callable[[], httpx.Client]] = {}
+    _clients: Dict[str, httpx.Client] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, name: str, factory: Callable[[], httpx.Client]):
+        """Registra a fábrica de um cliente (não cria a conexão ainda)."""
+        cls._factories[name] = factory
+
+    @classmethod
+    def get(cls, name: str) -> httpx.Client:
+        client = cls._clients.get(name)
+        if client is not None and not client.is_closed:
+            return client
+
+        with cls._lock:
+            client = cls._clients.get(name)
+            if client is None or client.is_closed:
+                factory = cls._factories.get(name)
+                if factory is None:
+                    raise KeyError(f"Cliente HTTP '{name}' não registrado.")
+                client = factory()
+                cls._clients[name] = client
+                logger.info(f"🔌 [HTTP] Pool '{name}' criado para este processo.")
+            return client
+
+    @classmethod
+    def warm_up(cls):
+        """Cria todos os clientes registrados. Chamado no início de cada worker."""
+        for name in list(cls._factories):
+            cls.get(name)
+
+    @classmethod
+    def reset_after_fork(cls):
+        """
+        Descarta (sem fechar) clientes herdados do processo pai.
+        Sockets copiados pelo fork não podem ser compartilhados entre processos.
+        """
+        cls._clients = {}
+        cls._lock = threading.Lock()
+
+    @classmethod
+    def close_all(cls):
+        with cls._lock:
+            for name, client in cls._clients.items():
+                try:
+                    client.close()
+                    logger.info(f"🔌 [HTTP] Pool '{name}' encerrado.")
+                except Exception as e:
+                    logger.warning(f"⚠️ [HTTP] Erro ao fechar pool '{name}': {e}")
+            cls._clients = {}
@@ -0,0 +1,94 @@
+import os
+import hashlib
+import logging
+from typing import List, Tuple
+from app.infrastructure.metrics import Metrics
+from app.infrastructure.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+class WebhookDeduplicator:
+    """
+    Índice de idempotência dos webhooks da Huggy (reentregas após resposta lenta).
+
+    Chave preferencial: ID da mensagem da Huggy.
+    Fallback (sem ID): chat.id + hash do corpo, com TTL curto para não engolir
+    uma resposta repetida de propósito pelo cliente ("1", "1").
+
+    Custo: 1 SET NX EX (+ contador no mesmo pipeline) = 1 round trip.
+    """
+    KEY_PREFIX = "webhook:seen"
+
+    def __init__(self):
+        self.redis_client = get_redis()
+        self.ttl = int(os.getenv("WEBHOOK_DEDUP_TTL", "600"))
+        self.fallback_ttl = int(os.getenv("WEBHOOK_DEDUP_FALLBACK_TTL", "30"))
+
+    def fingerprint(self, event_type: str, event_data: dict):
+        """Retorna (chave, ttl) do evento, ou (None, 0) se não houver como identificar."""
+        if event_type == "closedChat":
+            chat_id = event_data.get("id")
+            return (f"{self.KEY_PREFIX}:closed:{chat_id}", self.ttl) if chat_id else (None, 0)
+
+        message_id = event_data.get("id")
+        if message_id:
+            return f"{self.KEY_PREFIX}:msg:{message_id}", self.ttl
+
+        chat_id = event_data.get("chat", {}).get("id")
+        if not chat_id:
+            return None, 0
+
+        body = str(event_data.get("body", "")).encode("utf-8")
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        return f"{self.KEY_PREFIX}:chat:{chat_id}:{digest}", self.fallback_ttl
+
+    def is_duplicate(self, event_type: str, event_data: dict) -> bool:
+        """
+        Marca o evento como visto. Retorna True se ele JÁ tinha sido visto (descartar).
+        Em caso de falha no Redis, deixa passar (fail-open).
+        """
+        return self.find_duplicates([(event_type, event_data)])[0]
+
+    def find_duplicates(self, events: List[Tuple[str, dict]]) -> List[bool]:
+        """
+        Versão em lote: marca TODOS os eventos de um POST num único pipeline
+        e retorna, na mesma ordem, quais já tinham sido vistos.
+        """
+        fingerprints = [self.fingerprint(event_type, event_data) for event_type, event_data in events]
+        checked = [(i, key, ttl) for i, (key, ttl) in enumerate(fingerprints) if key]
+        duplicates = [False] * len(events)
+        if not checked:
+            return duplicates
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for _, key, ttl in checked:
+                pipe.set(key, 1, nx=True, ex=ttl)
+            Metrics.incr("webhook_events_checked", len(checked), pipe=pipe)
+            results = pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ [Idempotency] Falha ao checar duplicidade: {e}")
+            return duplicates
+
+        for (i, key, _), first_time in zip(checked, results):
+            if not first_time:
+                duplicates[i] = True
+                logger.info(f"♻️ [Idempotency] Reentrega descartada ({key}).")
+
+        dropped = sum(duplicates)
+        if dropped:
+            Metrics.incr("webhook_duplicates_dropped", dropped)
+        return duplicates
+
+    def release(self, events: List[Tuple[str, dict]]):
+        """
+        Desfaz a marcação de eventos que não chegaram a ser enfileirados (broker fora):
+        a reentrega da Huggy precisa ser processada, não descartada como duplicada.
+        """
+        keys = [key for key, _ in (self.fingerprint(event_type, event_data) for event_type, event_data in events) if key]
+        if not keys:
+            return
+        try:
+            self.redis_client.delete(*keys)
+        except Exception as e:
+            logger.error(f"❌ [Idempotency] Falha ao liberar {len(keys)} evento(s) não enfileirado(s): {e}")
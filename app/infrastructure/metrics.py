@@ -0,0 +1,29 @@
+import logging
+from typing import Dict
+from app.infrastructure.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+class Metrics:
+    """
+    Contadores operacionais simples, compartilhados por API e workers.
+    Guardados num único hash do Redis (metrics:counters) e expostos em /admin/metrics.
+    """
+    KEY = "metrics:counters"
+
+    @classmethod
+    def incr(cls, name: str, amount: float = 1, pipe=None):
+        """Incrementa um contador. Se 'pipe' for passado, entra no mesmo round trip."""
+        try:
+            target = pipe if pipe is not None else get_redis()
+            if isinstance(amount, float) and not amount.is_integer():
+                target.hincrbyfloat(cls.KEY, name, amount)
+            else:
+                target.hincrby(cls.KEY, name, int(amount))
+        except Exception as e:
+            logger.debug(f"⚠️ [Metrics] Falha ao incrementar '{name}': {e}")
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, float]:
+        raw = get_redis(decode_responses=True).hgetall(cls.KEY)
+        return {name: float(value) for name, value in raw.items()}
@@ -0,0 +1,115 @@
+import os
+import time
+import random
+import logging
+from app.infrastructure.metrics import Metrics
+from app.infrastructure.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Token bucket atômico (relógio do próprio Redis: workers com relógios diferentes não importam).
+# KEYS[1] = ratelimit:{nome}:{família} (HASH tokens/ts)
+# ARGV[1] = taxa (tokens/s) | ARGV[2] = capacidade (burst) | ARGV[3] = reserva (tokens que só a alta prioridade usa)
+# Retorno: 0 = token consumido; > 0 = milissegundos até valer a pena tentar de novo
+TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate / 1000)
+
+local wait = 0
+if tokens >= 1 + reserve then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 + reserve - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+class RateLimiter:
+    """
+    Rate limit distribuído (token bucket no Redis) compartilhado por API e workers.
+
+    Limites por família (ex: huggy 'messages'), configuráveis via .env:
+        {PREFIX}_RATE_{FAMILIA}   tokens por segundo
+        {PREFIX}_BURST_{FAMILIA}  capacidade do balde
+
+    Prioridade: 'low' só consome com o balde acima da reserva ({PREFIX}_LOW_PRIORITY_RESERVE,
+    fração da capacidade), então tráfego de fundo (ex: lembretes de timeout) fica atrás
+    das respostas ao vivo quando o limite aperta.
+
+    Métricas (metrics:counters): {nome}_throttled:{família} e {nome}_throttle_wait_ms:{família}.
+    Falha no Redis = segue sem limite (fail-open).
+    """
+    KEY_PREFIX = "ratelimit"
+
+    def __init__(self, name: str, defaults: dict, env_prefix: str = None):
+        self.name = name
+        self.env_prefix = env_prefix or name.upper()
+        self.defaults = defaults
+        self.low_priority_reserve = float(os.getenv(f"{self.env_prefix}_LOW_PRIORITY_RESERVE", "0.5"))
+        self.max_wait = float(os.getenv(f"{self.env_prefix}_THROTTLE_MAX_WAIT", "30"))
+        self.redis_client = get_redis()
+        self._take = self.redis_client.register_script(TOKEN_BUCKET_LUA)
+
+    def _get_key(self, family: str) -> str:
+        return f"{self.KEY_PREFIX}:{self.name}:{family}"
+
+    def limits(self, family: str):
+        """(taxa, capacidade) da família."""
+        rate, burst = self.defaults.get(family, self.defaults["default"])
+        rate = float(os.getenv(f"{self.env_prefix}_RATE_{family.upper()}", rate))
+        burst = float(os.getenv(f"{self.env_prefix}_BURST_{family.upper()}", burst))
+        return rate, max(burst, 1.0)
+
+    def acquire(self, family: str, priority: str = "high") -> float:
+        """
+        Bloqueia até haver token para a família. Retorna quantos segundos esperou.
+        Passado o teto de espera ({PREFIX}_THROTTLE_MAX_WAIT), libera mesmo assim (com log).
+        """
+        rate, burst = self.limits(family)
+        reserve = burst * self.low_priority_reserve if priority == "low" else 0
+        # Reserva nunca pode impedir a baixa prioridade para sempre
+        reserve = min(reserve, burst - 1)
+
+        started = time.monotonic()
+        throttled = False
+        while True:
+            try:
+                wait_ms = self._take(keys=[self._get_key(family)], args=[rate, burst, reserve])
+            except Exception as e:
+                logger.warning(f"⚠️ [RateLimiter] Falha no Redis ({self.name}:{family}), seguindo sem limite: {e}")
+                return 0.0
+
+            if not wait_ms:
+                break
+            throttled = True
+            if time.monotonic() - started >= self.max_wait:
+                logger.warning(f"⏱️ [RateLimiter] {self.name}:{family} esperou {self.max_wait}s. Liberando sem token.")
+                Metrics.incr(f"{self.name}_throttle_timeout:{family}")
+                break
+
+            # Jitter: waiters de vários workers não acordam todos juntos
+            time.sleep(wait_ms / 1000 * random.uniform(1.0, 1.5))
+
+        if not throttled:
+            return 0.0
+
+        waited = time.monotonic() - started
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            Metrics.incr(f"{self.name}_throttled:{family}", pipe=pipe)
+            Metrics.incr(f"{self.name}_throttle_wait_ms:{family}", round(waited * 1000, 3), pipe=pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"⚠️ [RateLimiter] Falha ao registrar métricas: {e}")
+        return waited
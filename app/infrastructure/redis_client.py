@@ -0,0 +1,28 @@
+import os
+import threading
+import redis
+
+_clients = {}
+_lock = threading.Lock()
+
+def get_redis(decode_responses: bool = False) -> redis.Redis:
+    """
+    Retorna o cliente Redis compartilhado do processo (um pool por modo de decode).
+    Evita um 'redis.from_url' (e um pool novo) a cada instância de Service.
+    """
+    client = _clients.get(decode_responses)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(decode_responses)
+        if client is None:
+            redis_url = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+            client = redis.from_url(redis_url, decode_responses=decode_responses)
+            _clients[decode_responses] = client
+        return client
+
+def reset_redis():
+    """Esquece os clientes cacheados (testes e pós-fork)."""
+    with _lock:
+        _clients.clear()
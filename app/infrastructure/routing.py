@@ -0,0 +1,116 @@
+import os
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = "main-queue"
+
+def get_shard_count() -> int:
+    """Número de filas-shard (CELERY_QUEUE_SHARDS). 1 = fila única (comportamento antigo)."""
+    try:
+        return max(int(os.getenv("CELERY_QUEUE_SHARDS", "1")), 1)
+    except ValueError:
+        return 1
+
+def jump_consistent_hash(key: int, num_buckets: int) -> int:
+    """
+    Jump Consistent Hash (Lamping & Veach).
+    Ao mudar de N para N+1 shards, só ~1/(N+1) dos chats trocam de fila.
+    """
+    b, j = -1, 0
+    key &= 0xFFFFFFFFFFFFFFFF
+    while j < num_buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+def outbox_queue() -> str:
+    """Fila do worker dedicado às chamadas de saída para a Huggy (drain_outbox)."""
+    return os.getenv("OUTBOX_QUEUE", "outbound-queue")
+
+def maintenance_queue() -> str:
+    """
+    Fila das varreduras do Beat (sweep_timers, sweep_outbox). Fora dos shards: com
+    CELERY_QUEUE_SHARDS > 1 ninguém consome a 'main-queue', e os timers parariam.
+    """
+    return os.getenv("MAINTENANCE_QUEUE", "maintenance-queue")
+
+# Tasks periódicas do Beat: sem afinidade de chat, vão para a fila de manutenção
+MAINTENANCE_TASKS = {"sweep_timers", "sweep_outbox"}
+
+def shard_queue_name(shard: int) -> str:
+    return f"{DEFAULT_QUEUE}-{shard}"
+
+def queue_for_chat(chat_id) -> str:
+    """Fila responsável pelo chat (sempre a mesma enquanto o nº de shards não mudar)."""
+    shards = get_shard_count()
+    if shards <= 1 or chat_id is None:
+        return DEFAULT_QUEUE
+
+    try:
+        key = int(chat_id)
+    except (TypeError, ValueError):
+        return DEFAULT_QUEUE
+
+    return shard_queue_name(jump_consistent_hash(key, shards))
+
+def extract_chat_id(payload: dict) -> Optional[int]:
+    """
+    Extrai o Chat ID do payload bruto da Huggy.
+    - receivedAllMessage: messages[...][0].chat.id
+    - closedChat: messages[...][0].id
+    """
+    try:
+        messages = payload.get("messages", {})
+        event_type = next(iter(messages))
+        event_data = messages[event_type][0]
+    except Exception:
+        return None
+
+    if event_type == "closedChat":
+        return event_data.get("id")
+    return event_data.get("chat", {}).get("id")
+
+# Tasks com afinidade de chat -> como achar o chat_id nos argumentos
+CHAT_AFFINITY_TASKS = {
+    "process_webhook_event": lambda args, kwargs: extract_chat_id(args[0] if args else kwargs.get("payload", {})),
+    "check_inactivity": lambda args, kwargs: args[0] if args else kwargs.get("chat_id"),
+    "flush_debounced_messages": lambda args, kwargs: args[0] if args else kwargs.get("chat_id"),
+}
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Router do Celery (task_routes).
+    Mensagens do mesmo chat vão sempre para a mesma fila-shard; cada shard é
+    consumido por um worker com concorrência 1 (ordem garantida por conversa),
+    e os shards rodam em paralelo.
+    """
+    if name == "drain_outbox":
+        # Ordem por chat garantida pelo lease da outbox: pode rodar com concorrência > 1
+        return {"queue": outbox_queue()}
+
+    if name in MAINTENANCE_TASKS:
+        return {"queue": maintenance_queue()}
+
+    extractor = CHAT_AFFINITY_TASKS.get(name)
+    if extractor is None:
+        return None
+
+    try:
+        chat_id = extractor(args or [], kwargs or {})
+    except Exception as e:
+        logger.warning(f"⚠️ [Router] Não foi possível extrair chat_id de '{name}': {e}")
+        chat_id = None
+
+    return {"queue": queue_for_chat(chat_id)}
+
+def worker_queues(max_shards: int = None) -> str:
+    """
+    Lista de filas para o '-Q' de um worker que drena TODOS os shards até 'max_shards'
+    (inclui a fila legada). Útil ao reduzir o nº de shards: as filas antigas continuam
+    sendo consumidas até esvaziar, sem perder tasks em voo.
+    """
+    total = max_shards or get_shard_count()
+    return ",".join([DEFAULT_QUEUE] + [shard_queue_name(i) for i in range(total)])
@@ -0,0 +1,123 @@
+import time
+import uuid
+import logging
+from typing import Callable, Optional
+from app.infrastructure.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Libera o lock só se ainda for do dono (o lease pode ter expirado e outro ter assumido)
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Assume o lock e apaga o resultado da rodada anterior no MESMO passo: quem vê o lock
+# ocupado e lê um resultado sabe que ele é desta rodada, não de um dono que já saiu
+ACQUIRE_LUA = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    redis.call('DEL', KEYS[2])
+    return 1
+end
+return 0
+"""
+
+class SingleFlight:
+    """
+    Single-flight distribuído: para a mesma chave, só UM processo executa o trabalho;
+    quem chega enquanto ele roda espera o resultado publicado em vez de repetir.
+
+    Layout por chave (namespace 'ns', id já anonimizado pelo chamador):
+        singleflight:{ns}:{id}:lock    SET NX EX (lease = dono atual)
+        singleflight:{ns}:{id}:result  resultado serializado (TTL curto, apagado por cada novo dono)
+        singleflight:{ns}:{id}         canal pub/sub: "done" | "failed"
+
+    Falha do Redis ou espera estourada = executa localmente (fail-open).
+    """
+    KEY_PREFIX = "singleflight"
+
+    def __init__(self, namespace: str, lease_seconds: float, result_ttl: int = 30):
+        self.namespace = namespace
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.redis_client = get_redis(decode_responses=True)
+        self._acquire = self.redis_client.register_script(ACQUIRE_LUA)
+        self._release = self.redis_client.register_script(RELEASE_LUA)
+
+    def _get_key(self, key: str) -> str:
+        return f"{self.KEY_PREFIX}:{self.namespace}:{key}"
+
+    def run(self, key: str, fn: Callable[[], object], dumps: Callable[[object], str], loads: Callable[[str], object]):
+        base = self._get_key(key)
+        lock_key, result_key = f"{base}:lock", f"{base}:result"
+        deadline = time.monotonic() + self.lease_seconds
+        owner = uuid.uuid4().hex
+
+        while True:
+            try:
+                acquired = self._acquire(keys=[lock_key, result_key], args=[owner, max(int(self.lease_seconds), 1)])
+            except Exception as e:
+                logger.warning(f"⚠️ [SingleFlight] Redis indisponível, executando sem deduplicação: {e}")
+                return fn()
+
+            if acquired:
+                return self._lead(base, lock_key, result_key, owner, fn, dumps)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"⏱️ [SingleFlight] Espera por '{base}' estourou. Executando localmente.")
+                return fn()
+
+            logger.info(f"⏳ [SingleFlight] '{base}' já em andamento em outro worker. Aguardando resultado...")
+            raw = self._wait(base, result_key, remaining)
+            if raw is not None:
+                return loads(raw)
+            # Sem resultado: o dono falhou (ou o lease expirou). Tenta assumir.
+
+    def _lead(self, base: str, lock_key: str, result_key: str, owner: str, fn: Callable[[], object], dumps):
+        try:
+            result = fn()
+        except Exception:
+            self._finish(base, lock_key, owner, "failed")
+            raise
+
+        try:
+            self.redis_client.set(result_key, dumps(result), ex=self.result_ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ [SingleFlight] Falha ao publicar resultado de '{base}': {e}")
+        self._finish(base, lock_key, owner, "done")
+        return result
+
+    def _finish(self, base: str, lock_key: str, owner: str, event: str):
+        try:
+            self._release(keys=[lock_key], args=[owner])
+            self.redis_client.publish(base, event)
+        except Exception as e:
+            logger.warning(f"⚠️ [SingleFlight] Falha ao liberar '{base}': {e}")
+
+    def _wait(self, channel: str, result_key: str, timeout: float) -> Optional[str]:
+        """Bloqueia (pub/sub) até o dono terminar; devolve o resultado ou None."""
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(channel)
+            # Relê DEPOIS de inscrever: o dono pode ter terminado antes do subscribe
+            raw = self.redis_client.get(result_key)
+            deadline = time.monotonic() + timeout
+            while raw is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if pubsub.get_message(timeout=remaining) is not None:
+                    return self.redis_client.get(result_key)
+            return raw
+        except Exception as e:
+            logger.warning(f"⚠️ [SingleFlight] Falha aguardando '{channel}': {e}")
+            time.sleep(min(timeout, 1.0))
+            return None
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
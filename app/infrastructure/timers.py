@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import logging
+from typing import List, Tuple
+from app.infrastructure.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Retira atomicamente até ARGV[2] timers vencidos (score <= ARGV[1]).
+# Cada timer só é entregue a UM sweeper, mesmo com vários rodando ao mesmo tempo.
+# KEYS[1] = timers:{ns} (ZSET chat_id -> vencimento) | KEYS[2] = timers:{ns}:payload (HASH chat_id -> args)
+# Retorno: {chat_id, args_json, chat_id, args_json, ...}
+POP_DUE_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local out = {}
+for _, member in ipairs(due) do
+    out[#out + 1] = member
+    out[#out + 1] = redis.call('HGET', KEYS[2], member) or '[]'
+end
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+    redis.call('HDEL', KEYS[2], unpack(due))
+end
+return out
+"""
+
+# Namespace -> task do Celery que recebe os args quando o timer vence
+TIMER_TASKS = {
+    "inactivity": "check_inactivity",
+    "debounce": "flush_debounced_messages",
+}
+
+class TimerService:
+    """
+    Timers por conversa guardados no Redis (substitui apply_async(countdown=...)).
+
+    Layout por namespace:
+        timers:{ns}          ZSET  chat_id -> timestamp de vencimento
+        timers:{ns}:payload  HASH  chat_id -> args (JSON) da task
+
+    - Um timer novo para o mesmo chat SUBSTITUI o anterior (o antigo nunca dispara).
+    - Nada fica na memória do worker: o 'sweep_timers' (Celery Beat) retira os
+      vencidos em lotes e só então enfileira as tasks, para execução imediata.
+    """
+    KEY_PREFIX = "timers"
+
+    def __init__(self):
+        self.redis_client = get_redis()
+        self.batch_size = int(os.getenv("TIMER_SWEEP_BATCH", "500"))
+        self._pop_due = self.redis_client.register_script(POP_DUE_LUA)
+
+    def _get_key(self, namespace: str) -> str:
+        return f"{self.KEY_PREFIX}:{namespace}"
+
+    def _get_payload_key(self, namespace: str) -> str:
+        return f"{self.KEY_PREFIX}:{namespace}:payload"
+
+    def schedule(self, namespace: str, chat_id: int, delay: float, args: list):
+        """Agenda (ou reagenda) o timer do chat para daqui a 'delay' segundos."""
+        due_at = time.time() + delay
+
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.zadd(self._get_key(namespace), {chat_id: due_at})
+        pipe.hset(self._get_payload_key(namespace), chat_id, json.dumps(args, separators=(",", ":")))
+        pipe.execute()
+
+    def cancel(self, namespace: str, chat_id: int):
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.zrem(self._get_key(namespace), chat_id)
+        pipe.hdel(self._get_payload_key(namespace), chat_id)
+        pipe.execute()
+
+    def pending(self, namespace: str) -> int:
+        return self.redis_client.zcard(self._get_key(namespace))
+
+    def pop_due(self, namespace: str, now: float = None, limit: int = None) -> List[Tuple[int, list]]:
+        """Retira (e devolve) até 'limit' timers vencidos: [(chat_id, args), ...]"""
+        raw = self._pop_due(
+            keys=[self._get_key(namespace), self._get_payload_key(namespace)],
+            args=[now if now is not None else time.time(), limit or self.batch_size],
+        )
+        return [(int(raw[i]), json.loads(raw[i + 1])) for i in range(0, len(raw), 2)]
+
+    def requeue(self, namespace: str, entries: List[Tuple[int, list]]):
+        """Devolve timers retirados (ex: broker fora do ar) para vencerem de novo já."""
+        if not entries:
+            return
+        now = time.time()
+        pipe = self.redis_client.pipeline(transaction=True)
+        for chat_id, args in entries:
+            # NX: se o chat ganhou um timer novo nesse meio tempo, o novo prevalece
+            pipe.zadd(self._get_key(namespace), {chat_id: now}, nx=True)
+            pipe.hsetnx(self._get_payload_key(namespace), chat_id, json.dumps(args, separators=(",", ":")))
+        pipe.execute()
@@ -1,7 +1,8 @@
 import redis
 import os
+import time
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,10 @@ class TokenManager:
         """Gera a chave de bloqueio: lock:token:FACTA"""
         return f"lock:token:{scope.upper()}"
     
+    def _get_channel(self, scope: str) -> str:
+        """Canal de aviso de renovação: auth:token:FACTA:updates"""
+        return f"auth:token:{scope.upper()}:updates"
+
     def get_token(self, scope: str) -> Optional[str]:
         """
         Tenta recuperar um token válido para o escopo informado.
@@ -44,6 +49,59 @@ class TokenManager:
         except Exception as e:
             logger.error(f"⚠️ [TokenManager] Erro ao ler token ({scope}): {e}")
             return None
+
+    def get_token_with_ttl(self, scope: str) -> Tuple[Optional[str], int]:
+        """
+        Token + segundos restantes até expirar (1 round-trip).
+        Retorna (None, 0) se não existir ou em caso de erro.
+        """
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(self._get_key(scope))
+            pipe.ttl(self._get_key(scope))
+            token, ttl = pipe.execute()
+        except Exception as e:
+            logger.error(f"⚠️ [TokenManager] Erro ao ler token ({scope}): {e}")
+            return None, 0
+
+        if not token:
+            return None, 0
+        return token, max(int(ttl), 0)
+
+    def wait_for_token(self, scope: str, timeout: float) -> Optional[str]:
+        """
+        Bloqueia até outro worker avisar (pub/sub) que renovou ou liberou o lock,
+        ou até 'timeout'. Substitui o antigo sleep(2) + nova leitura.
+        """
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(self._get_channel(scope))
+            # Relê DEPOIS de inscrever: a renovação pode ter terminado antes do subscribe
+            token = self.get_token(scope)
+            deadline = time.monotonic() + timeout
+            while token is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if pubsub.get_message(timeout=remaining) is not None:
+                    return self.get_token(scope)
+            return token
+        except Exception as e:
+            logger.error(f"⚠️ [TokenManager] Erro aguardando renovação ({scope}): {e}")
+            # Redis fora: não vira loop apertado de lock/espera no chamador
+            time.sleep(min(timeout, 1.0))
+            return self.get_token(scope)
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+    def _notify(self, scope: str, event: str):
+        try:
+            self.redis.publish(self._get_channel(scope), event)
+        except Exception as e:
+            logger.warning(f"⚠️ [TokenManager] Falha ao avisar '{event}' ({scope}): {e}")
     
     def save_token(self, scope: str, token: str, ttl_seconds: int):
         """
@@ -61,6 +119,8 @@ class TokenManager:
             logger.info(f"💾 [TokenManager] Token {scope} salvo. Expira em {safe_ttl}s (Margem aplicada).")
         except Exception as e:
             logger.error(f"❌ [TokenManager] Erro ao salvar token ({scope}): {e}")
+            return
+        self._notify(scope, "renewed")
     
     def acquire_lock(self, scope: str, timeout: int = 10) -> bool:
         """
@@ -79,8 +139,9 @@ class TokenManager:
             return False
     
     def release_lock(self, scope: str):
-        """Libera o bloqueio manualmente após renovar (ou falhar)."""
+        """Libera o bloqueio manualmente após renovar (ou falhar) e acorda quem espera."""
         try:
             self.redis.delete(self._get_lock_key(scope))
         except Exception:
-            pass
\ No newline at end of file
+            pass
+        self._notify(scope, "released")
@@ -3,24 +3,95 @@ import base64
 import httpx
 import logging
 import time
+import threading
 from app.infrastructure.token_manager import TokenManager
+from app.infrastructure.http_clients import HttpClientRegistry, build_limits
+from app.infrastructure.circuit_breaker import CircuitBreaker
 
 logger = logging.getLogger(__name__)
 
+HTTP_CLIENT_NAME = "facta"
+
+# Timeouts de leitura por endpoint (segundos). Sobrescreva via .env:
+# FACTA_TIMEOUT_FGTS_SALDO=20, FACTA_TIMEOUT_GERA_TOKEN=10, ...
+FACTA_TIMEOUTS = {
+    "gera-token": 15.0,
+    "fgts/saldo": 30.0,
+    "fgts/calculo": 30.0,
+    "proposta/consulta-cliente": 15.0,
+}
+
+FACTA_CONNECT_TIMEOUT = 10.0
+
+def configured_timeout(endpoint: str) -> float:
+        """Timeout de leitura fixo do endpoint (FACTA_TIMEOUTS / .env). É o teto do timeout adaptativo."""
+        env_name = "FACTA_TIMEOUT_" + endpoint.upper().replace("/", "_").replace("-", "_")
+        return float(os.getenv(env_name, FACTA_TIMEOUTS.get(endpoint, 30.0)))
+
+def endpoint_timeout(endpoint: str, read_timeout: float = None) -> httpx.Timeout:
+        """
+        Retorna o Timeout específico do endpoint (ex: 'fgts/saldo').
+        'read_timeout' vem do circuit breaker (p99 observado); sem ele, vale o fixo.
+        O connect (CONNECT no proxy + TLS) tem teto próprio e menor.
+        """
+        if read_timeout is None:
+            read_timeout = configured_timeout(endpoint)
+        return httpx.Timeout(read_timeout, connect=min(FACTA_CONNECT_TIMEOUT, read_timeout))
+
+def endpoint_breaker(endpoint: str) -> CircuitBreaker:
+        """
+        Circuit breaker do endpoint da Facta (compartilhado entre workers via Redis).
+        Uso: endpoint_breaker("fgts/saldo").call(lambda t: client.get(..., timeout=endpoint_timeout("fgts/saldo", t)))
+        """
+        return CircuitBreaker.for_endpoint("facta", endpoint, configured_timeout(endpoint))
+
 def create_client(timeout: float = 30.0) -> httpx.Client:
         """
         Fábrica única de Clientes HTTP para a Facta.
-        Já injeta Proxy (se existir no .env) e define o Timeout padrão.
+        Já injeta Proxy (se existir no .env), limites do pool e o Timeout padrão.
         """
         proxy_url = os.getenv("FACTA_PROXY_URL")
-        client_kwargs = {"timeout": 30.0}
+        client_kwargs = {
+            "timeout": timeout,
+            "limits": build_limits("FACTA"),
+        }
 
         if proxy_url:
             client_kwargs["proxy"] = proxy_url
         
         return httpx.Client(**client_kwargs)
 
+HttpClientRegistry.register(HTTP_CLIENT_NAME, create_client)
+
+def get_facta_client() -> httpx.Client:
+        """
+        Transporte compartilhado do worker: mantém as conexões (túnel do proxy + TLS)
+        abertas entre /gera-token, /fgts/saldo, /fgts/calculo e /proposta.
+        """
+        return HttpClientRegistry.get(HTTP_CLIENT_NAME)
+
 class FactaAuth:
+    """
+    Token da Facta com cache em 3 níveis:
+    1. Memória do processo (token + vencimento): leitura sem I/O no caminho quente.
+    2. Redis (auth:token:FACTA): compartilhado entre workers.
+    3. /gera-token: só o dono do lock distribuído chama.
+
+    A renovação é PROATIVA: faltando REFRESH_AHEAD segundos para vencer, uma thread
+    em background renova enquanto as conversas seguem usando o token atual.
+    Só quem não tem token nenhum (boot a frio) espera, e espera via pub/sub.
+    """
+    TOKEN_TTL = 3500
+    LOCK_TIMEOUT = 30
+    REFRESH_AHEAD = int(os.getenv("FACTA_TOKEN_REFRESH_AHEAD", "300"))
+    WAIT_TIMEOUT = float(os.getenv("FACTA_TOKEN_WAIT_TIMEOUT", "20"))
+
+    # Cache do processo (compartilhado por todas as instâncias/adapters)
+    _token = None
+    _expires_at = 0.0
+    _state_lock = threading.Lock()
+    _refreshing = False
+
     def __init__(self):
         self.base_url = os.getenv("FACTA_API_URL", "https://webservice-homol.facta.com.br")
         self.user = os.getenv("FACTA_USER")
@@ -29,31 +100,104 @@ class FactaAuth:
         self.token_manager = TokenManager()
         self.SCOPE = "FACTA"
 
+    @classmethod
+    def reset_cache(cls):
+        """Zera o cache do processo (testes / pós-fork do worker)."""
+        with cls._state_lock:
+            cls._token = None
+            cls._expires_at = 0.0
+            cls._refreshing = False
+
+    @classmethod
+    def _remember(cls, token: str, ttl: float):
+        with cls._state_lock:
+            cls._token = token
+            cls._expires_at = time.time() + ttl
+
     def get_valid_token(self) -> str:
         """
         Retorna um token Bearer válido.
-        Usa estratégia de Cache-First com Lock Distribuido para renovação.
+        Memória -> Redis -> renovação (lock distribuído); nunca bloqueia se ainda há token válido.
         """
-        token = self.token_manager.get_token(self.SCOPE)
+        token, expires_at = FactaAuth._token, FactaAuth._expires_at
+        now = time.time()
+        if token and now < expires_at - self.REFRESH_AHEAD:
+            return token
+        local_token = token if token and now < expires_at else None
+
+        # Perto de vencer (ou sem cache local): outro worker pode já ter renovado
+        token, ttl = self.token_manager.get_token_with_ttl(self.SCOPE)
         if token:
+            FactaAuth._remember(token, ttl)
+            if ttl <= self.REFRESH_AHEAD:
+                self._refresh_in_background()
             return token
-        
-        if self.token_manager.acquire_lock(self.SCOPE):
+
+        if local_token:
+            # Redis sem token (ou fora do ar), mas o da memória ainda não venceu:
+            # a conversa segue com ele e a renovação fica por conta da thread
+            self._refresh_in_background()
+            return local_token
+
+        return self._renew_blocking()
+
+    def _renew(self) -> str:
+        """Chama /gera-token e publica o token novo (Redis + memória). Exige o lock."""
+        logger.info("🔑 [FACTA] Iniciando renovação de token na API...")
+        new_token = self._request_api_token()
+        self.token_manager.save_token(self.SCOPE, new_token, self.TOKEN_TTL)
+        FactaAuth._remember(new_token, max(self.TOKEN_TTL - 60, 60))
+        return new_token
+
+    def _renew_blocking(self) -> str:
+        """Sem token em lugar nenhum: renova (se ganhar o lock) ou espera o aviso de quem ganhou."""
+        deadline = time.monotonic() + self.WAIT_TIMEOUT
+
+        while True:
+            if self.token_manager.acquire_lock(self.SCOPE, timeout=self.LOCK_TIMEOUT):
+                try:
+                    return self._renew()
+                except Exception as e:
+                    logger.error(f"❌ [FACTA] Falha crítica na renovação: {str(e)}")
+                    raise e
+                finally:
+                    self.token_manager.release_lock(self.SCOPE)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Token FACTA não foi renovado a tempo por outro worker.")
+
+            logger.info("⏳ [FACTA] Aguardando renovação por outro worker...")
+            if self.token_manager.wait_for_token(self.SCOPE, remaining):
+                token, ttl = self.token_manager.get_token_with_ttl(self.SCOPE)
+                if token:
+                    FactaAuth._remember(token, ttl)
+                    return token
+
+    def _refresh_in_background(self):
+        """Renova antes de vencer, fora do caminho da conversa (1 thread por processo)."""
+        with FactaAuth._state_lock:
+            if FactaAuth._refreshing:
+                return
+            FactaAuth._refreshing = True
+
+        def run():
             try:
-               logger.info("🔑 [FACTA] Iniciando renovação de token na API...")
-               new_token = self._request_api_token()
-               self.token_manager.save_token(self.SCOPE, new_token, 3500)
-               return new_token
+                # Lock ocupado = outro worker já está renovando; a próxima leitura pega do Redis
+                if not self.token_manager.acquire_lock(self.SCOPE, timeout=self.LOCK_TIMEOUT):
+                    return
+                try:
+                    self._renew()
+                finally:
+                    self.token_manager.release_lock(self.SCOPE)
             except Exception as e:
-                self.token_manager.release_lock(self.SCOPE)
-                logger.error(f"❌ [FACTA] Falha crítica na renovação: {str(e)}")
-                raise e
-        
-        else:
-            logger.info("⏳ [FACTA] Aguardando renovação por outro worker...")
-            time.sleep(2)
-            return self.get_valid_token()
-        
+                logger.error(f"⚠️ [FACTA] Renovação antecipada falhou (token atual segue em uso): {e}")
+            finally:
+                with FactaAuth._state_lock:
+                    FactaAuth._refreshing = False
+
+        threading.Thread(target=run, name="facta-token-refresh", daemon=True).start()
+
     def _request_api_token(self) -> str:
         """
         Executa a chamada HTTP crua para /gera-token.
@@ -74,17 +218,19 @@ class FactaAuth:
         }
 
         try:
-            with create_client() as client:
-                response = client.get(url, headers=headers)
-                response.raise_for_status()
+            client = get_facta_client()
+            response = endpoint_breaker("gera-token").call(
+                lambda read_timeout: client.get(url, headers=headers, timeout=endpoint_timeout("gera-token", read_timeout))
+            )
+            response.raise_for_status()
 
-                data = response.json()
-                token = data.get("token")
+            data = response.json()
+            token = data.get("token")
 
-                if not token:
-                    raise ValueError("API retornou 200 mas sem campo 'token'.")
-                
-                return token
+            if not token:
+                raise ValueError("API retornou 200 mas sem campo 'token'.")
+            
+            return token
             
         except httpx.HTTPStatusError as e:
             logger.error(f"❌ [FACTA] Erro HTTP {e.response.status_code}: {e.response.text}")
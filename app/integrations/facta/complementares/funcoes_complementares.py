@@ -1,7 +1,6 @@
-import httpx
 import logging
 from typing import Optional, Dict
-from app.integrations.facta.auth import FactaAuth
+from app.integrations.facta.auth import FactaAuth, get_facta_client, endpoint_timeout, endpoint_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -94,41 +93,44 @@ class FactaDadosCadastrais:
         params = {"cpf": cpf}
 
         try:
-            with httpx.Client(timeout=30.0) as client:
-                logger.info(f"🔎 [Facta] Consultando dados cadastrais para CPF {cpf}...")
-                response = client.get(url, headers=self._get_headers, params=params)
+            client = get_facta_client()
+            logger.info(f"🔎 [Facta] Consultando dados cadastrais para CPF {cpf}...")
+            headers = self._get_headers
+            response = endpoint_breaker("proposta/consulta-cliente").call(
+                lambda read_timeout: client.get(url, headers=headers, params=params, timeout=endpoint_timeout("proposta/consulta-cliente", read_timeout))
+            )
 
-                if response.status_code != 200:
-                    logger.warning(f"⚠️ [Facta] Erro API Consulta: {response.status_code}")
-                    return None
+            if response.status_code != 200:
+                logger.warning(f"⚠️ [Facta] Erro API Consulta: {response.status_code}")
+                return None
 
-                data = response.json()
+            data = response.json()
 
-                if data.get("erro") is True:
-                    return None
-                
-                cliente_lista = data.get("cliente", [])
-                if not cliente_lista:
-                    return None
-                
-                dados = cliente_lista[0]
+            if data.get("erro") is True:
+                return None
+            
+            cliente_lista = data.get("cliente", [])
+            if not cliente_lista:
+                return None
+            
+            dados = cliente_lista[0]
 
-                banco = dados.get("BANCO")
-                agencia = dados.get("AGENCIA") 
-                conta = dados.get("CONTA")
-                tipo = dados.get("TIPO_CONTA", "")
+            banco = dados.get("BANCO")
+            agencia = dados.get("AGENCIA") 
+            conta = dados.get("CONTA")
+            tipo = dados.get("TIPO_CONTA", "")
 
-                if not banco or not conta:
-                    logger.info(f"ℹ️ [Facta] Cliente encontrado, mas sem dados bancários completos.")
-                    return None
-                
-                texto_completo = self._formatar_dados_bancarios(banco, agencia, conta, tipo)
+            if not banco or not conta:
+                logger.info(f"ℹ️ [Facta] Cliente encontrado, mas sem dados bancários completos.")
+                return None
+            
+            texto_completo = self._formatar_dados_bancarios(banco, agencia, conta, tipo)
 
-                return {
-                    "raw": dados,
-                    "texto_formatado": texto_completo,
-                    "banco_nome": BANCOS_DICT.get(str(banco).zfill(3), banco)
-                }
+            return {
+                "raw": dados,
+                "texto_formatado": texto_completo,
+                "banco_nome": BANCOS_DICT.get(str(banco).zfill(3), banco)
+            }
         except Exception as e:
             logger.error(f"❌ [Facta] Falha ao buscar dados cadastrais: {e}")
             return None
@@ -1,6 +1,8 @@
 import httpx
 import logging
-from app.integrations.facta.auth import FactaAuth, create_client
+from app.integrations.facta.auth import FactaAuth, get_facta_client, endpoint_timeout, endpoint_breaker
+from app.integrations.facta.fgts.saldo_cache import SaldoCache
+from app.integrations.facta.fgts.tabelas import TabelaSelector
 from app.utils.formatters import parse_valor_monetario
 
 logger = logging.getLogger(__name__)
@@ -9,6 +11,8 @@ class FactaFGTSAdapter:
     def __init__(self):
         self.auth = FactaAuth()
         self.base_url = self.auth.base_url
+        self.saldo_cache = SaldoCache()
+        self.tabelas = TabelaSelector()
 
     @property
     def _get_headers(self):
@@ -19,34 +23,61 @@ class FactaFGTSAdapter:
         }
     
     def consultar_saldo(self, cpf: str) -> dict:
+        """
+        Consulta o saldo FGTS. Resultados conclusivos ficam no SaldoCache (TTL por status),
+        então CPF redigitado / chat reiniciado / retry não gastam a cota mensal da Facta.
+        """
+        cached = self.saldo_cache.get(cpf)
+        if cached is not None:
+            logger.info(f"💾 [Facta] Saldo do CPF {cpf} servido do cache ({cached.get('status')}).")
+            return cached
+
+        result = self._consultar_saldo_api(cpf)
+        self.saldo_cache.set(cpf, result)
+        return result
+
+    def _consultar_saldo_api(self, cpf: str) -> dict:
         url = f"{self.base_url}/fgts/saldo"
         params = {"cpf": cpf, "banco": "facta"}
 
         try:
-            with create_client() as client:
-                logger.info(f"💰 [Facta] Consultando saldo para CPF {cpf}...")
-                response = client.get(url, headers=self._get_headers, params=params)
-                data = response.json()
-
-                status = self._interpretar_retorno(data)
-        
-                return {
-                    "status": status,
-                    "dados": data.get("retorno", {}),
-                    "msg_original": data.get("mensagem", "")
-                }
+            client = get_facta_client()
+            logger.info(f"💰 [Facta] Consultando saldo para CPF {cpf}...")
+            headers = self._get_headers  # token fora do circuito: renovação não conta como latência do endpoint
+            response = endpoint_breaker("fgts/saldo").call(
+                lambda read_timeout: client.get(url, headers=headers, params=params, timeout=endpoint_timeout("fgts/saldo", read_timeout))
+            )
+            data = response.json()
+
+            status = self._interpretar_retorno(data)
+    
+            return {
+                "status": status,
+                "dados": data.get("retorno", {}),
+                "msg_original": data.get("mensagem", "")
+            }
         except Exception as e:
             logger.error(f"Erro Saldo: {e}")
             return {"status": "ERRO_TECNICO", "msg_original": str(e)}
 
     def simular_calculo(self, cpf: str, dados_saldo: dict) -> dict:
+        """
+        Simula o cálculo na melhor tabela para o saldo (ver TabelaSelector):
+        as tabelas elegíveis são simuladas em paralelo e vence a de maior valor líquido.
+        Tabelas que o estimador local já sabe que não passam do mínimo nem são chamadas.
+        """
         parcelas = self._organizar_parcelas(dados_saldo)
 
         saldo_bruto = parse_valor_monetario(dados_saldo.get("saldo_total", 0))
 
-        info_tabela = self._selecionar_melhor_tabela(saldo_bruto)
+        return self.tabelas.selecionar(
+            saldo_bruto,
+            lambda info_tabela: self._simular_tabela(cpf, parcelas, saldo_bruto, info_tabela),
+            parcelas=parcelas
+        )
 
-        logger.info(f"🧮 [Facta] Simulando tabela '{info_tabela['nome']}' (Cód {info_tabela['codigo']}) para saldo {saldo_bruto}")
+    def _simular_tabela(self, cpf: str, parcelas: list, saldo_bruto: float, info_tabela: dict) -> dict:
+        logger.info(f"🧮 [Facta] Simulando tabela '{info_tabela.get('nome')}' (Cód {info_tabela['codigo']}) para saldo {saldo_bruto}")
 
         url = f"{self.base_url}/fgts/calculo"
 
@@ -58,24 +89,29 @@ class FactaFGTSAdapter:
         }
 
         try:
-            with create_client() as client:
-                resp = client.post(url, headers=self._get_headers, json=body)
-                data = resp.json()
-                
-                # Verifica se aprovou
-                if data.get("permitido", "").upper() == "SIM":
-                    return {
-                        "status": "APROVADO",
-                        "valor_liquido": parse_valor_monetario(data.get("valor_liquido")),
-                        "raw": data
-                    }
-                else:
-                    return {
-                        "status": "REPROVADO", 
-                        "msg_original": data.get("msg")
-                    }
+            client = get_facta_client()
+            headers = self._get_headers
+            resp = endpoint_breaker("fgts/calculo").call(
+                lambda read_timeout: client.post(url, headers=headers, json=body, timeout=endpoint_timeout("fgts/calculo", read_timeout))
+            )
+            data = resp.json()
+            
+            # Verifica se aprovou
+            if data.get("permitido", "").upper() == "SIM":
+                return {
+                    "status": "APROVADO",
+                    "valor_liquido": parse_valor_monetario(data.get("valor_liquido")),
+                    "tabela": info_tabela,
+                    "raw": data
+                }
+            else:
+                return {
+                    "status": "REPROVADO", 
+                    "tabela": info_tabela,
+                    "msg_original": data.get("msg")
+                }
         except Exception as e:
-            return {"status": "ERRO_TECNICO", "msg_original": str(e)}
+            return {"status": "ERRO_TECNICO", "tabela": info_tabela, "msg_original": str(e)}
         
     def _interpretar_retorno(self, data: dict) -> str:
         """
@@ -148,15 +184,3 @@ class FactaFGTSAdapter:
             parcelas.append({f"dataRepasse_{i}": data, f"valor_{i}": valor})
             
         return parcelas
-    
-    def _selecionar_melhor_tabela(self, saldo_total: float) -> dict:
-        """
-        Define a melhor tabela e taxa com base no saldo do cliente.
-        Retorna um dicionário com parâmetros para a API.
-        """
-
-        return {
-            "codigo": 62170,
-            "taxa": 1.80,
-            "nome": "Gold Preference"
-        }
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from app.core.fgts_tables import FactaTable
+
+logger = logging.getLogger(__name__)
+
+# IOF de operação de crédito (pessoa física): alíquota diária sobre o principal
+# de cada parcela (até 365 dias) + adicional fixo sobre o total.
+IOF_DIARIO = 0.000082
+IOF_ADICIONAL = 0.0038
+IOF_DIAS_MAX = 365
+
+def _parse_data(valor) -> Optional[date]:
+    if isinstance(valor, date):
+        return valor
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(str(valor)[:10], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def fluxos_das_parcelas(parcelas: List[Dict], hoje: date = None) -> List[Tuple[int, float]]:
+    """
+    [(dias até o repasse, valor)] a partir da saída do _organizar_parcelas.
+    Parcelas zeradas (ou com data ilegível) não entram.
+    """
+    hoje = hoje or date.today()
+    fluxos = []
+    for i, parcela in enumerate(parcelas, start=1):
+        valor = float(parcela.get(f"valor_{i}") or 0)
+        repasse = _parse_data(parcela.get(f"dataRepasse_{i}"))
+        if valor <= 0 or repasse is None:
+            continue
+        fluxos.append((max((repasse - hoje).days, 0), valor))
+    return fluxos
+
+def estimar_liquido(parcelas: List[Dict], tabelas: List[FactaTable], hoje: date = None) -> List[float]:
+    """
+    Valor líquido estimado da antecipação para CADA tabela (mesma ordem de 'tabelas').
+
+    Por parcela: valor presente = valor / (1 + taxa_mensal) ^ (dias / 30);
+    IOF = VP * 0,0082% * min(dias, 365) + 0,38% * soma dos VPs; tarifa ('tac') da tabela.
+
+    Os fatores que só dependem das datas (meses, dias de IOF) são calculados uma vez e
+    reaproveitados em todas as tabelas: a conta é a matriz parcelas x tabelas.
+    """
+    fluxos = fluxos_das_parcelas(parcelas, hoje)
+    if not fluxos:
+        return [0.0 for _ in tabelas]
+
+    meses = [dias / 30 for dias, _ in fluxos]
+    fator_iof = [IOF_DIARIO * min(dias, IOF_DIAS_MAX) for dias, _ in fluxos]
+    valores = [valor for _, valor in fluxos]
+
+    estimativas = []
+    for tabela in tabelas:
+        base = 1 + float(tabela["taxa"]) / 100
+        presentes = [v / base ** m for v, m in zip(valores, meses)]
+        total = sum(presentes)
+        iof = sum(p * f for p, f in zip(presentes, fator_iof)) + IOF_ADICIONAL * total
+        estimativas.append(round(max(total - iof - float(tabela.get("tac", 0)), 0.0), 2))
+    return estimativas
+
+class EstimadorFGTS:
+    """
+    Filtro local antes do /fgts/calculo.
+
+    - As tabelas são ordenadas pela estimativa: as mais promissoras entram primeiro na fan-out.
+    - Só com FGTS_ESTIMADOR_DESCARTE: tabela cuja estimativa, mesmo com a margem de erro
+      (FGTS_ESTIMATIVA_MARGEM), fica abaixo do mínimo da Facta (FGTS_VALOR_MINIMO_LIQUIDO)
+      não é simulada. Desligado por padrão enquanto o modelo não for validado contra
+      respostas reais do /fgts/calculo: um falso negativo diz a um cliente elegível que
+      ele não tem saldo.
+    """
+    def __init__(self):
+        self.minimo = float(os.getenv("FGTS_VALOR_MINIMO_LIQUIDO", "100"))
+        self.margem = float(os.getenv("FGTS_ESTIMATIVA_MARGEM", "0.15"))
+        self.enabled = os.getenv("FGTS_ESTIMADOR", "true").lower() in ("1", "true", "yes")
+        self.descartar = os.getenv("FGTS_ESTIMADOR_DESCARTE", "false").lower() in ("1", "true", "yes")
+
+    def sem_chance(self, estimativa: float) -> bool:
+        return estimativa * (1 + self.margem) < self.minimo
+
+    def priorizar(self, parcelas: List[Dict], tabelas: List[FactaTable], hoje: date = None) -> List[FactaTable]:
+        """Tabelas que valem uma chamada remota, da maior para a menor estimativa."""
+        if not self.enabled:
+            return tabelas
+
+        estimativas = estimar_liquido(parcelas, tabelas, hoje)
+        candidatas = [
+            (estimativa, tabela) for estimativa, tabela in zip(estimativas, tabelas)
+            if not (self.descartar and self.sem_chance(estimativa))
+        ]
+        descartadas = len(tabelas) - len(candidatas)
+        if descartadas:
+            logger.info(f"🧾 [Estimador FGTS] {descartadas} tabela(s) sem chance (máx. estimado R$ {max(estimativas):.2f}).")
+
+        candidatas.sort(key=lambda item: item[0], reverse=True)
+        return [tabela for _, tabela in candidatas]
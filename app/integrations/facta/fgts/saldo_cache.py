@@ -0,0 +1,93 @@
+import os
+import json
+import logging
+from typing import Dict, Optional
+from app.infrastructure.metrics import Metrics
+from app.infrastructure.redis_client import get_redis
+from app.utils.validators import hash_cpf
+
+logger = logging.getLogger(__name__)
+
+# TTL (segundos) do resultado do /fgts/saldo por status. Sobrescreva via .env:
+# FGTS_SALDO_CACHE_TTL_SUCESSO=120, FGTS_SALDO_CACHE_TTL_SEM_ADESAO=7200, ...
+# Status fora da tabela (ERRO_TECNICO, ERRO_GENERICO, RETORNO_DESCONHECIDO,
+# LIMITE_EXCEDIDO_CONSULTAS_FGTS) nunca são cacheados: a próxima tentativa vai à Facta.
+SALDO_CACHE_TTLS = {
+    "SUCESSO": 300,
+    "SEM_AUTORIZACAO": 900,        # o cliente pode autorizar no app e voltar
+    "SEM_ADESAO": 3600,
+    "SEM_SALDO": 3600,
+    "MUDANCAS_CADASTRAIS": 3600,
+    "ANIVERSARIANTE": 3600,
+    "SALDO_NAO_ENCONTRADO": 600,
+}
+
+def status_ttl(status: str) -> int:
+    """TTL do status (0 = não cachear)."""
+    if status not in SALDO_CACHE_TTLS:
+        return 0
+    return int(os.getenv(f"FGTS_SALDO_CACHE_TTL_{status}", SALDO_CACHE_TTLS[status]))
+
+class SaldoCache:
+    """
+    Cache do resultado do /fgts/saldo por CPF (chave = HMAC do CPF).
+    Protege a cota mensal da Facta contra CPF redigitado, chat reiniciado e retry do Celery.
+
+    Métricas (metrics:counters): fgts_saldo_cache_hit / fgts_saldo_cache_miss.
+    Falha no Redis = segue sem cache (fail-open).
+    """
+    KEY_PREFIX = "fgts:saldo"
+    HIT_COUNTER = "fgts_saldo_cache_hit"
+    MISS_COUNTER = "fgts_saldo_cache_miss"
+
+    def __init__(self):
+        self.redis_client = get_redis(decode_responses=True)
+
+    def _get_key(self, cpf: str) -> str:
+        return f"{self.KEY_PREFIX}:{hash_cpf(cpf)}"
+
+    def get(self, cpf: str) -> Optional[Dict]:
+        try:
+            raw = self.redis_client.get(self._get_key(cpf))
+        except Exception as e:
+            logger.warning(f"⚠️ [SaldoCache] Falha ao ler cache: {e}")
+            return None
+
+        if raw is None:
+            Metrics.incr(self.MISS_COUNTER)
+            return None
+
+        Metrics.incr(self.HIT_COUNTER)
+        return json.loads(raw)
+
+    def set(self, cpf: str, result: Dict):
+        ttl = status_ttl(result.get("status"))
+        if ttl <= 0:
+            return
+        try:
+            self.redis_client.set(self._get_key(cpf), json.dumps(result, ensure_ascii=False), ex=ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ [SaldoCache] Falha ao gravar cache: {e}")
+
+    def purge(self, cpf: str = None) -> int:
+        """Remove o resultado de um CPF (ou de todos, se cpf=None). Retorna quantas chaves apagou."""
+        if cpf:
+            return self.redis_client.delete(self._get_key(cpf))
+
+        removed = 0
+        batch = []
+        for key in self.redis_client.scan_iter(match=f"{self.KEY_PREFIX}:*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                removed += self.redis_client.delete(*batch)
+                batch = []
+        if batch:
+            removed += self.redis_client.delete(*batch)
+        return removed
+
+    @classmethod
+    def hit_ratio(cls, counters: Dict[str, float]) -> Optional[float]:
+        """hits / (hits + misses) a partir do snapshot do Metrics (None = sem consultas)."""
+        hits = counters.get(cls.HIT_COUNTER, 0)
+        total = hits + counters.get(cls.MISS_COUNTER, 0)
+        return round(hits / total, 4) if total else None
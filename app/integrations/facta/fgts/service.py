@@ -41,8 +41,8 @@ class FactaFGTSService:
                 "motivo": "VALOR_DISPONÍVEL",
                 "detalhes": {
                     "valor_liquido": resp_calculo.get("valor_liquido"),
-                    "taxa": resp_calculo.get("raw", {}).get("taxa"),
-                    "tabela": resp_calculo.get("raw", {}).get("tabela"),
+                    "taxa": resp_calculo.get("raw", {}).get("taxa", resp_calculo.get("tabela", {}).get("taxa")),
+                    "tabela": resp_calculo.get("raw", {}).get("tabela", resp_calculo.get("tabela", {}).get("codigo")),
                     "simulacao_id": resp_calculo.get("raw", {}).get("simulacao_fgts")
                 }
             }
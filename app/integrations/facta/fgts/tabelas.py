@@ -0,0 +1,150 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from app.core.fgts_tables import FactaTable, load_tables, eligible_tables
+from app.integrations.facta.fgts.estimador import EstimadorFGTS
+from app.infrastructure.metrics import Metrics
+from app.infrastructure.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Critério de escolha entre as simulações APROVADAS (maior nota vence)
+OBJECTIVES: Dict[str, Callable[[Dict], float]] = {
+    "valor_liquido": lambda r: r.get("valor_liquido") or 0.0,
+    "menor_taxa": lambda r: -float(r["tabela"]["taxa"]),
+}
+
+class TabelaSelector:
+    """
+    Escolhe a melhor tabela FGTS da Facta para o saldo do cliente.
+
+    0. Com as parcelas em mãos, o EstimadorFGTS descarta tabelas sem chance e ordena as demais.
+    1. Se já existe vencedora cacheada para a faixa de saldo (fgts:tabela:...), simula só ela.
+    2. Senão (ou se ela reprovar), simula as tabelas elegíveis em paralelo
+       (no máximo FACTA_FGTS_TABLE_FANOUT ao mesmo tempo) e fica com a melhor
+       segundo FACTA_FGTS_TABLE_OBJECTIVE. A vencedora vai para o cache da faixa.
+
+    A latência da fan-out é a da tabela mais lenta, não a soma delas.
+    """
+    KEY_PREFIX = "fgts:tabela"
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_pid: Optional[int] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, tables: List[FactaTable] = None):
+        self.tables = tables if tables is not None else load_tables()
+        self.objective = os.getenv("FACTA_FGTS_TABLE_OBJECTIVE", "valor_liquido")
+        if self.objective not in OBJECTIVES:
+            logger.warning(f"⚠️ [Tabelas FGTS] Objetivo '{self.objective}' desconhecido. Usando 'valor_liquido'.")
+            self.objective = "valor_liquido"
+        self.bucket_size = float(os.getenv("FACTA_FGTS_SALDO_BUCKET", "500"))
+        self.cache_ttl = int(os.getenv("FACTA_FGTS_TABLE_CACHE_TTL", "3600"))
+        self.redis_client = get_redis(decode_responses=True)
+        self.estimador = EstimadorFGTS()
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """Pool próprio (não o do pipeline da Facta: a fan-out roda DENTRO de uma task daquele pool)."""
+        pid = os.getpid()
+        if cls._executor is None or cls._executor_pid != pid:
+            with cls._executor_lock:
+                if cls._executor is None or cls._executor_pid != pid:
+                    cls._executor = ThreadPoolExecutor(
+                        max_workers=int(os.getenv("FACTA_FGTS_TABLE_FANOUT", "4")),
+                        thread_name_prefix="fgts-tabelas",
+                    )
+                    cls._executor_pid = pid
+        return cls._executor
+
+    def _catalog_digest(self) -> str:
+        """Muda quando o catálogo muda: vencedoras antigas deixam de valer sozinhas."""
+        raw = json.dumps(self.tables, sort_keys=True).encode()
+        return hashlib.sha1(raw).hexdigest()[:8]
+
+    def _get_key(self, saldo_total: float) -> str:
+        bucket = int(saldo_total // self.bucket_size) if self.bucket_size > 0 else 0
+        return f"{self.KEY_PREFIX}:{self._catalog_digest()}:{self.objective}:{bucket}"
+
+    def _cached_winner(self, key: str, candidates: List[FactaTable]) -> Optional[FactaTable]:
+        try:
+            codigo = self.redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ [Tabelas FGTS] Falha ao ler vencedora cacheada: {e}")
+            return None
+        if codigo is None:
+            return None
+        return next((t for t in candidates if str(t["codigo"]) == codigo), None)
+
+    def _remember_winner(self, key: str, tabela: FactaTable):
+        try:
+            self.redis_client.set(key, tabela["codigo"], ex=self.cache_ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ [Tabelas FGTS] Falha ao gravar vencedora: {e}")
+
+    def _fan_out(self, candidates: List[FactaTable], simular: Callable[[FactaTable], Dict]) -> List[Dict]:
+        if len(candidates) == 1:
+            return [simular(candidates[0])]
+        executor = self._get_executor()
+        futures = [executor.submit(simular, tabela) for tabela in candidates]
+        return [future.result() for future in futures]
+
+    def _best(self, results: List[Dict]) -> Optional[Dict]:
+        aprovados = [r for r in results if r.get("status") == "APROVADO"]
+        if not aprovados:
+            return None
+        return max(aprovados, key=OBJECTIVES[self.objective])
+
+    def selecionar(self, saldo_total: float, simular: Callable[[FactaTable], Dict], parcelas: List[Dict] = None) -> Dict:
+        """
+        'simular(tabela)' chama o /fgts/calculo de UMA tabela e devolve
+        {"status": "APROVADO" | "REPROVADO" | "ERRO_TECNICO", "tabela": tabela, ...}.
+        Retorna o resultado vencedor (ou o mais informativo dos que falharam).
+        """
+        candidates = eligible_tables(self.tables, saldo_total)
+        if not candidates:
+            logger.warning(f"⚠️ [Tabelas FGTS] Nenhuma tabela elegível para saldo {saldo_total}.")
+            return {"status": "REPROVADO", "msg_original": "Nenhuma tabela elegível para o saldo"}
+
+        if parcelas is not None:
+            elegiveis = len(candidates)
+            candidates = self.estimador.priorizar(parcelas, candidates)
+            if len(candidates) < elegiveis:
+                Metrics.incr("fgts_calculo_evitado", elegiveis - len(candidates))
+            if not candidates:
+                return {
+                    "status": "REPROVADO",
+                    "msg_original": "Valor estimado abaixo do mínimo (estimativa local, sem consulta à Facta)",
+                    "estimativa_local": True
+                }
+
+        key = self._get_key(saldo_total)
+
+        cached = self._cached_winner(key, candidates)
+        if cached is not None:
+            result = simular(cached)
+            if result.get("status") == "APROVADO":
+                Metrics.incr("fgts_tabela_cache_hit")
+                return result
+            candidates = [t for t in candidates if t["codigo"] != cached["codigo"]]
+            results = [result]
+        else:
+            results = []
+
+        # Só a vencedora cacheada era elegível: o resultado dela já é a resposta
+        if candidates:
+            results += self._fan_out(candidates, simular)
+            Metrics.incr("fgts_tabela_fan_out")
+        best = self._best(results)
+        if best is not None:
+            logger.info(f"🏆 [Tabelas FGTS] Vencedora: '{best['tabela'].get('nome')}' (Cód {best['tabela']['codigo']}) entre {len(results)} simulações.")
+            self._remember_winner(key, best["tabela"])
+            return best
+
+        # Nenhuma aprovou: erro técnico só prevalece se NENHUMA tabela respondeu de fato
+        reprovados = [r for r in results if r.get("status") == "REPROVADO"]
+        return reprovados[0] if reprovados else results[0]
@@ -3,25 +3,88 @@ import os
 import logging
 from typing import Union, Dict, Any, Optional
 from app.services.bot.content.message_loader import MessageLoader
+from app.services.bot.content.templates import CompiledMessage
+from app.infrastructure.http_clients import HttpClientRegistry, build_limits, use_http2
+from app.infrastructure.rate_limiter import RateLimiter
+from app.infrastructure.circuit_breaker import CircuitBreaker
 
 logger = logging.getLogger(__name__)
 
+HTTP_CLIENT_NAME = "huggy"
+
+# Timeout fixo das chamadas (teto do timeout adaptativo do circuit breaker)
+HUGGY_TIMEOUT = float(os.getenv("HUGGY_TIMEOUT", "10"))
+
+def create_huggy_http_client() -> httpx.Client:
+    """
+    Fábrica do pool HTTP da Huggy (um por worker).
+    Limites e HTTP/2 configuráveis via HUGGY_HTTP_* no .env.
+    """
+    return httpx.Client(
+        timeout=HUGGY_TIMEOUT,
+        limits=build_limits("HUGGY"),
+        http2=use_http2("HUGGY"),
+    )
+
+HttpClientRegistry.register(HTTP_CLIENT_NAME, create_huggy_http_client)
+
+# Limite de saída por família de endpoint: (requisições/s, burst).
+# Sobrescreva via .env: HUGGY_RATE_MESSAGES=8, HUGGY_BURST_MESSAGES=16, ...
+HUGGY_RATE_LIMITS = {
+    "messages": (10, 20),   # POST /chats/{id}/messages
+    "flow": (5, 10),        # POST /chats/{id}/flow
+    "workflow": (5, 10),    # PUT  /chats/{id}/workflow
+    "close": (5, 10),       # PUT  /chats/{id}/close
+    "default": (5, 10),
+}
+
 class HuggyClient:
     API_VALUE_EXIT_WORKFLOW = ""
 
-    def __init__(self):
+    def __init__(self, priority: str = "high"):
         self.api_token = os.getenv("HUGGY_API_TOKEN")
         self.base_url = "https://api.huggy.app/v3/companies/351946"
 
+        # 'high' = resposta ao vivo; 'low' = tráfego de fundo (ex: lembretes de timeout)
+        self.priority = priority
+        self.rate_limit_enabled = os.getenv("HUGGY_RATE_LIMIT", "true").lower() in ("1", "true", "yes")
+        self.rate_limiter = RateLimiter("huggy", HUGGY_RATE_LIMITS) if self.rate_limit_enabled else None
+
         if not self.api_token:
             logger.warning("⚠️ HUGGY_API_TOKEN não configurado. As chamadas à API falharão.")
 
+    @property
+    def _http(self) -> httpx.Client:
+        """Cliente HTTP compartilhado do processo (keep-alive entre chamadas)."""
+        return HttpClientRegistry.get(HTTP_CLIENT_NAME)
+
+    def _throttle(self, family: str):
+        """Espera a vez no token bucket compartilhado (todos os workers) antes de chamar a Huggy."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(family, self.priority)
+
+    def _request(self, family: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Circuit breaker da família -> rate limit -> pool HTTP, com o timeout adaptativo (p99).
+        Circuito aberto levanta CircuitOpenError (httpx.TransportError) sem esperar o timeout.
+        """
+        breaker = CircuitBreaker.for_endpoint("huggy", family, HUGGY_TIMEOUT)
+        send = getattr(self._http, method)
+        return breaker.call(
+            lambda read_timeout: send(url, timeout=read_timeout, **kwargs),
+            before=lambda: self._throttle(family),
+        )
+
     def _get_headers(self):
         return {
             "Authorization": f"Bearer {self.api_token}",
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
+
+    # Recusas definitivas da Huggy (payload inválido, chat inexistente): retornam False.
+    # Qualquer outro status de erro levanta HTTPStatusError; 429 e 5xx a outbox repete.
+    REFUSED_STATUS = (400, 404)
     
     def send_message(self, chat_id: int, message_key: str, variables: Dict[str, Any] = None, file_url: Optional[str] = None, force_internal: bool = False) -> bool:
         """
@@ -34,50 +97,31 @@ class HuggyClient:
             file_url: URL de mídia (sobrescreve o do JSON se existir).
             force_internal: Se True, força a mensagem a ser interna.
         """
-        template = MessageLoader.get(message_key)
-        if not template and not message_key.startswith("DYNAMIC"):
-            logger.error(f"❌ Template '{message_key}' não encontrado.")
-            return False
-        
-        raw_text = template.get("text", "")
-        final_text = raw_text
-
-        if variables and raw_text:
-            try:
-                final_text = raw_text.format(**variables)
-            except KeyError as e:
-                logger.error(f"⚠️ Falta variável {e} para mensagem '{message_key}'")
-                final_text = raw_text
-        
-        payload = {
-            "text": final_text
-        }
-
-        if "options" in template:
-            payload["options"] = template["options"]
+        message = MessageLoader.get_compiled(message_key)
+        if message is None:
+            if not message_key.startswith("DYNAMIC"):
+                logger.error(f"❌ Template '{message_key}' não encontrado.")
+                return False
+            message = CompiledMessage(message_key, {}, literal=True)
 
-        payload_file = file_url if file_url else template.get("file")
-        if payload_file:
-            payload["file"] = payload_file
-
-        is_internal = force_internal or template.get("isInternal", False)
-        payload["isInternal"] = is_internal
+        # Partes estáticas (options/file/isInternal) já vêm montadas do catálogo compilado
+        payload = message.build_payload(variables, file_url=file_url, force_internal=force_internal)
+        is_internal = payload["isInternal"]
 
         url = f"{self.base_url}/chats/{chat_id}/messages"
 
         try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.post(url, headers=self._get_headers(), json=payload)
-                response.raise_for_status()
-                
-                # Log rico para debug
-                log_extras = []
-                if "file" in payload: log_extras.append("📎 Com Arquivo")
-                if "options" in payload: log_extras.append("🔘 Com Botões")
-                if is_internal: log_extras.append("🔒 Interna")
-                
-                logger.info(f"📤 [Huggy] Msg '{message_key}' enviada. {' | '.join(log_extras)}")
-                return True
+            response = self._request("messages", "post", url, headers=self._get_headers(), json=payload)
+            response.raise_for_status()
+            
+            # Log rico para debug
+            log_extras = []
+            if "file" in payload: log_extras.append("📎 Com Arquivo")
+            if "options" in payload: log_extras.append("🔘 Com Botões")
+            if is_internal: log_extras.append("🔒 Interna")
+            
+            logger.info(f"📤 [Huggy] Msg '{message_key}' enviada. {' | '.join(log_extras)}")
+            return True
 
         except httpx.HTTPStatusError as e:
             logger.error(f"❌ Erro HTTP Huggy ({e.response.status_code}): {e.response.text}")
@@ -100,26 +144,29 @@ class HuggyClient:
             payload["variables"] = variables
 
         try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.post(url, headers=self._get_headers(), json=payload)
-                
-                # 200 OK - Sucesso (Body vazio)
-                if response.status_code == 200:
-                    logger.info(f"⚡ [Huggy] Flow {flow_id} disparado para Chat {chat_id}.")
-                    return True
-                
-                # 404/400 - Erros comuns
-                elif response.status_code in [400, 404]:
-                    logger.warning(f"⚠️ [Huggy] Falha ao disparar Flow {flow_id}: {response.text}")
-                    return False
-                
-                else:
-                    response.raise_for_status() # Lança erro para 5xx
-                    return False # Nunca chega aqui, mas agrada o linter
+            response = self._request("flow", "post", url, headers=self._get_headers(), json=payload)
+            
+            # 200 OK - Sucesso (Body vazio)
+            if response.status_code == 200:
+                logger.info(f"⚡ [Huggy] Flow {flow_id} disparado para Chat {chat_id}.")
+                return True
+            
+            # 404/400 - Erros comuns
+            elif response.status_code in self.REFUSED_STATUS:
+                logger.warning(f"⚠️ [Huggy] Falha ao disparar Flow {flow_id}: {response.text}")
+                return False
+            
+            else:
+                response.raise_for_status() # Lança erro para 429/5xx (a outbox repete)
+                return False # Nunca chega aqui, mas agrada o linter
 
         except httpx.HTTPStatusError as e:
-            logger.error(f"❌ Erro HTTP Huggy ao disparar flow: {e.response.text}")
-            return False # Aqui retornamos False para o Engine decidir o que fazer (ex: tentar outro método)
+            logger.error(f"❌ Erro HTTP Huggy ao disparar flow ({e.response.status_code}): {e.response.text}")
+            raise e
+        except httpx.TransportError as e:
+            # Huggy inalcançável (timeout, conexão, circuito aberto): a outbox repete o comando
+            logger.error(f"❌ Erro conexão Huggy: {str(e)}")
+            raise e
         except Exception as e:
             logger.error(f"❌ Erro conexão Huggy: {str(e)}")
             return False
@@ -138,17 +185,21 @@ class HuggyClient:
             action_name = f"mover para etapa {step_id}"
         
         try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.put(url, headers=self._get_headers(), json=payload)
-
-                if response.status_code == 200:
-                    logger.info(f"✅ [Huggy] Sucesso ao {action_name} (Chat {chat_id}).")
-                    return True
-                elif response.status_code == 404:
-                    logger.warning(f"⚠️ [Huggy] Chat {chat_id} não encontrado (404).")
-                else:
-                    logger.error(f"❌ [Huggy] Falha ao {action_name}: {response.status_code} - {response.text}")
-                    return False
+            response = self._request("workflow", "put", url, headers=self._get_headers(), json=payload)
+
+            if response.status_code == 200:
+                logger.info(f"✅ [Huggy] Sucesso ao {action_name} (Chat {chat_id}).")
+                return True
+            elif response.status_code in self.REFUSED_STATUS:
+                logger.warning(f"⚠️ [Huggy] Falha ao {action_name} (Chat {chat_id}): {response.status_code} - {response.text}")
+                return False
+            else:
+                logger.error(f"❌ [Huggy] Falha ao {action_name}: {response.status_code} - {response.text}")
+                response.raise_for_status() # Lança erro para 429/5xx (a outbox repete)
+                return False
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            logger.error(f"❌ Erro de conexão Huggy: {str(e)}")
+            raise e
         except Exception as e:
             logger.error(f"❌ Erro de conexão Huggy: {str(e)}")
             return False
@@ -170,19 +221,25 @@ class HuggyClient:
             payload["comment"] = comment
         
         try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.put(url, headers=self._get_headers(), json=payload)
-                
-                if response.status_code == 200:
-                    logger.info(f"checkered_flag [Huggy] Chat {chat_id} fechado com sucesso.")
-                    return True
-                elif response.status_code == 404:
-                    logger.warning(f"⚠️ [Huggy] Tentativa de fechar chat {chat_id} que não existe (404).")
-                    return False
-                else:
-                    logger.error(f"❌ [Huggy] Falha ao fechar chat {chat_id}: {response.status_code} - {response.text}")
-                    return False
-
+            response = self._request("close", "put", url, headers=self._get_headers(), json=payload)
+            
+            if response.status_code == 200:
+                logger.info(f"checkered_flag [Huggy] Chat {chat_id} fechado com sucesso.")
+                return True
+            elif response.status_code == 404:
+                logger.warning(f"⚠️ [Huggy] Tentativa de fechar chat {chat_id} que não existe (404).")
+                return False
+            elif response.status_code in self.REFUSED_STATUS:
+                logger.warning(f"⚠️ [Huggy] Huggy recusou o fechamento do chat {chat_id}: {response.text}")
+                return False
+            else:
+                logger.error(f"❌ [Huggy] Falha ao fechar chat {chat_id}: {response.status_code} - {response.text}")
+                response.raise_for_status() # Lança erro para 429/5xx (a outbox repete)
+                return False
+
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            logger.error(f"❌ Erro conexão Huggy ao fechar chat: {str(e)}")
+            raise e
         except Exception as e:
             logger.error(f"❌ Erro conexão Huggy ao fechar chat: {str(e)}")
             return False
@@ -10,8 +10,8 @@ class HuggyService:
     Cama de Facade (Fachada) que combina métodos da API para realizar ações de negócio.
     Correção: Delega chamadas de infraestrutura explicitamente para self.client.
     """
-    def __init__(self):
-        self.client = HuggyClient()
+    def __init__(self, priority: str = "high"):
+        self.client = HuggyClient(priority=priority)
 
         self.workflow_steps = {
             "WORKFLOW_STEP_AG_FORMALIZAR": os.getenv("HUGGY_WORKFLOW_STEP_AG_FORMALIZAR"),
@@ -1,16 +1,33 @@
 import os
-import redis
+from typing import Optional
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Header, HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from app.infrastructure.celery import celery_app
 from app.routers import webhooks
 from app.core.logger import setup_logging
+from app.infrastructure.metrics import Metrics
+from app.infrastructure.circuit_breaker import CircuitBreaker
+from app.integrations.facta.fgts.saldo_cache import SaldoCache
+from app.services.bot.outbox import Outbox
+from app.services.bot.content.message_loader import MessageLoader, InvalidCatalogError
+from app.utils.validators import cpf_hash_secret
 
 load_dotenv()
 
 setup_logging()
 
-app = FastAPI(title="Huggy Middleware")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sem o segredo o hash do CPF seria reversível: não sobe
+    cpf_hash_secret()
+    # Catálogo de mensagens: troca na hora quando o admin publica uma versão nova
+    MessageLoader.start_listener()
+    yield
+    MessageLoader.stop_listener()
+
+app = FastAPI(title="Huggy Middleware", lifespan=lifespan)
 
 app.include_router(webhooks.router)
 
@@ -46,23 +63,70 @@ async def check_celery():
     except Exception as e:
         return {"status": "error", "details": str(e)}
 
+@app.get("/admin/metrics", dependencies=[Depends(verify_admin_token)])
+async def get_metrics():
+    """
+    Contadores operacionais (ex: webhooks duplicados descartados).
+    🔒 Protegido: Exige header 'x-admin-token'
+    """
+    try:
+        counters = Metrics.snapshot()
+        return {
+            "status": "ok",
+            "counters": counters,
+            "fgts_saldo_cache_hit_ratio": SaldoCache.hit_ratio(counters),
+            "circuits_tripped": CircuitBreaker.tripped(),
+        }
+    except Exception as e:
+        return {"status": "error", "details": str(e)}
+
+@app.post("/admin/purge-saldo-cache", dependencies=[Depends(verify_admin_token)])
+async def purge_saldo_cache(cpf: Optional[str] = None):
+    """
+    Apaga o resultado cacheado do /fgts/saldo de um CPF (?cpf=...) ou de todos (sem parâmetro).
+    Útil quando o cliente resolveu a pendência (ex: autorizou a Facta) e quer consultar de novo.
+    🔒 Protegido: Exige header 'x-admin-token'
+    """
+    try:
+        removed = await run_in_threadpool(SaldoCache().purge, cpf)
+        return {"status": "success", "removed": removed}
+    except Exception as e:
+        return {"status": "error", "details": str(e)}
+
+@app.post("/admin/replay-outbox-dead", dependencies=[Depends(verify_admin_token)])
+async def replay_outbox_dead(limit: int = 100):
+    """
+    Devolve até 'limit' comandos de 'outbox:dead' (mais antigos primeiro) para a outbox
+    dos seus chats e dispara a drenagem. Útil depois de uma queda da Huggy.
+    🔒 Protegido: Exige header 'x-admin-token'
+    """
+    try:
+        chat_ids = await run_in_threadpool(Outbox().replay_dead, limit)
+        return {"status": "success", "chats": chat_ids}
+    except Exception as e:
+        return {"status": "error", "details": str(e)}
+
 @app.post("/admin/refresh-messages", dependencies=[Depends(verify_admin_token)])
 async def refresh_messages():
     """
-    Limpa o cache de mensagens no Redis.
-    Isso força o bot a baixar a versão mais recente do Gist na próxima interação.
+    Baixa o catálogo do Gist UMA vez, valida, publica com versão nova e avisa
+    (pub/sub) todos os processos da API e dos workers, que trocam o catálogo na hora.
+    Nenhuma conversa paga pelo download.
     🔒 Protegido: Exige header 'x-admin-token'
     """
     try:
-        redis_url = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
-
-        r = redis.from_url(redis_url, decode_responses=True)
+        messages = await run_in_threadpool(MessageLoader.fetch_remote)
+        if not messages:
+            return {"status": "error", "details": "Não foi possível baixar o catálogo (MESSAGES_URL)."}
 
-        r.delete("bot:content:messages")
+        version = await run_in_threadpool(MessageLoader.publish, messages)
 
         return {
             "status": "success",
-            "message": "Cache limpo! 🧹 A próxima mensagem será carregada do Gist."
+            "version": version,
+            "message": f"Catálogo v{version} publicado! 📣 Workers atualizados via pub/sub."
         }
+    except InvalidCatalogError as e:
+        return {"status": "error", "details": f"Catálogo inválido, nada foi publicado: {e}"}
     except Exception as e:
-        return {"status": "error", "details": str(e)}
\ No newline at end of file
+        return {"status": "error", "details": str(e)}
@@ -1,7 +1,8 @@
 import json
 from fastapi import APIRouter, HTTPException, Request
-from app.tasks.processor import process_webhook_event
+from app.tasks.processor import enqueue_webhook_events
 from app.events.dispatcher import EventDispatcher
+from app.infrastructure.idempotency import WebhookDeduplicator
 import logging
 
 router = APIRouter()
@@ -10,29 +11,51 @@ logger = logging.getLogger(__name__)
 @router.post("/webhook")
 async def receive_webhook(request: Request):
     """
-    Recebe o payload da Huggy.
-    1. Verifica se deve ser ignorado (Filtro Rápido).
-    2. Se válido (receivedAllMessage aprovada OU closedChat), enfileira.
+    Recebe o payload da Huggy (pode trazer vários eventos).
+    1. Quebra em eventos individuais e filtra cada um (Filtro Rápido).
+    2. Descarta reentregas da Huggy (índice de idempotência no Redis).
+    3. Enfileira os eventos válidos (receivedAllMessage aprovada OU closedChat) em lote.
     """
     try:
         payload = await request.json()
 
-        if EventDispatcher.should_filter_payload(payload):
+        events = EventDispatcher.split_payload(payload)
+        if not events:
             return {"status": "ignored", "reason": "Filtered by business rules"}
 
+        # Payload que não rende evento nenhum (formato inesperado) é descartado, não vira 500
+        pairs = [(event, next(EventDispatcher.iter_events(event), None)) for event in events]
+        events = [event for event, claim in pairs if claim is not None]
+        claims = [claim for _, claim in pairs if claim is not None]
+        if not events:
+            return {"status": "ignored", "reason": "No events in payload"}
+
+        deduplicator = WebhookDeduplicator()
+        duplicates = deduplicator.find_duplicates(claims)
+        claims = [claim for claim, duplicate in zip(claims, duplicates) if not duplicate]
+        events = [event for event, duplicate in zip(events, duplicates) if not duplicate]
+        if not events:
+            return {"status": "ignored", "reason": "Duplicate delivery"}
+
         if logger.isEnabledFor(logging.DEBUG):
             payload_str = json.dumps(payload, indent=2, ensure_ascii=False)
             logger.debug(f"📦 [DEBUG] Payload Recebido:\n{payload_str}")
 
-        task = process_webhook_event.delay(payload)
+        try:
+            task_ids = [task.id for task in enqueue_webhook_events(events)]
+        except Exception:
+            # Nada foi enfileirado: a reentrega da Huggy (após o 500) tem que passar
+            deduplicator.release(claims)
+            raise
 
-        logger.debug(f"📨 [API] Webhook recebido e enfileirado. Task ID: {task.id}")
+        logger.debug(f"📨 [API] Webhook recebido: {len(task_ids)} evento(s) enfileirado(s). Task IDs: {task_ids}")
 
         return {
             "status": "received",
-            "task_id": task.id,
-            "message": "Event queued for background processing."
+            "task_id": task_ids[0],
+            "task_ids": task_ids,
+            "message": f"{len(task_ids)} event(s) queued for background processing."
         }
     except Exception as e:
         logger.error(f"Erro ao processar webhook: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
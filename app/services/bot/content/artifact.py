@@ -0,0 +1,51 @@
+"""
+Artefato de build do catálogo de mensagens (messages.bin).
+
+Gerado por 'python -m app.sync_messages' a partir do messages.json já validado:
+catálogo bruto + templates compilados, serializados com marshal (carrega em
+microssegundos, sem parse de JSON nem de templates no boot dos workers).
+
+O marshal muda entre versões do Python: o cabeçalho guarda a versão que gerou o
+arquivo e, se não bater, o loader ignora o artefato e cai para o messages.json.
+"""
+import hashlib
+import marshal
+import sys
+from typing import Dict, Tuple
+from app.services.bot.content.templates import CompiledMessage
+
+ARTIFACT_FORMAT = 1
+MAGIC = b"HMSG"
+
+def _python_tag() -> bytes:
+    return f"{sys.version_info[0]}.{sys.version_info[1]}".encode()
+
+def source_digest(source: bytes) -> str:
+    return hashlib.sha256(source).hexdigest()[:16]
+
+def dump(messages: Dict[str, dict], compiled: Dict[str, CompiledMessage], digest: str = "") -> bytes:
+    body = marshal.dumps({
+        "format": ARTIFACT_FORMAT,
+        "digest": digest,
+        "messages": messages,
+        "compiled": {key: message.to_parts() for key, message in compiled.items()},
+    })
+    tag = _python_tag()
+    return MAGIC + bytes([len(tag)]) + tag + body
+
+def load(data: bytes) -> Tuple[Dict[str, dict], Dict[str, CompiledMessage], str]:
+    """Retorna (messages, compiled, digest). Lança ValueError se o artefato não servir."""
+    if not data.startswith(MAGIC):
+        raise ValueError("não é um artefato de mensagens")
+
+    size = data[len(MAGIC)]
+    tag = data[len(MAGIC) + 1:len(MAGIC) + 1 + size]
+    if tag != _python_tag():
+        raise ValueError(f"gerado no Python {tag.decode()}, este é {_python_tag().decode()}")
+
+    payload = marshal.loads(data[len(MAGIC) + 1 + size:])
+    if payload.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"formato {payload.get('format')} não suportado")
+
+    compiled = {key: CompiledMessage.from_parts(key, parts) for key, parts in payload["compiled"].items()}
+    return payload["messages"], compiled, payload.get("digest", "")
@@ -1,33 +1,104 @@
 import json
 import os
+import time
 import logging
+import threading
 import httpx
-import redis
-from typing import Dict
+from typing import Dict, Optional, Tuple
+from app.infrastructure.redis_client import get_redis
+from app.services.bot.content import artifact
+from app.services.bot.content.templates import CompiledMessage, TemplateError, compile_catalog
 
 logger = logging.getLogger(__name__)
 
+# Publica um catálogo novo de forma atômica e avisa todos os processos.
+# KEYS[1] = blob | KEYS[2] = frescor | KEYS[3] = etag | KEYS[4] = versão
+# ARGV[1] = catálogo (JSON) | ARGV[2] = TTL do frescor | ARGV[3] = etag ('' = nenhum) | ARGV[4] = canal
+PUBLISH_CATALOG_LUA = """
+redis.call('SET', KEYS[1], ARGV[1])
+redis.call('SET', KEYS[2], 1, 'EX', tonumber(ARGV[2]))
+if ARGV[3] ~= '' then
+    redis.call('SET', KEYS[3], ARGV[3])
+else
+    redis.call('DEL', KEYS[3])
+end
+local version = redis.call('INCR', KEYS[4])
+redis.call('PUBLISH', ARGV[4], version)
+return version
+"""
+
+class InvalidCatalogError(ValueError):
+    """Catálogo de mensagens fora do formato esperado: nunca é publicado."""
+
 class MessageLoader:
+    """
+    Catálogo de mensagens do bot.
+
+    Camadas:
+    1. Memória do processo (_catalog): um 'get' é só um lookup em dict.
+    2. Redis (bot:content:messages + bot:content:version): fonte compartilhada.
+       O processo só confere o carimbo de versão, no máximo a cada
+       MESSAGES_REVALIDATE_SECONDS, e só baixa/parseia o blob se a versão mudou.
+    3. Gist (MESSAGES_URL), renovado em background (stale-while-revalidate) por
+       UM processo de cada vez quando o frescor (TTL) vence; messages.json como fallback.
+
+    Toda publicação incrementa a versão e avisa no canal 'bot:content:updates';
+    cada processo (API e workers) escuta o canal e troca o catálogo na hora.
+    """
     _local_messages = {}
+    _local_compiled: Optional[Dict[str, CompiledMessage]] = None
     _loaded = False
 
-    REDIS_KEY = "bot:content:messages"
+    REDIS_KEY = "bot:content:messages"     # último catálogo bom (sem TTL)
+    VERSION_KEY = "bot:content:version"
+    FRESH_KEY = "bot:content:fresh"        # existe enquanto o catálogo está "fresco"
+    ETAG_KEY = "bot:content:etag"
+    REFRESH_LOCK_KEY = "lock:content:messages"
+    CHANNEL = "bot:content:updates"
     TTL = 600
+    REFRESH_LOCK_TIMEOUT = 30
+    REVALIDATE_SECONDS = float(os.getenv("MESSAGES_REVALIDATE_SECONDS", "30"))
+
+    # Catálogo em memória do processo
+    _catalog: Dict[str, dict] = {}
+    _compiled: Dict[str, CompiledMessage] = {}
+    _version: Optional[str] = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+    _refresh_thread: Optional[threading.Thread] = None
+    _listener_pid: Optional[int] = None
+    _listener_stop = threading.Event()
 
     @classmethod
     def _get_redis(cls):
-        redis_url = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
-        return redis.from_url(redis_url, decode_responses=True)
+        return get_redis(decode_responses=True)
+
+    @classmethod
+    def reset(cls):
+        """Esquece o catálogo em memória (testes)."""
+        with cls._lock:
+            cls._catalog = {}
+            cls._compiled = {}
+            cls._version = None
+            cls._checked_at = 0.0
+            cls._refresh_thread = None
 
     @classmethod
     def load_local(cls):
-        """Carrega do arquivo físico (Fallback de segurança)"""
+        """
+        Carrega do arquivo físico (Fallback de segurança).
+        Prefere o artefato compilado (messages.bin, gerado por sync_messages) se ele
+        corresponder ao messages.json atual; senão, faz o parse do JSON.
+        """
         if cls._loaded:
             return cls._local_messages
-        
+
         base_dir = os.path.dirname(os.path.abspath(__file__))
         json_path = os.path.join(base_dir, 'messages.json')
 
+        if cls._load_artifact(json_path, os.path.join(base_dir, 'messages.bin')):
+            return cls._local_messages
+
         try:
             with open(json_path, encoding='utf-8') as f:
                 cls._local_messages = json.load(f)
@@ -36,48 +107,276 @@ class MessageLoader:
         except Exception as e:
             logger.error(f"❌ [MessageLoader] Erro crítico ao carregar messages.json: {e}")
             cls._local_messages = {}
-        
+
         return cls._local_messages
-    
+
+    @classmethod
+    def _load_artifact(cls, json_path: str, artifact_path: str) -> bool:
+        if not os.path.exists(artifact_path):
+            return False
+
+        try:
+            with open(json_path, "rb") as f:
+                digest = artifact.source_digest(f.read())
+            with open(artifact_path, "rb") as f:
+                messages, compiled, built_from = artifact.load(f.read())
+        except Exception as e:
+            logger.warning(f"⚠️ [MessageLoader] Artefato messages.bin ignorado: {e}")
+            return False
+
+        if built_from != digest:
+            logger.warning("⚠️ [MessageLoader] messages.bin desatualizado em relação ao messages.json. Ignorando.")
+            return False
+
+        cls._local_messages = messages
+        cls._local_compiled = compiled
+        cls._loaded = True
+        logger.info("📦 [MessageLoader] Mensagens carregadas do artefato compilado.")
+        return True
+
     @classmethod
     def fetch_remote(cls) -> Dict:
         """Busca o JSON atualizdo na URL externa (Gist)"""
+        data, _, _ = cls._fetch_conditional(None)
+        return data or {}
+
+    @classmethod
+    def _fetch_conditional(cls, etag: Optional[str]) -> Tuple[Optional[Dict], Optional[str], bool]:
+        """
+        GET condicional no Gist (If-None-Match).
+        Retorna (dados | None, etag, not_modified).
+        """
         url = os.getenv("MESSAGES_URL")
-        if not url: return {}
+        if not url: return None, None, False
 
+        headers = {"If-None-Match": etag} if etag else {}
         try:
             with httpx.Client(timeout=5.0) as client:
-                resp = client.get(url)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    return data
+                resp = client.get(url, headers=headers)
+            if resp.status_code == 304:
+                return None, etag, True
+            if resp.status_code == 200:
+                return resp.json(), resp.headers.get("ETag"), False
+            logger.warning(f"⚠️ [MessageLoader] Gist respondeu {resp.status_code}.")
         except Exception as e:
             logger.warning(f"⚠️ [MessageLoader] Falha ao buscar mensagens remotas: {e}")
-        
-        return {}
-    
+
+        return None, None, False
+
     @classmethod
     def get(cls, key: str) -> dict:
+        return cls.catalog().get(key, {})
+
+    @classmethod
+    def get_compiled(cls, key: str) -> Optional[CompiledMessage]:
+        """Mensagem já compilada (campos exigidos + payload estático), pronta para envio."""
+        cls.catalog()
+        return cls._compiled.get(key)
+
+    @classmethod
+    def catalog(cls) -> Dict[str, dict]:
+        """Catálogo completo do processo, revalidado no máximo a cada REVALIDATE_SECONDS."""
+        if cls._catalog and time.monotonic() - cls._checked_at < cls.REVALIDATE_SECONDS:
+            return cls._catalog
+
+        with cls._lock:
+            # Outra thread/greenlet pode ter revalidado enquanto esperávamos
+            if not cls._catalog or time.monotonic() - cls._checked_at >= cls.REVALIDATE_SECONDS:
+                cls._revalidate()
+        return cls._catalog
+
+    @classmethod
+    def _install(cls, messages: Dict[str, dict], version: Optional[str],
+                 compiled: Optional[Dict[str, CompiledMessage]] = None):
+        cls._compiled = compiled if compiled is not None else compile_catalog(messages, strict=False)
+        cls._catalog = messages
+        cls._version = version
+        cls._checked_at = time.monotonic()
+
+    @classmethod
+    def _revalidate(cls):
+        try:
+            r = cls._get_redis()
+
+            # 1 RTT barato: carimbo de versão + existência do blob + frescor
+            pipe = r.pipeline(transaction=False)
+            pipe.get(cls.VERSION_KEY)
+            pipe.exists(cls.REDIS_KEY)
+            pipe.exists(cls.FRESH_KEY)
+            version, exists, fresh = pipe.execute()
+
+            if not fresh:
+                # Stale-while-revalidate: UM processo renova em background,
+                # todos continuam servindo o último catálogo bom
+                cls._refresh_in_background(r)
+
+            if exists and cls._catalog and version == cls._version:
+                cls._checked_at = time.monotonic()
+                return
+
+            if exists:
+                pipe = r.pipeline(transaction=False)
+                pipe.get(cls.REDIS_KEY)
+                pipe.get(cls.VERSION_KEY)
+                cached, version = pipe.execute()
+                if cached:
+                    cls._install(json.loads(cached), version)
+                    logger.info(f"📦 [MessageLoader] Catálogo carregado do Redis (versão {version}).")
+                    return
+        except Exception as e:
+            logger.warning(f"⚠️ [MessageLoader] Falha ao revalidar catálogo no Redis: {e}")
+
+        if cls._catalog:
+            cls._checked_at = time.monotonic()
+            return
+
+        # Nada no Redis ainda (1º boot) ou Redis fora: arquivo local enquanto o refresh roda
+        cls._install(cls.load_local(), None, cls._local_compiled)
+
+    @classmethod
+    def _refresh_in_background(cls, r):
+        """Single-flight entre TODOS os processos: só quem pega o lock no Redis busca o Gist."""
+        try:
+            acquired = r.set(cls.REFRESH_LOCK_KEY, "LOCKED", ex=cls.REFRESH_LOCK_TIMEOUT, nx=True)
+        except Exception as e:
+            logger.warning(f"⚠️ [MessageLoader] Erro no lock de refresh: {e}")
+            return
+
+        if not acquired:
+            return
+
+        thread = threading.Thread(target=cls.refresh, kwargs={"locked": True}, name="messages-refresh", daemon=True)
+        cls._refresh_thread = thread
+        thread.start()
+
+    @classmethod
+    def refresh(cls, locked: bool = False) -> Optional[str]:
+        """
+        Busca o Gist (GET condicional) e publica no Redis se mudou.
+        - 304: só renova o frescor (sem parse, sem versão nova).
+        - Falha: mantém o último catálogo bom; o lock expira sozinho
+          (REFRESH_LOCK_TIMEOUT) e serve de backoff até a próxima tentativa.
+        Retorna a versão publicada (ou None se nada mudou).
+        """
         r = cls._get_redis()
+        try:
+            etag = r.get(cls.ETAG_KEY) if r.exists(cls.REDIS_KEY) else None
+            data, new_etag, not_modified = cls._fetch_conditional(etag)
+
+            if not_modified:
+                r.set(cls.FRESH_KEY, 1, ex=cls.TTL)
+                logger.info("✅ [MessageLoader] Gist sem alterações (304).")
+                if locked:
+                    r.delete(cls.REFRESH_LOCK_KEY)
+                return None
+
+            if data:
+                version = cls.publish(data, new_etag)
+                if locked:
+                    r.delete(cls.REFRESH_LOCK_KEY)
+                return version
+        except InvalidCatalogError as e:
+            logger.error(f"❌ [MessageLoader] Catálogo do Gist rejeitado, mantendo o anterior: {e}")
+        except Exception as e:
+            logger.error(f"❌ [MessageLoader] Erro ao atualizar catálogo: {e}")
+
+        return None
+
+    @classmethod
+    def validate(cls, messages: Dict) -> Dict[str, CompiledMessage]:
+        """
+        Confere o formato do catálogo e compila os templates contra TEMPLATE_VARIABLES.
+        Lança InvalidCatalogError se algo estiver errado. Retorna o catálogo compilado.
+        """
+        if not isinstance(messages, dict) or not messages:
+            raise InvalidCatalogError("catálogo vazio ou não é um objeto JSON")
+
+        for key, template in messages.items():
+            if not isinstance(template, dict):
+                raise InvalidCatalogError(f"'{key}' deveria ser um objeto")
+            if not isinstance(template.get("text", ""), str):
+                raise InvalidCatalogError(f"'{key}.text' deveria ser texto")
+            if not isinstance(template.get("options", []), list):
+                raise InvalidCatalogError(f"'{key}.options' deveria ser uma lista")
 
         try:
-            cached = r.get(cls.REDIS_KEY)
-            if cached:
-                messages = json.loads(cached)
-                return messages.get(key, {})
-        except Exception:
-            pass
+            return compile_catalog(messages, strict=True)
+        except TemplateError as e:
+            raise InvalidCatalogError(str(e))
 
-        logger.info("🔄 [MessageLoader] Cache expirado. Buscando atualizações...")
-        remote_data = cls.fetch_remote()
+    @classmethod
+    def publish(cls, messages: Dict[str, dict], etag: Optional[str] = None) -> str:
+        """
+        Valida e publica um catálogo novo: grava no Redis (último bom, sem TTL),
+        renova o frescor, incrementa a versão e avisa todos os processos (pub/sub).
+        """
+        compiled = cls.validate(messages)
+        r = cls._get_redis()
+        version = str(r.eval(
+            PUBLISH_CATALOG_LUA, 4,
+            cls.REDIS_KEY, cls.FRESH_KEY, cls.ETAG_KEY, cls.VERSION_KEY,
+            json.dumps(messages, ensure_ascii=False, separators=(",", ":")), cls.TTL, etag or "", cls.CHANNEL,
+        ))
+        cls._install(messages, version, compiled)
+        logger.info(f"✅ [MessageLoader] Mensagens atualizadas e cacheadas (versão {version}).")
+        return version
+
+    # --- Invalidação por pub/sub ---
+    @classmethod
+    def start_listener(cls):
+        """Sobe (uma vez por processo) a thread que escuta as publicações de catálogo."""
+        if cls._listener_pid == os.getpid():
+            return
+        cls._listener_pid = os.getpid()
+        cls._listener_stop.clear()
+        threading.Thread(target=cls._listen, name="messages-listener", daemon=True).start()
 
-        if remote_data:
+    @classmethod
+    def stop_listener(cls):
+        cls._listener_stop.set()
+        cls._listener_pid = None
+
+    @classmethod
+    def _listen(cls):
+        backoff = 1
+        while not cls._listener_stop.is_set():
+            pubsub = None
             try:
-                r.set(cls.REDIS_KEY, json.dumps(remote_data), ex=cls.TTL)
-                logger.info("✅ [MessageLoader] Mensagens atualizadas e cacheadas.")
-                return remote_data.get(key, {})
+                pubsub = cls._get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(cls.CHANNEL)
+                logger.info("📡 [MessageLoader] Ouvindo atualizações do catálogo.")
+                backoff = 1
+
+                while not cls._listener_stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        cls._on_update(str(message["data"]))
             except Exception as e:
-                logger.error(f"❌ Erro ao salvar cache: {e}")
-        
-        local_data = cls.load_local()
-        return local_data.get(key, {})
\ No newline at end of file
+                logger.warning(f"⚠️ [MessageLoader] Listener caiu ({e}). Reconectando em {backoff}s...")
+                cls._listener_stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    @classmethod
+    def _on_update(cls, version: str):
+        """Aviso de versão nova: troca o catálogo do processo na hora."""
+        if version == cls._version:
+            return
+
+        r = cls._get_redis()
+        pipe = r.pipeline(transaction=False)
+        pipe.get(cls.REDIS_KEY)
+        pipe.get(cls.VERSION_KEY)
+        cached, current = pipe.execute()
+        if not cached:
+            return
+
+        messages = json.loads(cached)
+        with cls._lock:
+            cls._install(messages, current)
+        logger.info(f"🔔 [MessageLoader] Catálogo trocado para a versão {current}.")
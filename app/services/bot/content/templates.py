@@ -0,0 +1,119 @@
+import logging
+from string import Formatter
+from typing import Any, Dict, FrozenSet, Mapping, Optional
+from app.core.messages import TEMPLATE_VARIABLES
+
+logger = logging.getLogger(__name__)
+
+_formatter = Formatter()
+
+class TemplateError(ValueError):
+    """Template com sintaxe inválida ou usando variáveis que o código não fornece."""
+
+class CompiledMessage:
+    """
+    Mensagem do catálogo pronta para envio, compilada UMA vez no carregamento:
+    - campos exigidos pelo texto (parse do str.format feito aqui, não a cada envio);
+    - partes estáticas do payload da Huggy (options, file, isInternal) já montadas.
+    """
+    __slots__ = ("key", "text", "fields", "static_payload", "file")
+
+    def __init__(self, key: str, template: dict, literal: bool = False):
+        self.key = key
+        self.text: str = template.get("text", "")
+        # literal=True: texto enviado como está, sem interpolar nada
+        self.fields: FrozenSet[str] = frozenset() if literal else self._parse_fields(key, self.text)
+        if not literal and not self.fields:
+            self.text = self.text.format()  # resolve '{{' / '}}' uma vez só
+        self.file: Optional[str] = template.get("file")
+
+        static_payload = {}
+        if "options" in template:
+            static_payload["options"] = template["options"]
+        static_payload["isInternal"] = bool(template.get("isInternal", False))
+        self.static_payload = static_payload
+
+    @staticmethod
+    def _parse_fields(key: str, text: str) -> FrozenSet[str]:
+        try:
+            fields = set()
+            for _, field_name, _, _ in _formatter.parse(text):
+                if field_name is None:
+                    continue
+                if field_name == "" or field_name.isdigit():
+                    raise TemplateError(f"'{key}' usa campo posicional; use nomes (ex: {{valor}})")
+                # {conta.banco} / {itens[0]} -> variável raiz
+                fields.add(field_name.split(".", 1)[0].split("[", 1)[0])
+            return frozenset(fields)
+        except ValueError as e:
+            if isinstance(e, TemplateError):
+                raise
+            raise TemplateError(f"'{key}' tem chaves desbalanceadas no texto: {e}")
+
+    def to_parts(self) -> tuple:
+        """Forma serializável (marshal) da mensagem compilada, para o artefato de build."""
+        return (self.text, tuple(sorted(self.fields)), self.static_payload, self.file)
+
+    @classmethod
+    def from_parts(cls, key: str, parts: tuple) -> "CompiledMessage":
+        """Reconstrói a mensagem do artefato sem refazer o parse."""
+        text, fields, static_payload, file = parts
+        message = cls.__new__(cls)
+        message.key = key
+        message.text = text
+        message.fields = frozenset(fields)
+        message.static_payload = static_payload
+        message.file = file
+        return message
+
+    def check_contract(self, provided: FrozenSet[str]):
+        missing = self.fields - provided
+        if missing:
+            raise TemplateError(
+                f"'{self.key}' usa {sorted(missing)}, mas o código só fornece {sorted(provided) or 'nenhuma variável'}"
+            )
+
+    def render(self, variables: Optional[Mapping[str, Any]] = None) -> str:
+        if not self.fields:
+            return self.text
+
+        variables = variables or {}
+        missing = self.fields.difference(variables)
+        if missing:
+            logger.error(f"⚠️ Falta variável {sorted(missing)} para mensagem '{self.key}'")
+            return self.text
+
+        return self.text.format_map(variables)
+
+    def build_payload(self, variables: Optional[Mapping[str, Any]] = None, file_url: Optional[str] = None,
+                      force_internal: bool = False) -> Dict[str, Any]:
+        payload = {"text": self.render(variables), **self.static_payload}
+
+        payload_file = file_url or self.file
+        if payload_file:
+            payload["file"] = payload_file
+
+        if force_internal:
+            payload["isInternal"] = True
+
+        return payload
+
+def compile_catalog(messages: Dict[str, dict], strict: bool = True) -> Dict[str, CompiledMessage]:
+    """
+    Compila todas as mensagens do catálogo.
+    strict=True: qualquer template quebrado (sintaxe ou variável fora de TEMPLATE_VARIABLES)
+    lança TemplateError -> o catálogo inteiro é rejeitado.
+    strict=False: usado só no fallback local; templates quebrados são enviados como texto puro.
+    """
+    compiled = {}
+    for key, template in messages.items():
+        try:
+            message = CompiledMessage(key, template)
+            message.check_contract(TEMPLATE_VARIABLES.get(key, frozenset()))
+        except TemplateError as e:
+            if strict:
+                raise
+            logger.error(f"❌ [Templates] {e}")
+            message = CompiledMessage(key, template, literal=True)
+        compiled[key] = message
+    return compiled
@@ -0,0 +1,42 @@
+import logging
+from typing import Callable, Dict, List
+from app.services.bot.memory.session import ChatSession
+
+logger = logging.getLogger(__name__)
+
+class DeferredHuggy:
+    """
+    Fachada 'gravadora' do HuggyService.
+    Cada chamada (send_message, finish_attendance, ...) vira um comando na ChatSession,
+    gravado na outbox junto com a transição (commit) e executado pela task 'drain_outbox'.
+    'priority' segue para o rate limit da Huggy ('low' = tráfego de fundo).
+    """
+    def __init__(self, chat_session: ChatSession, huggy, priority: str = "high"):
+        self._session = chat_session
+        self._priority = priority
+        # Dados de configuração continuam acessíveis (ex: tabulações)
+        self.tabulations = huggy.tabulations
+
+    def __getattr__(self, op: str):
+        def record(*args, **kwargs):
+            self._session.emit_outbound(op, *args, priority=self._priority, **kwargs)
+        return record
+
+def run_effects(huggy, effects: List[dict], local_handlers: Dict[str, Callable] = None):
+    """
+    Executa os efeitos locais em ordem (ex: 'schedule_timeout').
+    Operações fora de 'local_handlers' são delegadas ao 'huggy'.
+
+    A transição já foi gravada: uma falha aqui é registrada e NÃO repete o Engine
+    (repetir reavaliaria a mensagem num estado já avançado).
+    """
+    local_handlers = local_handlers or {}
+
+    for effect in effects:
+        op = effect["op"]
+        handler = local_handlers.get(op) or getattr(huggy, op)
+
+        try:
+            handler(*effect.get("args", []), **effect.get("kwargs", {}))
+        except Exception as e:
+            logger.error(f"❌ [Effects] Falha ao executar '{op}': {e}")
@@ -1,9 +1,11 @@
 import logging
-from app.services.bot.memory.session import SessionManager
+from app.services.bot.memory.session import SessionManager, ChatSession, SessionConflictError
+from app.services.bot.effects import DeferredHuggy, run_effects
+from app.services.bot.outbox import Outbox
 from app.integrations.huggy.service import HuggyService
 from app.services.products.fgts_service import FGTSService 
 from app.schemas.credit import AnalysisStatus
-from app.tasks.monitor import check_inactivity
+from app.infrastructure.timers import TimerService
 from app.core.timeouts import TIMEOUT_POLICES
 from app.utils.validators import validate_cpf, clean_digits
 
@@ -13,28 +15,76 @@ logger = logging.getLogger(__name__)
 class BotEngine:
     """
     Máquina de Estados que decide o fluxo da conversa.
+
+    Concorrência: a transição é gravada com compare-and-set (estado + versão).
+    Se outro worker mexeu no chat no meio do caminho, a mensagem é reavaliada
+    sobre o estado novo e os efeitos (mensagens Huggy) da tentativa perdida
+    nunca são executados. Se o chat foi finalizado ou limpo (closedChat) nesse
+    meio tempo, a mensagem é descartada em vez de recomeçar do START.
+
+    Efeitos na Huggy: o Engine não chama a API. Os comandos entram na outbox do chat
+    no mesmo commit da transição e a task 'drain_outbox' os executa em ordem, repetindo
+    só o comando que falhar (a Facta nunca é consultada de novo por causa da Huggy).
     """
+    MAX_ATTEMPTS = 3
+
+    # Conflito contra estes estados = chat encerrado (FINISHED) ou sessão apagada pelo
+    # closedChat (volta a ler START): reavaliar mandaria o menu de boas-vindas de novo.
+    ABORT_ON_CONFLICT = ("START", "FINISHED")
+
+    # Acima do task_time_limit (120s): se ainda está "simulando", o worker morreu.
+    SIMULATION_STALE_AFTER = 150
+
     def __init__(self):
         self.session = SessionManager()
         self.huggy = HuggyService()
         self.fgts_service = FGTSService()
+        self.timers = TimerService()
+        self.outbox = Outbox()
 
     def _schedule_timeout(self, chat_id: int, state: str, interaction_time: int):
         """
-        Verifica se existe uma regra de timeout para o estado 'state' e agenda a task no Celery.
+        Verifica se existe uma regra de timeout para o estado 'state' e (re)agenda o timer do chat.
+        Sem regra, o timer anterior é cancelado (não dispara à toa).
         """
         rule = TIMEOUT_POLICES.get(state)
 
         if rule:
-            check_inactivity.apply_async(
-                args=[chat_id, state, interaction_time],
-                countdown=rule['delay']
-            )
+            self.timers.schedule("inactivity", chat_id, rule['delay'], [chat_id, state, interaction_time])
+        else:
+            self.timers.cancel("inactivity", chat_id)
 
     def process(self, chat_id: int, message_text: str):
-        interaction_time = self.session.touch(chat_id)
-        current_state = self.session.get_state(chat_id)
-        context = self.session.get_context(chat_id)
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                self._process_once(chat_id, message_text)
+                return
+            except SessionConflictError as e:
+                if e.current_state in self.ABORT_ON_CONFLICT:
+                    logger.info(f"🛑 [Engine] Chat {chat_id} encerrado durante o processamento ({e.current_state}). Mensagem descartada: '{message_text}'")
+                    return
+                logger.warning(f"🔁 [Engine] Conflito no Chat {chat_id} ({e.current_state}). Reavaliando ({attempt}/{self.MAX_ATTEMPTS})...")
+
+        logger.error(f"❌ [Engine] Chat {chat_id}: conflitos seguidos. Mensagem descartada: '{message_text}'")
+
+    def _commit(self, chat_session: ChatSession):
+        """
+        Grava a transição + comandos da Huggy (CAS), executa os efeitos locais
+        e acorda o drenador da outbox do chat.
+        """
+        has_outbound = bool(chat_session.outbound)
+        chat_session.commit()
+        run_effects(self.huggy, chat_session.pop_effects(), {"schedule_timeout": self._schedule_timeout})
+        if has_outbound:
+            self.outbox.dispatch(chat_session.chat_id)
+
+    def _process_once(self, chat_id: int, message_text: str):
+        # Unit of Work: 1 RTT para ler tudo, 1 RTT (CAS) para gravar no final
+        chat_session = self.session.begin(chat_id)
+        huggy = DeferredHuggy(chat_session, self.huggy)
+        interaction_time = chat_session.interaction_time
+        current_state = chat_session.state
+        context = chat_session.context
 
         logger.info(f"🤖 [Engine] Chat: {chat_id} | Estado: {current_state} | Input: '{message_text}'")
 
@@ -44,72 +94,72 @@ class BotEngine:
 
         # 0. Início
         if current_state == "START":
-            self.huggy.send_message(chat_id, "menu_bem_vindo")
+            huggy.send_message(chat_id, "menu_bem_vindo")
             next_state = "MENU_APRESENTACAO"
-            self._schedule_timeout(chat_id, next_state, interaction_time)
+            chat_session.emit("schedule_timeout", chat_id, next_state, interaction_time)
 
         # 1. Menu Inicial
         elif current_state == "MENU_APRESENTACAO":
             opt = message_text.strip()
 
             if opt == "1": # CLT
-                self.huggy.send_message(chat_id, "pedir_cpf")
+                huggy.send_message(chat_id, "pedir_cpf")
                 next_state = "CLT_AGUARDANDO_CPF"
-                self._schedule_timeout(chat_id, next_state, interaction_time)
+                chat_session.emit("schedule_timeout", chat_id, next_state, interaction_time)
             
             elif opt == "2": # FGTS
-                self.huggy.send_message(chat_id, "pedir_cpf")
+                huggy.send_message(chat_id, "pedir_cpf")
                 next_state = "FGTS_AGUARDANDO_CPF"
-                self._schedule_timeout(chat_id, next_state, interaction_time)
+                chat_session.emit("schedule_timeout", chat_id, next_state, interaction_time)
             
             else:
-                self._handoff_human(chat_id)
+                self._handoff_human(huggy, chat_id)
                 next_state = "FINISHED"
         
         elif current_state == "MENU_TIMEOUT_1":
             opt = message_text.strip()
 
             if opt == "1": # CLT
-                self.huggy.send_message(chat_id, "pedir_cpf")
+                huggy.send_message(chat_id, "pedir_cpf")
                 next_state = "CLT_AGUARDANDO_CPF"
-                self._schedule_timeout(chat_id, next_state, interaction_time)
+                chat_session.emit("schedule_timeout", chat_id, next_state, interaction_time)
 
             elif opt == "2": # FGTS
-                self.huggy.send_message(chat_id, "pedir_cpf")
+                huggy.send_message(chat_id, "pedir_cpf")
                 next_state = "FGTS_AGUARDANDO_CPF"
-                self._schedule_timeout(chat_id, next_state, interaction_time)
+                chat_session.emit("schedule_timeout", chat_id, next_state, interaction_time)
 
             else:
-                self._handoff_human(chat_id)
+                self._handoff_human(huggy, chat_id)
                 next_state = "FINISHED"
 
         elif current_state == "MENU_TIMEOUT_2":
             opt = message_text.strip()
 
             if opt == "1": # CLT
-                self.huggy.send_message(chat_id, "pedir_cpf")
+                huggy.send_message(chat_id, "pedir_cpf")
                 next_state = "CLT_AGUARDANDO_CPF"
-                self._schedule_timeout(chat_id, next_state, interaction_time)
+                chat_session.emit("schedule_timeout", chat_id, next_state, interaction_time)
 
             elif opt == "2": # FGTS
-                self.huggy.send_message(chat_id, "pedir_cpf")
+                huggy.send_message(chat_id, "pedir_cpf")
                 next_state = "FGTS_AGUARDANDO_CPF"
-                self._schedule_timeout(chat_id, next_state, interaction_time)
+                chat_session.emit("schedule_timeout", chat_id, next_state, interaction_time)
 
             else:
-                self._handoff_human(chat_id)
+                self._handoff_human(huggy, chat_id)
                 next_state = "FINISHED"
 
         elif current_state == "CPF_TIMEOUT":
             opt = message_text.strip()
 
             if opt == "1": # Sim
-                self.huggy.start_auto_distribution(chat_id)
+                huggy.start_auto_distribution(chat_id)
                 next_state = "FINISHED"
             
             elif opt == "2": # Não
-                self.huggy.send_message(chat_id, "sem_interesse")
-                self.huggy.finish_attendance(chat_id, tabulation_id=self.huggy.tabulations.get("SEM_INTERESSE"))
+                huggy.send_message(chat_id, "sem_interesse")
+                huggy.finish_attendance(chat_id, tabulation_id=huggy.tabulations.get("SEM_INTERESSE"))
                 next_state = "FINISHED"
 
         # ---------------------------------------------------------
@@ -121,19 +171,19 @@ class BotEngine:
             if validate_cpf(cpf_limpo):
                 # CPF VÁLIDO
                 context["cpf"] = cpf_limpo
-                self.session.set_context(chat_id, context)
+                chat_session.set_context(context)
 
-                self.huggy.send_message(chat_id, "tempo_de_registro")
+                huggy.send_message(chat_id, "tempo_de_registro")
                 next_state = "CLT_AGUARDANDO_TEMPO_REGISTRO"
             
             else:
                 # CPF INVÁLIDO
                 if current_state == "CLT_AGUARDANDO_CPF":
-                    self.huggy.send_message(chat_id, "cpf_invalido")
+                    huggy.send_message(chat_id, "cpf_invalido")
                     next_state = "CLT_CPF_INVALIDO"
                 else:
-                    self.huggy.send_message(chat_id, "cpf_invalido_fallback", force_internal=True)
-                    self.huggy.start_auto_distribution(chat_id)
+                    huggy.send_message(chat_id, "cpf_invalido_fallback", force_internal=True)
+                    huggy.start_auto_distribution(chat_id)
                     next_state = "FINISHED"
 
         # Lógica de CLT_AGUARDANDO_TEMPO_REGISTRO
@@ -141,13 +191,13 @@ class BotEngine:
             opt = message_text.strip()
 
             if opt == "1": # Possui o mínimo de 6 meses.
-                self.huggy.send_message(chat_id, "iniciando_simulacao") # Retorno genérico pois ainda não temos o service do clt
-                self.huggy.start_auto_distribution(chat_id)
+                huggy.send_message(chat_id, "iniciando_simulacao") # Retorno genérico pois ainda não temos o service do clt
+                huggy.start_auto_distribution(chat_id)
                 next_state = "FINISHED"
             
             elif opt == "2": # Não possui o mínimo de 6 meses.
-                self.huggy.send_message(chat_id, "requirements_fail")
-                self.huggy.finish_attendance(chat_id, tabulation_id=self.huggy.tabulations.get("MENOS_SEIS_MESES"))
+                huggy.send_message(chat_id, "requirements_fail")
+                huggy.finish_attendance(chat_id, tabulation_id=huggy.tabulations.get("MENOS_SEIS_MESES"))
                 next_state = "FINISHED"
 
         # ---------------------------------------------------------
@@ -159,16 +209,21 @@ class BotEngine:
             if validate_cpf(cpf_limpo):
                 # 1. Salvar Contexto
                 context["cpf"] = cpf_limpo
-                self.session.set_context(chat_id, context)
+                chat_session.set_context(context)
 
                 # 2. Feedback de "Simulando..."
-                # Não mudamos para um estado intermediário, executamos já.
-                self.huggy.send_message(chat_id, "iniciando_simulacao")
+                # Reivindica a simulação (CAS) ANTES de consultar a Facta: um segundo
+                # worker com a mesma mensagem verá FGTS_SIMULANDO e não repete a consulta.
+                huggy.send_message(chat_id, "iniciando_simulacao")
+                context["simulando_desde"] = interaction_time
+                chat_session.set_context(context)
+                chat_session.set_state("FGTS_SIMULANDO")
+                self._commit(chat_session)
                 
                 # Chama o Service Global
                 oferta = self.fgts_service.consultar_melhor_oportunidade(cpf_limpo)
 
-                self.huggy.send_message(
+                huggy.send_message(
                     chat_id,
                     oferta.message_key,
                     variables=oferta.variables,
@@ -176,62 +231,74 @@ class BotEngine:
                 )
 
                 if oferta.status == AnalysisStatus.APROVADO:
-                    self.huggy.move_to_aprovado(chat_id)
-                    self.huggy.start_auto_distribution(chat_id)
+                    huggy.move_to_aprovado(chat_id)
+                    huggy.start_auto_distribution(chat_id)
                     next_state = "FINISHED"
 
                 if oferta.status == AnalysisStatus.SEM_AUTORIZACAO:
-                    self.huggy.start_flow_authorization(chat_id)
+                    huggy.start_flow_authorization(chat_id)
                     next_state = "FINISHED"
 
                 if oferta.status == AnalysisStatus.SEM_ADESAO:
-                    self.huggy.start_auto_distribution(chat_id)
+                    huggy.start_auto_distribution(chat_id)
                     next_state = "FINISHED"
 
                 if oferta.status == AnalysisStatus.MUDANCAS_CADASTRAIS:
-                    self.huggy.finish_attendance(chat_id, tabulation_id=self.huggy.tabulations.get("MUDANCAS_CADASTRAIS"))
+                    huggy.finish_attendance(chat_id, tabulation_id=huggy.tabulations.get("MUDANCAS_CADASTRAIS"))
                     next_state = "FINISHED"
                 
                 if oferta.status == AnalysisStatus.ANIVERSARIANTE:
-                    self.huggy.finish_attendance(chat_id, tabulation_id=self.huggy.tabulations.get("ANIVERSARIANTE"))
+                    huggy.finish_attendance(chat_id, tabulation_id=huggy.tabulations.get("ANIVERSARIANTE"))
                     next_state = "FINISHED"
                 
                 if oferta.status == AnalysisStatus.SALDO_NAO_ENCONTRADO:
-                    self.huggy.finish_attendance(chat_id, tabulation_id=self.huggy.tabulations.get("SALDO_NAO_ENCONTRADO"))
+                    huggy.finish_attendance(chat_id, tabulation_id=huggy.tabulations.get("SALDO_NAO_ENCONTRADO"))
                     next_state = "FINISHED"
 
                 if oferta.status == AnalysisStatus.SEM_SALDO:
-                    self.huggy.finish_attendance(chat_id, tabulation_id=self.huggy.tabulations.get("SEM_SALDO"))
+                    huggy.finish_attendance(chat_id, tabulation_id=huggy.tabulations.get("SEM_SALDO"))
                     next_state = "FINISHED"
                 
                 if oferta.status == AnalysisStatus.LIMITE_EXCEDIDO_CONSULTAS_FGTS:
-                    self.huggy.start_auto_distribution(chat_id)
+                    huggy.start_auto_distribution(chat_id)
                     next_state = "FINISHED"
                 
                 if oferta.status == AnalysisStatus.RETORNO_DESCONHECIDO:
-                    self.huggy.start_auto_distribution(chat_id)
+                    huggy.start_auto_distribution(chat_id)
                     next_state = "FINISHED"
             
             else:
                 # CPF INVÁLIDO (Lógica de retry)
                 if current_state == "FGTS_AGUARDANDO_CPF":
-                    self.huggy.send_message(chat_id, "cpf_invalid")
+                    huggy.send_message(chat_id, "cpf_invalido")
                     next_state = "FGTS_CPF_INVALIDO"
                 else:
-                    self.huggy.send_message(chat_id, "cpf_invalido_fallback", force_internal=True)
-                    self.huggy.start_auto_distribution(chat_id)
+                    huggy.send_message(chat_id, "cpf_invalido_fallback", force_internal=True)
+                    huggy.start_auto_distribution(chat_id)
                     next_state = "FINISHED"
 
+        # 3. Simulação em andamento (outro worker está consultando a Facta)
+        elif current_state == "FGTS_SIMULANDO":
+            if interaction_time - context.get("simulando_desde", 0) < self.SIMULATION_STALE_AFTER:
+                logger.info(f"⏳ Chat {chat_id} ignorado (Simulação em andamento).")
+                return
+
+            logger.warning(f"⚠️ [Engine] Chat {chat_id} preso em FGTS_SIMULANDO. Transferindo para humano.")
+            self._handoff_human(huggy, chat_id)
+            next_state = "FINISHED"
+
         # 4. Estado Final
         elif current_state == "FINISHED":
             logger.info(f"Chat {chat_id} ignorado (Fluxo finalizado).")
             return
 
-        # 5. Persistência
-        if next_state != current_state:
-            self.session.set_state(chat_id, next_state)
+        # 5. Persistência (commit único + efeitos)
+        if next_state != chat_session.state:
+            chat_session.set_state(next_state)
+
+        self._commit(chat_session)
     
-    def _handoff_human(self, chat_id: int):
+    def _handoff_human(self, huggy, chat_id: int):
         """Helper para transferir em caso de erro/imcompreensão"""
-        self.huggy.send_message(chat_id, "atendente_fallback")
-        self.huggy.start_auto_distribution(chat_id)
\ No newline at end of file
+        huggy.send_message(chat_id, "atendente_fallback")
+        huggy.start_auto_distribution(chat_id)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import os
+import logging
+from typing import List, Optional
+from app.core.debounce import DEBOUNCE_POLICIES, DebouncePolicy
+from app.infrastructure.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Só entrega o buffer se o token ainda for o último (nenhuma mensagem chegou depois).
+# KEYS[1] = lista de mensagens | KEYS[2] = sequência | ARGV[1] = token
+DRAIN_LUA = """
+local seq = redis.call('GET', KEYS[2])
+if not seq or seq ~= ARGV[1] then
+    return false
+end
+local messages = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1], KEYS[2])
+return messages
+"""
+
+class MessageDebouncer:
+    """
+    Agrupa mensagens rápidas do mesmo chat numa janela curta (por estado),
+    para o Engine receber UMA entrada ("123.456" + "789-09" -> "12345678909").
+    Ligado via BOT_DEBOUNCE_ENABLED.
+    """
+    def __init__(self):
+        self.redis_client = get_redis(decode_responses=True)
+        self.enabled = os.getenv("BOT_DEBOUNCE_ENABLED", "false").lower() in ("1", "true", "yes")
+        self._drain_script = self.redis_client.register_script(DRAIN_LUA)
+
+    def _get_key(self, chat_id: int) -> str:
+        return f"debounce:{chat_id}"
+
+    def _get_key_seq(self, chat_id: int) -> str:
+        return f"debounce:{chat_id}:seq"
+
+    def policy_for(self, state: str) -> Optional[DebouncePolicy]:
+        if not self.enabled:
+            return None
+        return DEBOUNCE_POLICIES.get(state)
+
+    def buffer(self, chat_id: int, message_text: str, policy: DebouncePolicy) -> int:
+        """
+        Guarda a mensagem no buffer do chat e devolve o token desta mensagem.
+        Só o flush com o token mais recente entrega o lote.
+        """
+        ttl = policy["window"] * 10
+
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.rpush(self._get_key(chat_id), message_text)
+        pipe.expire(self._get_key(chat_id), ttl)
+        pipe.incr(self._get_key_seq(chat_id))
+        pipe.expire(self._get_key_seq(chat_id), ttl)
+        _, _, token, _ = pipe.execute()
+        return int(token)
+
+    def drain(self, chat_id: int, token: int) -> Optional[List[str]]:
+        """
+        Retorna as mensagens acumuladas se 'token' for o último; None se chegou
+        mensagem nova depois (o flush dela é quem entrega).
+        """
+        messages = self._drain_script(keys=[self._get_key(chat_id), self._get_key_seq(chat_id)], args=[token])
+        return messages or None
+
+    def discard(self, chat_id: int):
+        """Descarta o buffer do chat (closedChat): um flush atrasado não entrega mais nada."""
+        self.redis_client.delete(self._get_key(chat_id), self._get_key_seq(chat_id))
+
+    @staticmethod
+    def coalesce(messages: List[str], join: str) -> str:
+        parts = [m.strip() for m in messages if m and m.strip()]
+        if not parts:
+            return ""
+        if join == "last":
+            return parts[-1]
+        if join == "concat":
+            return "".join(parts)
+        return " ".join(parts)
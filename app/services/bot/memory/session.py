@@ -1,52 +1,337 @@
-import redis
 import os
 import logging
 import json
 import time
+from typing import List, Optional
+from app.infrastructure.redis_client import get_redis
+from app.services.bot.outbox import Outbox
 
 logger = logging.getLogger(__name__)
 
+# Campos do hash 'chat:{id}'
+FIELD_STATE = "state"
+FIELD_CONTEXT = "context"
+FIELD_INTERACTION = "last_interaction"
+FIELD_VERSION = "version"
+
+# Compare-and-set atômico no servidor: só aplica a transição se o estado E a versão
+# ainda forem os que o worker leu. Caso contrário devolve o que está gravado agora.
+# Junto com a transição, os comandos para a Huggy entram na outbox do chat (mesma atomicidade).
+# KEYS[1] = chat:{id} | KEYS[2] = outbox:{id} | KEYS[3] = outbox:pending | KEYS[4..] = chaves legadas (sessão migrada)
+# ARGV[1] = estado esperado | ARGV[2] = versão esperada | ARGV[3] = TTL | ARGV[4] = chat_id
+# ARGV[5] = nº de comandos (n) | ARGV[6..5+n] = comandos (JSON) | ARGV[6+n..] = campo, valor, ...
+CAS_TRANSITION_LUA = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if not state and KEYS[4] then state = redis.call('GET', KEYS[4]) end
+if not state then state = 'START' end
+local version = tonumber(redis.call('HGET', KEYS[1], 'version') or '0')
+
+if state ~= ARGV[1] or version ~= tonumber(ARGV[2]) then
+    return {0, state, version}
+end
+
+local commands = tonumber(ARGV[5])
+for i = 6 + commands, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+
+if commands > 0 then
+    for i = 6, 5 + commands do
+        redis.call('RPUSH', KEYS[2], ARGV[i])
+    end
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    local t = redis.call('TIME')
+    redis.call('ZADD', KEYS[3], 'NX', tonumber(t[1]), ARGV[4])
+end
+
+for i = 4, #KEYS do
+    redis.call('DEL', KEYS[i])
+end
+
+return {1, redis.call('HGET', KEYS[1], 'state') or state, version}
+"""
+
+# Encerramento (closedChat), sem compare-and-set: apaga a sessão e TROCA a outbox do chat
+# pelos comandos de fechamento. O que ainda estava na fila nunca vai para um chat fechado.
+# KEYS[1] = chat:{id} | KEYS[2] = outbox:{id} | KEYS[3] = outbox:{id}:attempts | KEYS[4] = outbox:pending
+# KEYS[5..] = chaves legadas | ARGV[1] = chat_id | ARGV[2] = TTL | ARGV[3..] = comandos (JSON)
+CLOSE_LUA = """
+local existed = redis.call('EXISTS', KEYS[1])
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
+for i = 5, #KEYS do
+    existed = existed + redis.call('DEL', KEYS[i])
+end
+
+if #ARGV > 2 then
+    for i = 3, #ARGV do
+        redis.call('RPUSH', KEYS[2], ARGV[i])
+    end
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+    local t = redis.call('TIME')
+    redis.call('ZADD', KEYS[4], tonumber(t[1]), ARGV[1])
+else
+    redis.call('ZREM', KEYS[4], ARGV[1])
+end
+return existed
+"""
+
+class SessionConflictError(Exception):
+    """
+    Outro worker alterou a conversa entre a leitura e o commit.
+    O chamador deve recarregar a sessão e reavaliar a mensagem.
+    """
+    def __init__(self, chat_id: int, current_state: str, current_version: int):
+        self.chat_id = chat_id
+        self.current_state = current_state
+        self.current_version = current_version
+        super().__init__(f"Chat {chat_id} mudou para '{current_state}' (v{current_version}) durante o processamento.")
+
+class ChatSession:
+    """
+    Unit of Work de UMA mensagem processada pelo Engine.
+
+    - Leitura: state + context + touch(last_interaction) em um único pipeline (1 RTT).
+    - Escrita: mutações ficam em buffer e são gravadas no commit() por um
+      compare-and-set (Lua) sobre estado + versão (1 RTT).
+    - Comandos para a Huggy (emit_outbound) entram na outbox do chat NO MESMO commit;
+      quem executa é a task 'drain_outbox' (ver Outbox).
+    - Efeitos locais (agendamentos no Redis) são registrados com emit() e só
+      devem ser executados depois de um commit bem-sucedido.
+    """
+    def __init__(self, manager: "SessionManager", chat_id: int, state: str, context: dict, interaction_time: int,
+                 version: int = 0, last_interaction: int = 0, migrated: bool = False):
+        self._manager = manager
+        self.chat_id = chat_id
+        self.state = state
+        self.context = context
+        self.interaction_time = interaction_time
+        self.version = version
+        self.last_interaction = last_interaction
+        self.effects: List[dict] = []
+        self.outbound: List[tuple] = []
+
+        self._new_state: Optional[str] = None
+        self._new_context: Optional[dict] = None
+
+        # Sessão veio das chaves antigas: o commit grava no hash e apaga as legadas
+        self._migrated = migrated
+        if migrated:
+            self._new_state = state
+            self._new_context = context
+
+    def set_state(self, state: str):
+        self._new_state = state
+
+    def set_context(self, data: dict):
+        self._new_context = data
+
+    def emit(self, op: str, *args, **kwargs):
+        """Registra um efeito colateral para depois do commit (ex: 'send_message')."""
+        self.effects.append({"op": op, "args": list(args), "kwargs": kwargs})
+
+    def emit_outbound(self, op: str, *args, priority: str = "high", **kwargs):
+        """Registra um comando para a Huggy (ex: 'send_message'), gravado na outbox pelo commit."""
+        self.outbound.append((op, list(args), kwargs, priority))
+
+    def pop_effects(self) -> List[dict]:
+        effects, self.effects = self.effects, []
+        return effects
+
+    @property
+    def dirty(self) -> bool:
+        return (self._new_state is not None or self._new_context is not None
+                or bool(self.effects) or bool(self.outbound))
+
+    def commit(self) -> bool:
+        """
+        Aplica as mutações pendentes SE o estado e a versão lidos ainda forem os atuais.
+        Efeitos pendentes também contam: o commit 'reivindica' a mensagem mesmo sem
+        mudar de estado, para que dois workers não executem os mesmos efeitos.
+
+        Retorna True se algo foi gravado.
+        Lança SessionConflictError se outro worker mexeu na conversa.
+        """
+        if not self.dirty:
+            return False
+
+        fields = []
+
+        if self._new_context is not None:
+            fields += [FIELD_CONTEXT, json.dumps(self._new_context, separators=(",", ":"))]
+
+        if self._new_state is not None:
+            fields += [FIELD_STATE, self._new_state]
+
+        # Ids estáveis por transição: a versão que este commit vai gravar + posição
+        commands = [
+            Outbox.command(f"{self.version + 1}:{index}", op, args, kwargs, priority)
+            for index, (op, args, kwargs, priority) in enumerate(self.outbound)
+        ]
+
+        keys = [self._manager._get_key(self.chat_id), Outbox.key_for(self.chat_id), Outbox.PENDING_KEY]
+        if self._migrated:
+            keys += self._manager._get_legacy_keys(self.chat_id)
+
+        applied, current_state, current_version = self._manager._cas_script(
+            keys=keys,
+            args=[self.state, self.version, self._manager.expire_time, self.chat_id, len(commands), *commands, *fields],
+        )
+        current_state = current_state.decode("utf-8") if isinstance(current_state, bytes) else current_state
+
+        if not applied:
+            raise SessionConflictError(self.chat_id, current_state, int(current_version))
+
+        if self._new_context is not None:
+            self.context = self._new_context
+
+        self.state = current_state
+        self.version = int(current_version)
+
+        self._new_state = None
+        self._new_context = None
+        self.outbound = []
+        self._migrated = False
+        return True
+
+    def close(self) -> bool:
+        """
+        Encerra a conversa (closedChat): apaga a sessão e substitui a outbox do chat pelos
+        comandos registrados nesta sessão (ex: remove_from_workflow), num único passo atômico.
+        Não há compare-and-set: o fechamento vale sobre qualquer transição em andamento
+        (o commit dela conflita contra START). Retorna True se havia sessão.
+        """
+        commands = [
+            Outbox.command(f"closed:{index}", op, args, kwargs, priority)
+            for index, (op, args, kwargs, priority) in enumerate(self.outbound)
+        ]
+        keys = [self._manager._get_key(self.chat_id), Outbox.key_for(self.chat_id),
+                Outbox.attempts_key_for(self.chat_id), Outbox.PENDING_KEY,
+                *self._manager._get_legacy_keys(self.chat_id)]
+
+        existed = self._manager._close_script(keys=keys, args=[self.chat_id, self._manager.expire_time, *commands])
+
+        self.state = "START"
+        self.context = {}
+        self.version = 0
+        self._new_state = None
+        self._new_context = None
+        self.outbound = []
+        self._migrated = False
+        return bool(existed)
+
 class SessionManager:
+    """
+    Layout no Redis: UM hash pequeno por conversa (codificado como listpack),
+    com um único TTL.
+
+        chat:{id} -> {state, context, last_interaction, version}
+
+    As chaves antigas (chat:{id}:state / :context / :last_interaction) são
+    migradas sob demanda no primeiro acesso, enquanto SESSION_LEGACY_MIGRATION
+    estiver ativo (padrão).
+    """
     def __init__(self):
-        redis_url = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
-        self.redis_client = redis.from_url(redis_url)
+        self.redis_client = get_redis()
         self.expire_time = 3600 * 24 # 24 horas
+        self.legacy_migration = os.getenv("SESSION_LEGACY_MIGRATION", "true").lower() in ("1", "true", "yes")
+        self._cas_script = self.redis_client.register_script(CAS_TRANSITION_LUA)
+        self._close_script = self.redis_client.register_script(CLOSE_LUA)
 
+    def _get_key(self, chat_id: int):
+        return f"chat:{chat_id}"
+
+    # --- Layout antigo (somente leitura/migração) ---
     def _get_key_state(self, chat_id: str):
         return f"chat:{chat_id}:state"
-    
+
     def _get_key_context(self, chat_id: str):
         return f"chat:{chat_id}:context"
-    
+
     def _get_key_interaction(self, chat_id: str):
         return f"chat:{chat_id}:last_interaction"
-    
+
+    def _get_legacy_keys(self, chat_id: int) -> list:
+        return [self._get_key_state(chat_id), self._get_key_context(chat_id), self._get_key_interaction(chat_id)]
+    # ------------------------------------------------
+
+    def begin(self, chat_id: int) -> ChatSession:
+        """
+        Abre a Unit of Work da conversa: marca a interação (touch) e carrega
+        estado + contexto num único round trip.
+        """
+        return self._load(chat_id, touch=True)
+
+    def load(self, chat_id: int) -> ChatSession:
+        """
+        Igual ao begin(), mas SEM marcar interação (usado pelo monitor de inatividade).
+        """
+        return self._load(chat_id, touch=False)
+
+    def _load(self, chat_id: int, touch: bool) -> ChatSession:
+        key = self._get_key(chat_id)
+        now = int(time.time())
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hgetall(key)
+        if self.legacy_migration:
+            pipe.mget(self._get_key_state(chat_id), self._get_key_context(chat_id), self._get_key_interaction(chat_id))
+        if touch:
+            pipe.hset(key, FIELD_INTERACTION, now)
+            pipe.expire(key, self.expire_time)
+        results = pipe.execute()
+
+        data = results[0]
+        raw_state = data.get(FIELD_STATE.encode())
+        raw_context = data.get(FIELD_CONTEXT.encode())
+        raw_interaction = data.get(FIELD_INTERACTION.encode())
+        migrated = False
+
+        if self.legacy_migration and (raw_state is None or raw_context is None):
+            legacy_state, legacy_context, legacy_interaction = results[1]
+            if raw_state is None and legacy_state is not None:
+                raw_state, migrated = legacy_state, True
+            if raw_context is None and legacy_context is not None:
+                raw_context, migrated = legacy_context, True
+            if raw_interaction is None:
+                raw_interaction = legacy_interaction
+            if migrated:
+                logger.info(f"🚚 [Session] Chat {chat_id} migrado do layout antigo para hash.")
+
+        state = raw_state.decode("utf-8") if raw_state else "START"
+        context = json.loads(raw_context) if raw_context else {}
+        version = int(data.get(FIELD_VERSION.encode(), 0))
+        last_interaction = int(raw_interaction) if raw_interaction else 0
+
+        return ChatSession(self, chat_id, state, context, now, version=version,
+                           last_interaction=last_interaction, migrated=migrated)
+
     def touch(self, chat_id: int):
         """Atualiza o timestamp da última interação para AGORA"""
-        key = self._get_key_interaction(chat_id)
+        key = self._get_key(chat_id)
         now = int(time.time())
-        self.redis_client.set(key, now, ex=self.expire_time)
+
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset(key, FIELD_INTERACTION, now)
+        pipe.expire(key, self.expire_time)
+        pipe.execute()
         return now
-    
+
     def get_last_interaction(self, chat_id: int):
         """Retorna o timestamp da última interação"""
-        key = self._get_key_interaction(chat_id)
-        val = self.redis_client.get(key)
+        val = self._get_field(chat_id, FIELD_INTERACTION, self._get_key_interaction(chat_id))
         return int(val) if val else 0
-    
+
     def clear_session(self, chat_id: int):
         """
-        Remove todo o contexto do chat do Redis.
-        Usado quando recebemos 'closedChat'.
+        Remove todo o contexto do chat do Redis (a outbox fica: os comandos já
+        gravados ainda precisam sair). Usado pelo monitor ao finalizar por inatividade;
+        o 'closedChat' usa ChatSession.close().
         """
         try:
-            # CORREÇÃO 1: Deletar State E Contexto
-            key_state = self._get_key_state(chat_id)
-            key_context = self._get_key_context(chat_id)
-
-            # Deleta as duas chaves
-            self.redis_client.delete(key_state)
-            deleted_count = self.redis_client.delete(key_context)
+            # Hash + eventuais chaves legadas numa única chamada
+            deleted_count = self.redis_client.delete(self._get_key(chat_id), *self._get_legacy_keys(chat_id))
 
             if deleted_count > 0:
                 logger.info(f"🧹 [Session] Sessão limpa para o Chat ID: {chat_id}")
@@ -55,25 +340,36 @@ class SessionManager:
         except Exception as e:
             logger.error(f"❌ Erro ao limpar sessão do chat {chat_id}: {str(e)}")
 
+    def _get_field(self, chat_id: int, field: str, legacy_key: str):
+        """Lê um campo do hash, caindo para a chave antiga se ainda não migrou."""
+        val = self.redis_client.hget(self._get_key(chat_id), field)
+        if val is None and self.legacy_migration:
+            val = self.redis_client.get(legacy_key)
+        return val
+
+    def _set_fields(self, chat_id: int, mapping: dict):
+        key = self._get_key(chat_id)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset(key, mapping=mapping)
+        if FIELD_STATE in mapping:
+            # Escrita sem CAS também invalida quem leu a versão anterior
+            pipe.hincrby(key, FIELD_VERSION, 1)
+        pipe.expire(key, self.expire_time)
+        pipe.execute()
+
     def get_state(self, chat_id: int):
-        # CORREÇÃO 2: Usar _get_key_state
-        key = self._get_key_state(chat_id)
-        val = self.redis_client.get(key)
+        val = self._get_field(chat_id, FIELD_STATE, self._get_key_state(chat_id))
         # IMPORTANTE: Decodificar de bytes para string para o 'if' do bot funcionar
         return val.decode("utf-8") if val else "START"
-    
+
     def set_state(self, chat_id: int, state: str):
-        # CORREÇÃO 3: Usar _get_key_state
-        key = self._get_key_state(chat_id)
-        self.redis_client.set(key, state, ex=self.expire_time)
-    
+        self._set_fields(chat_id, {FIELD_STATE: state})
+
     def set_context(self, chat_id: int, data: dict):
         """Salva dados temporários (ex: CPF)"""
-        key = self._get_key_context(chat_id)
-        self.redis_client.set(key, json.dumps(data), ex=self.expire_time)
-    
+        self._set_fields(chat_id, {FIELD_CONTEXT: json.dumps(data, separators=(",", ":"))})
+
     def get_context(self, chat_id: int) -> dict:
         """Recupera dados salvos"""
-        key = self._get_key_context(chat_id)
-        val = self.redis_client.get(key)
-        return json.loads(val) if val else {}
\ No newline at end of file
+        val = self._get_field(chat_id, FIELD_CONTEXT, self._get_key_context(chat_id))
+        return json.loads(val) if val else {}
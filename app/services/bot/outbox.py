@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import uuid
+import logging
+from typing import Callable, List
+import httpx
+from app.infrastructure.circuit_breaker import CircuitOpenError
+from app.infrastructure.metrics import Metrics
+from app.infrastructure.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Erros transitórios: o comando fica na cabeça da fila e é tentado de novo (com backoff).
+# Qualquer outro erro (inclusive HTTP 4xx, exceto 429) é permanente: o comando vai para a
+# dead letter e a fila segue.
+RETRYABLE_ERRORS = (httpx.HTTPError, ConnectionError, TimeoutError)
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, RETRYABLE_ERRORS)
+
+def is_backpressure(error: Exception) -> bool:
+    """A Huggy pediu para esperar (429) ou o circuito está aberto: o comando nem foi tentado de fato."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429
+    return isinstance(error, CircuitOpenError)
+
+# Confirma a cabeça da fila SE ainda for o comando executado e atualiza o índice de pendentes.
+# KEYS[1] = outbox:{chat} | KEYS[2] = outbox:{chat}:attempts | KEYS[3] = outbox:pending | KEYS[4] = outbox:dead
+# ARGV[1] = comando (JSON) | ARGV[2] = id | ARGV[3] = chat_id | ARGV[4] = agora | ARGV[5] = entrada da dead letter ('' = nenhuma)
+ACK_LUA = """
+if redis.call('LINDEX', KEYS[1], 0) == ARGV[1] then
+    redis.call('LPOP', KEYS[1])
+end
+redis.call('HDEL', KEYS[2], ARGV[2])
+if ARGV[5] ~= '' then
+    redis.call('LPUSH', KEYS[4], ARGV[5])
+    redis.call('LTRIM', KEYS[4], 0, 999)
+end
+local left = redis.call('LLEN', KEYS[1])
+if left == 0 then
+    redis.call('ZREM', KEYS[3], ARGV[3])
+else
+    redis.call('ZADD', KEYS[3], ARGV[4], ARGV[3])
+end
+return left
+"""
+
+# Devolve o comando mais antigo da dead letter para o fim da outbox do chat, SE ainda for a mesma entrada.
+# KEYS[1] = outbox:dead | KEYS[2] = outbox:{chat} | KEYS[3] = outbox:pending
+# ARGV[1] = entrada da dead letter | ARGV[2] = comando (JSON) | ARGV[3] = chat_id | ARGV[4] = agora
+REPLAY_LUA = """
+if redis.call('LINDEX', KEYS[1], -1) ~= ARGV[1] then
+    return 0
+end
+redis.call('RPOP', KEYS[1])
+redis.call('RPUSH', KEYS[2], ARGV[2])
+redis.call('ZADD', KEYS[3], ARGV[4], ARGV[3])
+return 1
+"""
+
+# Libera o lease só se ainda for do dono
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class OutboxRetryLater(Exception):
+    """O comando da cabeça falhou de forma transitória: drenar de novo daqui a 'countdown' s."""
+    def __init__(self, chat_id: int, countdown: float, attempts: int):
+        self.chat_id = chat_id
+        self.countdown = countdown
+        self.attempts = attempts
+        super().__init__(f"Outbox do chat {chat_id}: nova tentativa em {countdown:.0f}s (tentativa {attempts}).")
+
+class Outbox:
+    """
+    Outbox transacional dos efeitos na Huggy.
+
+    O commit da ChatSession grava a transição E os comandos (send_message, finish_attendance, ...)
+    no mesmo script Lua: ou os dois entram, ou nenhum. Quem fala com a Huggy é a task
+    'drain_outbox' (fila dedicada), nunca o Engine.
+
+    Layout:
+        outbox:{chat}           LIST comandos em ordem (JSON: id, op, args, kwargs, priority)
+        outbox:{chat}:attempts  HASH id -> tentativas do comando da cabeça
+        outbox:{chat}:lock      lease do drenador (um por chat: a ordem é preservada)
+        outbox:pending          ZSET chat -> última atividade (o sweeper redrena os parados)
+        outbox:dead             LIST comandos descartados (erro permanente ou tentativas esgotadas)
+
+    429 e circuito aberto não gastam tentativa: o comando espera OUTBOX_THROTTLE_SECONDS
+    (padrão: a janela do circuito da Huggy) e tenta de novo, sem teto. Uma queda longa da
+    Huggy atrasa a fila, mas não a joga na dead letter. Comandos na dead letter voltam
+    para a outbox com replay_dead (POST /admin/replay-outbox-dead).
+
+    Entrega é at-least-once: se o worker morrer entre a chamada à Huggy e o ack,
+    o comando é reenviado quando o lease expirar.
+    """
+    KEY_PREFIX = "outbox"
+    PENDING_KEY = "outbox:pending"
+    DEAD_KEY = "outbox:dead"
+
+    def __init__(self):
+        self.redis_client = get_redis(decode_responses=True)
+        self.max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+        self.lease_seconds = int(os.getenv("OUTBOX_LOCK_SECONDS", "120"))
+        self.stale_after = float(os.getenv("OUTBOX_STALE_AFTER", "30"))
+        self.backoff_max = float(os.getenv("OUTBOX_RETRY_BACKOFF_MAX", "60"))
+        self.throttle_seconds = float(os.getenv("OUTBOX_THROTTLE_SECONDS", os.getenv("HUGGY_CIRCUIT_OPEN_SECONDS", "30")))
+        self._ack = self.redis_client.register_script(ACK_LUA)
+        self._replay = self.redis_client.register_script(REPLAY_LUA)
+        self._release = self.redis_client.register_script(RELEASE_LUA)
+
+    @classmethod
+    def key_for(cls, chat_id: int) -> str:
+        return f"{cls.KEY_PREFIX}:{chat_id}"
+
+    @classmethod
+    def attempts_key_for(cls, chat_id: int) -> str:
+        return f"{cls.key_for(chat_id)}:attempts"
+
+    def _get_attempts_key(self, chat_id: int) -> str:
+        return self.attempts_key_for(chat_id)
+
+    def _get_lock_key(self, chat_id: int) -> str:
+        return f"{self.key_for(chat_id)}:lock"
+
+    @staticmethod
+    def command(command_id: str, op: str, args: list, kwargs: dict, priority: str = "high") -> str:
+        """Serializa um comando (o mesmo JSON vai para o Lua do commit e volta no drain)."""
+        return json.dumps(
+            {"id": command_id, "op": op, "args": args, "kwargs": kwargs, "priority": priority},
+            separators=(",", ":"), ensure_ascii=False,
+        )
+
+    def pending(self, chat_id: int) -> List[dict]:
+        return [json.loads(raw) for raw in self.redis_client.lrange(self.key_for(chat_id), 0, -1)]
+
+    def dead_letters(self) -> List[dict]:
+        return [json.loads(raw) for raw in self.redis_client.lrange(self.DEAD_KEY, 0, -1)]
+
+    def backoff(self, attempts: int) -> float:
+        return min(2 ** attempts, self.backoff_max)
+
+    def dispatch(self, chat_id: int):
+        """Enfileira a drenagem do chat. Se o broker falhar, o sweep_outbox recupera depois."""
+        from app.infrastructure.celery import celery_app
+        try:
+            celery_app.send_task("drain_outbox", args=[chat_id])
+        except Exception as e:
+            logger.error(f"❌ [Outbox] Falha ao enfileirar drenagem do Chat {chat_id} (o sweeper recupera): {e}")
+
+    def drain(self, chat_id: int, execute: Callable[[dict], object]) -> int:
+        """
+        Executa os comandos do chat em ordem, confirmando um a um.
+        Falha transitória: confirma o que já foi, e levanta OutboxRetryLater (só o comando
+        que falhou é repetido). Retorna quantos comandos foram confirmados.
+        """
+        owner = uuid.uuid4().hex
+        done = 0
+
+        while True:
+            lock_key = self._get_lock_key(chat_id)
+            if not self.redis_client.set(lock_key, owner, nx=True, ex=self.lease_seconds):
+                logger.debug(f"💨 [Outbox] Chat {chat_id} já está sendo drenado por outro worker.")
+                return done
+
+            try:
+                done += self._drain_locked(chat_id, execute)
+            finally:
+                self._release(keys=[lock_key], args=[owner])
+
+            # Um commit pode ter entrado enquanto o lease estava conosco (e a drenagem
+            # disparada por ele desistiu ao ver o lock): confere de novo antes de sair.
+            if not self.redis_client.llen(self.key_for(chat_id)):
+                return done
+
+    def _drain_locked(self, chat_id: int, execute: Callable[[dict], object]) -> int:
+        key = self.key_for(chat_id)
+        done = 0
+
+        while True:
+            raw = self.redis_client.lindex(key, 0)
+            if raw is None:
+                self._ack(keys=self._ack_keys(chat_id), args=["", "", chat_id, time.time(), ""])
+                return done
+
+            command = json.loads(raw)
+            op = command["op"]
+            dead = ""
+
+            try:
+                result = execute(command)
+                if result is False:
+                    logger.warning(f"⚠️ [Outbox] Chat {chat_id}: '{op}' recusado pela Huggy. Seguindo.")
+                Metrics.incr("outbox_sent")
+            except Exception as e:
+                if not is_transient(e):
+                    logger.error(f"☠️ [Outbox] Chat {chat_id}: '{op}' falhou com erro permanente ({e}). Descartado.")
+                    dead = self._dead_entry(chat_id, command, e)
+                    self._finish(chat_id, raw, command, dead)
+                    done += 1
+                    continue
+
+                if is_backpressure(e):
+                    attempts = int(self.redis_client.hget(self._get_attempts_key(chat_id), command["id"]) or 0)
+                    self.redis_client.zadd(self.PENDING_KEY, {chat_id: time.time() + self.throttle_seconds})
+                    Metrics.incr("outbox_throttled")
+                    logger.warning(f"🚦 [Outbox] Chat {chat_id}: '{op}' barrado ({e}). Sem gastar tentativa, de novo em {self.throttle_seconds:.0f}s.")
+                    raise OutboxRetryLater(chat_id, self.throttle_seconds, attempts)
+
+                attempts = self.redis_client.hincrby(self._get_attempts_key(chat_id), command["id"], 1)
+                self.redis_client.expire(self._get_attempts_key(chat_id), self.lease_seconds * 10)
+                if attempts < self.max_attempts:
+                    countdown = self.backoff(attempts)
+                    # O sweeper só volta a olhar este chat depois do backoff
+                    self.redis_client.zadd(self.PENDING_KEY, {chat_id: time.time() + countdown})
+                    Metrics.incr("outbox_retried")
+                    logger.warning(f"🔄 [Outbox] Chat {chat_id}: '{op}' falhou ({e}). Tentativa {attempts}/{self.max_attempts} em {countdown:.0f}s.")
+                    raise OutboxRetryLater(chat_id, countdown, attempts)
+
+                logger.error(f"☠️ [Outbox] Chat {chat_id}: '{op}' esgotou {self.max_attempts} tentativas ({e}). Descartado.")
+                dead = self._dead_entry(chat_id, command, e)
+
+            self._finish(chat_id, raw, command, dead)
+            done += 1
+
+    def _finish(self, chat_id: int, raw: str, command: dict, dead: str = ""):
+        """Tira o comando da cabeça da fila (e manda para a dead letter, se for o caso)."""
+        if dead:
+            Metrics.incr("outbox_dead")
+        self._ack(keys=self._ack_keys(chat_id), args=[raw, command["id"], chat_id, time.time(), dead])
+
+    def _ack_keys(self, chat_id: int) -> list:
+        return [self.key_for(chat_id), self._get_attempts_key(chat_id), self.PENDING_KEY, self.DEAD_KEY]
+
+    def _dead_entry(self, chat_id: int, command: dict, error: Exception) -> str:
+        return json.dumps({**command, "chat_id": chat_id, "error": str(error), "dead_at": int(time.time())},
+                          separators=(",", ":"), ensure_ascii=False)
+
+    def replay_dead(self, limit: int = 100) -> List[int]:
+        """
+        Devolve até 'limit' comandos da dead letter (mais antigos primeiro) para o fim da
+        outbox dos seus chats, com tentativas zeradas, e dispara a drenagem. Retorna os chats.
+        """
+        chat_ids = []
+        for _ in range(limit):
+            entry = self.redis_client.lindex(self.DEAD_KEY, -1)
+            if entry is None:
+                break
+            dead = json.loads(entry)
+            chat_id = dead["chat_id"]
+            raw = self.command(dead["id"], dead["op"], dead["args"], dead["kwargs"], dead.get("priority", "high"))
+            if not self._replay(keys=[self.DEAD_KEY, self.key_for(chat_id), self.PENDING_KEY], args=[entry, raw, chat_id, time.time()]):
+                continue  # outro replay levou esta entrada: segue para a próxima
+            Metrics.incr("outbox_replayed")
+            if chat_id not in chat_ids:
+                chat_ids.append(chat_id)
+
+        for chat_id in chat_ids:
+            self.dispatch(chat_id)
+        if chat_ids:
+            logger.warning(f"♻️ [Outbox] Dead letter devolvida para a outbox de {len(chat_ids)} chat(s).")
+        return chat_ids
+
+    def stale_chats(self, now: float = None, limit: int = 500) -> List[int]:
+        """Chats com comandos parados há mais de OUTBOX_STALE_AFTER s (broker fora, worker morto)."""
+        now = now if now is not None else time.time()
+        members = self.redis_client.zrangebyscore(self.PENDING_KEY, "-inf", now - self.stale_after, start=0, num=limit)
+        return [int(member) for member in members]
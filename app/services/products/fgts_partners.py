@@ -0,0 +1,241 @@
+import os
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional
+from app.integrations.facta.fgts.service import FactaFGTSService
+from app.integrations.facta.complementares.funcoes_complementares import FactaDadosCadastrais
+from app.schemas.credit import CreditOffer, AnalysisStatus
+from app.utils.formatters import formatar_moeda
+from app.utils.validators import calcular_segundo_dia_util_prox_mes
+
+logger = logging.getLogger(__name__)
+
+class PartnerUnavailable(Exception):
+    """O parceiro não respondeu de forma utilizável (erro técnico, prazo, fora do ar)."""
+
+class FGTSPartner(ABC):
+    """
+    Contrato de um banco parceiro de antecipação FGTS.
+
+    - 'simular' devolve o CreditOffer do parceiro até o 'deadline' (time.monotonic()).
+    - Erro técnico: levanta PartnerUnavailable (o agregador marca o parceiro como degradado).
+    - 'hedge_after' (FGTS_HEDGE_AFTER_<NOME>): se o parceiro não responder nesse tempo,
+      o agregador dispara uma 2ª tentativa e fica com a que chegar primeiro.
+      Desligado por padrão: cada tentativa pode consumir cota do parceiro.
+    """
+    name: str = ""
+
+    def __init__(self):
+        hedge = os.getenv(f"FGTS_HEDGE_AFTER_{self.name.upper()}")
+        self.hedge_after: Optional[float] = float(hedge) if hedge else None
+
+    @abstractmethod
+    def simular(self, cpf: str, deadline: float) -> CreditOffer:
+        ...
+
+class FactaPartner(FGTSPartner):
+    """
+    Facta: saldo -> cálculo e, no modo pipeline (FGTS_PIPELINE, padrão ligado), a conta
+    bancária (/proposta/consulta-cliente) em paralelo, já que só depende do CPF.
+    Se o saldo não aprovar, a busca especulativa é descartada.
+    """
+    name = "facta"
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_pid: Optional[int] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self):
+        super().__init__()
+        self.facta_service = FactaFGTSService()
+        self.dados_cadastrais = FactaDadosCadastrais()
+        self.pipeline_enabled = os.getenv("FGTS_PIPELINE", "true").lower() in ("1", "true", "yes")
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """Pool de threads do processo (recriado após o fork do Celery)."""
+        pid = os.getpid()
+        if cls._executor is None or cls._executor_pid != pid:
+            with cls._executor_lock:
+                if cls._executor is None or cls._executor_pid != pid:
+                    cls._executor = ThreadPoolExecutor(
+                        max_workers=int(os.getenv("FGTS_PIPELINE_WORKERS", "8")),
+                        thread_name_prefix="fgts-pipeline",
+                    )
+                    cls._executor_pid = pid
+        return cls._executor
+
+    def _simular(self, cpf: str, deadline: float):
+        """
+        Dispara saldo -> cálculo e, em paralelo, a conta bancária (especulativa).
+        Retorna (resultado_raw, future_da_conta | None).
+        """
+        if not self.pipeline_enabled:
+            return self.facta_service.simular_antecipacao(cpf), None
+
+        executor = self._get_executor()
+        conta_future = executor.submit(self.dados_cadastrais.buscar_conta_bancaria, cpf)
+        simulacao_future = executor.submit(self.facta_service.simular_antecipacao, cpf)
+
+        try:
+            resultado_raw = simulacao_future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            logger.error(f"⏱️ [Facta] Simulação estourou o prazo para CPF {cpf}.")
+            resultado_raw = {
+                "aprovado": False,
+                "motivo": "ERRO_TECNICO",
+                "msg_tecnica": "Prazo excedido na simulação"
+            }
+
+        if not resultado_raw.get("aprovado"):
+            # Sem oferta: a conta não será usada. Se ainda não começou, nem chega a rodar.
+            conta_future.cancel()
+            return resultado_raw, None
+
+        return resultado_raw, conta_future
+
+    def _aguardar_conta(self, cpf: str, conta_future: Optional[Future], deadline: float) -> Optional[Dict]:
+        """Conta bancária (já em voo no modo pipeline). Estourou o prazo = oferta sem conta."""
+        if conta_future is None:
+            return self.dados_cadastrais.buscar_conta_bancaria(cpf)
+
+        try:
+            return conta_future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            logger.warning(f"⏱️ [Facta] Conta bancária não chegou no prazo para CPF {cpf}. Seguindo sem ela.")
+            conta_future.cancel()
+            return None
+        except Exception as e:
+            logger.error(f"❌ [Facta] Falha na busca da conta bancária: {e}")
+            return None
+
+    def simular(self, cpf: str, deadline: float) -> CreditOffer:
+        resultado_raw, conta_future = self._simular(cpf, deadline)
+
+        if resultado_raw.get("motivo") == "ERRO_TECNICO":
+            raise PartnerUnavailable(resultado_raw.get("msg_tecnica") or "ERRO_TECNICO")
+
+        if resultado_raw.get("aprovado"):
+            val_liquido = resultado_raw["detalhes"]["valor_liquido"]
+            valor_fmt = formatar_moeda(val_liquido)
+
+            info_conta = self._aguardar_conta(cpf, conta_future, deadline)
+
+            if info_conta:
+                return CreditOffer(
+                    status=AnalysisStatus.APROVADO,
+                    message_key="com_saldo_conta",
+                    valor_liquido=val_liquido,
+                    variables={
+                        "valor": valor_fmt,
+                        "dados_bancarios": info_conta["texto_formatado"]
+                    },
+                    banco_origem="Facta",
+                    raw_details=resultado_raw
+                )
+
+            else:
+                return CreditOffer(
+                    status=AnalysisStatus.APROVADO,
+                    message_key="com_saldo",
+                    banco_origem="Facta",
+                    valor_liquido=resultado_raw["detalhes"]["valor_liquido"],
+                    variables={
+                        "valor": formatar_moeda(resultado_raw["detalhes"]["valor_liquido"]),
+                        "banco": "Facta"
+                    },
+                    raw_details=resultado_raw
+                )
+        
+        motivo = resultado_raw.get("motivo")
+
+        if motivo in ["SEM_AUT", "SEM_AUTORIZACAO"]:
+            return CreditOffer(
+                status=AnalysisStatus.SEM_AUTORIZACAO,
+                message_key="sem_autorizacao",
+                raw_details=resultado_raw
+            )
+        
+        if motivo == "SEM_ADESAO":
+            return CreditOffer(
+                status=AnalysisStatus.SEM_ADESAO,
+                message_key="sem_adesao",
+                raw_details=resultado_raw
+            )
+        
+        if motivo == "MUDANCAS_CADASTRAIS":
+            return CreditOffer(
+                status=AnalysisStatus.MUDANCAS_CADASTRAIS,
+                message_key="mudancas_cadastrais",
+                raw_details=resultado_raw
+            )
+        
+        if motivo == "ANIVERSARIANTE":
+
+            data = calcular_segundo_dia_util_prox_mes()
+
+            return CreditOffer(
+                status=AnalysisStatus.ANIVERSARIANTE,
+                message_key="aniversariante",
+                variables={
+                    "data": data
+                },
+                raw_details=resultado_raw
+            )
+        
+        if motivo == "SALDO_NAO_ENCONTRADO":
+            return CreditOffer(
+                status=AnalysisStatus.SALDO_NAO_ENCONTRADO,
+                message_key="saldo_nao_encontrado",
+                raw_details=resultado_raw
+            )
+        
+        if motivo == "SEM_SALDO":
+            return CreditOffer(
+                status=AnalysisStatus.SEM_SALDO,
+                message_key="sem_saldo",
+                raw_details=resultado_raw
+            )
+        
+        if motivo == "LIMITE_EXCEDIDO_CONSULTAS_FGTS":
+            return CreditOffer(
+                status=AnalysisStatus.LIMITE_EXCEDIDO_CONSULTAS_FGTS,
+                message_key="limite_excedido_fgts",
+                is_internal=True,
+                raw_details=resultado_raw
+            )
+        
+        msg_tecnica = resultado_raw.get("msg_tecnica", str(motivo))
+
+        return CreditOffer(
+                status=AnalysisStatus.RETORNO_DESCONHECIDO,
+                message_key="retorno_desconhecido",
+                is_internal=True,
+                variables={
+                    "erro": msg_tecnica
+                },
+                raw_details=resultado_raw
+            )
+
+# Nome -> fábrica do parceiro. Ativos (e a ordem de preferência em empate/recusa): FGTS_PARTNERS=facta,...
+PARTNER_FACTORIES: Dict[str, Callable[[], FGTSPartner]] = {
+    "facta": FactaPartner,
+}
+
+def register_partner(name: str, factory: Callable[[], FGTSPartner]):
+    """Registra um banco parceiro (não instancia ainda)."""
+    PARTNER_FACTORIES[name] = factory
+
+def load_partners() -> List[FGTSPartner]:
+    names = [n.strip() for n in os.getenv("FGTS_PARTNERS", "facta").split(",") if n.strip()]
+    partners = []
+    for name in names:
+        factory = PARTNER_FACTORIES.get(name)
+        if factory is None:
+            logger.error(f"❌ [Parceiros FGTS] Parceiro '{name}' não registrado. Ignorando.")
+            continue
+        partners.append(factory())
+    return partners
@@ -1,129 +1,198 @@
+import os
+import time
 import logging
-from app.integrations.facta.fgts.service import FactaFGTSService
-from app.integrations.facta.complementares.funcoes_complementares import FactaDadosCadastrais
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
+from app.infrastructure.redis_client import get_redis
+from app.infrastructure.single_flight import SingleFlight
+from app.services.products.fgts_partners import FGTSPartner, load_partners
 from app.schemas.credit import CreditOffer, AnalysisStatus
-from app.utils.formatters import formatar_moeda
-from app.utils.validators import calcular_segundo_dia_util_prox_mes
+from app.utils.validators import hash_cpf
 
 logger = logging.getLogger(__name__)
 
+# Folga para o resultado de um parceiro que terminou no limite atravessar a thread
+RESULT_GRACE_SECONDS = 0.2
+
 class FGTSService:
     """
     Service Global de FGTS.
     Responsável por consultar múltiplos parceiros (Facta, etc.) e agregar/comparar os resultados.
+
+    - Todos os parceiros ativos (FGTS_PARTNERS) são consultados EM PARALELO sob um prazo
+      único (FGTS_PIPELINE_DEADLINE): um segundo banco não soma a latência dele à da Facta.
+    - Vence a oferta aprovada de maior valor líquido. Com FGTS_LATENCY_BUDGET, passado
+      esse tempo a primeira oferta aprovada disponível é devolvida sem esperar os demais.
+    - Parceiro lento pode ganhar uma 2ª tentativa (hedge, ver FGTSPartner.hedge_after).
+    - Parceiro que falha ou estoura o prazo fica degradado (FGTS_PARTNER_DEGRADED_SECONDS)
+      e é pulado por todos os workers enquanto houver outro saudável.
+
+    Single-flight por CPF: duas simulações simultâneas do mesmo CPF (CPF enviado duas
+    vezes, dois chats) viram UMA rodada de consultas; a segunda espera o CreditOffer da primeira.
     """
-    def __init__(self):
-        self.facta_service = FactaFGTSService()
-        self.dados_cadastrais = FactaDadosCadastrais()
+    DEGRADED_KEY_PREFIX = "fgts:partner:degraded"
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_pid: Optional[int] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, partners: List[FGTSPartner] = None):
+        self.partners = partners if partners is not None else load_partners()
+        self.deadline_seconds = float(os.getenv("FGTS_PIPELINE_DEADLINE", "45"))
+        self.latency_budget = float(os.getenv("FGTS_LATENCY_BUDGET", "0")) or None
+        self.degraded_seconds = int(os.getenv("FGTS_PARTNER_DEGRADED_SECONDS", "60"))
+        self.redis_client = get_redis(decode_responses=True)
+        self.single_flight = SingleFlight("fgts", lease_seconds=self.deadline_seconds + 15)
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """Pool dos parceiros (separado do pipeline interno da Facta, que roda dentro dele)."""
+        pid = os.getpid()
+        if cls._executor is None or cls._executor_pid != pid:
+            with cls._executor_lock:
+                if cls._executor is None or cls._executor_pid != pid:
+                    cls._executor = ThreadPoolExecutor(
+                        max_workers=int(os.getenv("FGTS_PARTNER_WORKERS", "8")),
+                        thread_name_prefix="fgts-parceiros",
+                    )
+                    cls._executor_pid = pid
+        return cls._executor
+
+    def _degraded_key(self, partner: FGTSPartner) -> str:
+        return f"{self.DEGRADED_KEY_PREFIX}:{partner.name}"
+
+    def _healthy_partners(self) -> List[FGTSPartner]:
+        """Parceiros fora da janela de degradação. Se todos estiverem degradados, tenta todos."""
+        if len(self.partners) <= 1:
+            return self.partners
+        try:
+            flags = self.redis_client.mget([self._degraded_key(p) for p in self.partners])
+        except Exception as e:
+            logger.warning(f"⚠️ [Global FGTS] Falha ao ler parceiros degradados: {e}")
+            return self.partners
+
+        healthy = [p for p, flag in zip(self.partners, flags) if not flag]
+        skipped = [p.name for p, flag in zip(self.partners, flags) if flag]
+        if skipped and healthy:
+            logger.info(f"🩹 [Global FGTS] Pulando parceiros degradados: {skipped}")
+        return healthy or self.partners
+
+    def _mark_degraded(self, partner: FGTSPartner, reason: str):
+        logger.warning(f"🩹 [Global FGTS] Parceiro '{partner.name}' degradado por {self.degraded_seconds}s: {reason}")
+        try:
+            self.redis_client.set(self._degraded_key(partner), reason[:200], ex=self.degraded_seconds)
+        except Exception as e:
+            logger.warning(f"⚠️ [Global FGTS] Falha ao marcar '{partner.name}' como degradado: {e}")
 
     def consultar_melhor_oportunidade(self, cpf: str) -> CreditOffer:
-        """
-        Executa a lógica de prioridade (Waterfall).
-        Atualmente: Chama Facta.
-        Futuramente: Se Facta falhar ou não for vantajoso, chama Próximo.
-        """
+        """Simulação deduplicada por CPF entre todos os workers (ver SingleFlight)."""
+        return self.single_flight.run(
+            hash_cpf(cpf),
+            lambda: self._consultar_melhor_oportunidade(cpf),
+            dumps=lambda oferta: oferta.model_dump_json(),
+            loads=CreditOffer.model_validate_json,
+        )
+
+    def _consultar_melhor_oportunidade(self, cpf: str) -> CreditOffer:
+        """Consulta os parceiros em paralelo (com hedge e prazo) e escolhe a melhor oferta."""
         logger.info(f"🌐 [Global FGTS] Buscando oportunidade para CPF: {cpf}")
 
-        resultado_raw = self.facta_service.simular_antecipacao(cpf)
-
-        if resultado_raw.get("aprovado"):
-            val_liquido = resultado_raw["detalhes"]["valor_liquido"]
-            valor_fmt = formatar_moeda(val_liquido)
-
-            info_conta = self.dados_cadastrais.buscar_conta_bancaria(cpf)
-
-            if info_conta:
-                return CreditOffer(
-                    status=AnalysisStatus.APROVADO,
-                    message_key="com_saldo_conta",
-                    valor_liquido=val_liquido,
-                    variables={
-                        "valor": valor_fmt,
-                        "dados_bancarios": info_conta["texto_formatado"]
-                    },
-                    banco_origem="Facta",
-                    raw_details=resultado_raw
-                )
-
-            else:
-                return CreditOffer(
-                    status=AnalysisStatus.APROVADO,
-                    message_key="com_saldo",
-                    banco_origem="Facta",
-                    valor_liquido=resultado_raw["detalhes"]["valor_liquido"],
-                    variables={
-                        "valor": formatar_moeda(resultado_raw["detalhes"]["valor_liquido"]),
-                        "banco": "Facta"
-                    },
-                    raw_details=resultado_raw
-                )
-        
-        motivo = resultado_raw.get("motivo")
-
-        if motivo in ["SEM_AUT", "SEM_AUTORIZACAO"]:
-            return CreditOffer(
-                status=AnalysisStatus.SEM_AUTORIZACAO,
-                message_key="sem_autorizacao",
-                raw_details=resultado_raw
-            )
-        
-        if motivo == "SEM_ADESAO":
-            return CreditOffer(
-                status=AnalysisStatus.SEM_ADESAO,
-                message_key="sem_adesao",
-                raw_details=resultado_raw
-            )
-        
-        if motivo == "MUDANCAS_CADASTRAIS":
-            return CreditOffer(
-                status=AnalysisStatus.MUDANCAS_CADASTRAIS,
-                message_key="mudancas_cadastrais",
-                raw_details=resultado_raw
-            )
-        
-        if motivo == "ANIVERSARIANTE":
-
-            data = calcular_segundo_dia_util_prox_mes()
-
-            return CreditOffer(
-                status=AnalysisStatus.ANIVERSARIANTE,
-                message_key="aniversariante",
-                variables={
-                    "data": data
-                },
-                raw_details=resultado_raw
-            )
-        
-        if motivo == "SALDO_NAO_ENCONTRADO":
-            return CreditOffer(
-                status=AnalysisStatus.SALDO_NAO_ENCONTRADO,
-                message_key="saldo_nao_encontrado",
-                raw_details=resultado_raw
-            )
-        
-        if motivo == "SEM_SALDO":
-            return CreditOffer(
-                status=AnalysisStatus.SEM_SALDO,
-                message_key="sem_saldo",
-                raw_details=resultado_raw
-            )
-        
-        if motivo == "LIMITE_EXCEDIDO_CONSULTAS_FGTS":
-            return CreditOffer(
-                status=AnalysisStatus.LIMITE_EXCEDIDO_CONSULTAS_FGTS,
-                message_key="limite_excedido_fgts",
-                is_internal=True,
-                raw_details=resultado_raw
-            )
-        
-        msg_tecnica = resultado_raw.get("msg_tecnica", str(motivo))
+        partners = self._healthy_partners()
+        executor = self._get_executor()
+        start = time.monotonic()
+        deadline = start + self.deadline_seconds
+
+        pending: Dict[Future, FGTSPartner] = {}
+        attempts: Dict[str, int] = {}
+        offers: Dict[str, CreditOffer] = {}
+        failures: Dict[str, str] = {}
+
+        def launch(partner: FGTSPartner):
+            attempts[partner.name] = attempts.get(partner.name, 0) + 1
+            pending[executor.submit(partner.simular, cpf, deadline)] = partner
+
+        for partner in partners:
+            launch(partner)
+
+        def resolved(partner: FGTSPartner) -> bool:
+            return partner.name in offers or partner.name in failures
+
+        while not all(resolved(p) for p in partners):
+            now = time.monotonic()
+            wake_at = [deadline + RESULT_GRACE_SECONDS]
+            for partner in partners:
+                if partner.hedge_after and attempts[partner.name] == 1 and not resolved(partner):
+                    wake_at.append(start + partner.hedge_after)
+            if self.latency_budget:
+                wake_at.append(start + self.latency_budget)
+            future_wakes = [t for t in wake_at if t > now]
+            if now >= deadline + RESULT_GRACE_SECONDS or not future_wakes:
+                break
+
+            done, _ = wait(list(pending), timeout=min(future_wakes) - now, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                partner = pending.pop(future)
+                if resolved(partner):
+                    continue  # a outra tentativa (hedge) já respondeu
+                try:
+                    offers[partner.name] = future.result()
+                    # Tentativa duplicada que ainda não começou não precisa rodar
+                    for other, p in list(pending.items()):
+                        if p is partner:
+                            other.cancel()
+                            pending.pop(other)
+                except Exception as e:
+                    if any(p is partner for p in pending.values()):
+                        continue  # ainda há uma tentativa em voo
+                    failures[partner.name] = str(e) or e.__class__.__name__
+
+            elapsed = time.monotonic() - start
+            for partner in partners:
+                if (partner.hedge_after and attempts[partner.name] == 1 and not resolved(partner)
+                        and elapsed >= partner.hedge_after):
+                    logger.info(f"🔁 [Global FGTS] '{partner.name}' lento ({elapsed:.1f}s). Disparando hedge.")
+                    launch(partner)
+
+            if self.latency_budget and elapsed >= self.latency_budget and self._best_approved(offers):
+                logger.info(f"⏱️ [Global FGTS] Orçamento de latência ({self.latency_budget}s) atingido. Usando a melhor oferta já recebida.")
+                break
+
+        for partner in partners:
+            if partner.name in failures:
+                self._mark_degraded(partner, failures[partner.name])
+            elif partner.name not in offers and time.monotonic() >= deadline:
+                failures[partner.name] = f"Prazo de {self.deadline_seconds}s excedido"
+                self._mark_degraded(partner, failures[partner.name])
+
+        return self._choose(partners, offers, failures)
+
+    @staticmethod
+    def _best_approved(offers: Dict[str, CreditOffer]) -> Optional[CreditOffer]:
+        approved = [o for o in offers.values() if o.status == AnalysisStatus.APROVADO]
+        return max(approved, key=lambda o: o.valor_liquido or 0.0) if approved else None
+
+    def _choose(self, partners: List[FGTSPartner], offers: Dict[str, CreditOffer], failures: Dict[str, str]) -> CreditOffer:
+        best = self._best_approved(offers)
+        if best is not None:
+            return best
+
+        # Sem aprovação: vale a resposta de negócio do parceiro preferido (ordem do FGTS_PARTNERS)
+        ordered = [offers[p.name] for p in partners if p.name in offers]
+        for offer in ordered:
+            if offer.status != AnalysisStatus.RETORNO_DESCONHECIDO:
+                return offer
+        if ordered:
+            return ordered[0]
 
+        erro = "; ".join(f"{name}: {reason}" for name, reason in failures.items()) or "Nenhum parceiro respondeu"
         return CreditOffer(
-                status=AnalysisStatus.RETORNO_DESCONHECIDO,
-                message_key="retorno_desconhecido",
-                is_internal=True,
-                variables={
-                    "erro": msg_tecnica
-                },
-                raw_details=resultado_raw
-            )
\ No newline at end of file
+            status=AnalysisStatus.RETORNO_DESCONHECIDO,
+            message_key="retorno_desconhecido",
+            is_internal=True,
+            variables={
+                "erro": erro
+            },
+            raw_details={"motivo": "ERRO_TECNICO", "falhas": failures}
+        )
@@ -1,38 +1,153 @@
-import httpx
+"""
+Build do catálogo de mensagens.
+
+    python -m app.sync_messages            # baixa o Gist, valida e grava messages.json + messages.bin
+    python -m app.sync_messages --offline  # só valida o messages.json local e gera o messages.bin (Dockerfile)
+
+Validações (qualquer falha -> exit 1, nada é gravado):
+1. Formato do catálogo e templates compilados contra TEMPLATE_VARIABLES.
+2. Toda chave usada no código (send_message / message_key= / TIMEOUT_POLICES) existe no catálogo.
+   Exceção: PENDING_CONTENT_KEYS (texto aguardando o dono do conteúdo) só gera aviso.
+"""
+import ast
 import json
 import os
+import sys
+import httpx
+from typing import Dict, Set
+from app.core.messages import PENDING_CONTENT_KEYS
 
 # 1. Configuração
 # Cole aqui a URL "RAW" do seu Gist (aquela mesma do .env)
-GIST_URL = "https://gist.githubusercontent.com/MaykCruz/cfec635fda3b224f4715c90750da05f3/raw/messages.json"
+GIST_URL = os.getenv("MESSAGES_URL", "https://gist.githubusercontent.com/MaykCruz/cfec635fda3b224f4715c90750da05f3/raw/messages.json")
 
 # Caminho onde o arquivo local mora
-OUTPUT_PATH = "app/services/bot/content/messages.json"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_PATH = os.path.join(APP_DIR, "services", "bot", "content", "messages.json")
+ARTIFACT_PATH = os.path.join(APP_DIR, "services", "bot", "content", "messages.bin")
+
+def referenced_message_keys() -> Dict[str, Set[str]]:
+    """
+    Varre o código (AST) atrás das chaves de mensagem usadas como literais:
+    - send_message(chat_id, "chave", ...)
+    - message_key="chave" (CreditOffer)
+    - TIMEOUT_POLICES[...]["message_key"]
+    Retorna {chave: {arquivos que usam}}.
+    """
+    from app.core.timeouts import TIMEOUT_POLICES
+
+    keys: Dict[str, Set[str]] = {}
+
+    def add(key, where):
+        keys.setdefault(key, set()).add(where)
+
+    for root, _, files in os.walk(APP_DIR):
+        for name in files:
+            if not name.endswith(".py"):
+                continue
+            path = os.path.join(root, name)
+            where = os.path.relpath(path, os.path.dirname(APP_DIR))
+            with open(path, encoding="utf-8") as f:
+                tree = ast.parse(f.read(), filename=path)
+
+            for node in ast.walk(tree):
+                if not isinstance(node, ast.Call):
+                    continue
+                func_name = getattr(node.func, "attr", getattr(node.func, "id", None))
+
+                if func_name == "send_message" and len(node.args) >= 2:
+                    arg = node.args[1]
+                    if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                        add(arg.value, where)
+
+                for kw in node.keywords:
+                    if kw.arg == "message_key" and isinstance(kw.value, ast.Constant) and isinstance(kw.value.value, str):
+                        add(kw.value.value, where)
+
+    for state, rule in TIMEOUT_POLICES.items():
+        add(rule.get("message_key", ""), f"TIMEOUT_POLICES[{state}]")
+
+    return keys
+
+def check(data: Dict) -> list:
+    """Retorna a lista de problemas do catálogo (vazia = ok)."""
+    from app.services.bot.content.message_loader import MessageLoader, InvalidCatalogError
 
-def sync():
-    print(f"🔄 Conectando ao Gist...")
-    
+    problems = []
     try:
-        # 2. Baixa o conteúdo
-        response = httpx.get(GIST_URL)
-        
-        if response.status_code != 200:
-            print(f"❌ Erro ao baixar: {response.status_code}")
-            return
-
-        data = response.json()
-        
+        MessageLoader.validate(data)
+    except InvalidCatalogError as e:
+        problems.append(f"Catálogo inválido: {e}")
+        return problems
+
+    for key, where in sorted(referenced_message_keys().items()):
+        if key.startswith("DYNAMIC"):
+            continue
+        if not key:
+            problems.append(f"Chave vazia usada em: {', '.join(sorted(where))}")
+        elif key not in data and key not in PENDING_CONTENT_KEYS:
+            problems.append(f"Chave '{key}' não existe no catálogo (usada em: {', '.join(sorted(where))})")
+
+    return problems
+
+def pending_keys(data: Dict) -> list:
+    """Chaves usadas no código que aguardam texto no Gist (aviso, não reprova o build)."""
+    return sorted(key for key in PENDING_CONTENT_KEYS if key not in data)
+
+def build_artifact(source: bytes, data: Dict):
+    from app.services.bot.content import artifact
+    from app.services.bot.content.templates import compile_catalog
+
+    blob = artifact.dump(data, compile_catalog(data), digest=artifact.source_digest(source))
+    with open(ARTIFACT_PATH, "wb") as f:
+        f.write(blob)
+    print(f"📦 Artefato compilado: {ARTIFACT_PATH} ({len(blob)} bytes)")
+
+def sync(offline: bool = False) -> bool:
+    try:
+        if offline:
+            print(f"📄 Validando {OUTPUT_PATH}...")
+            with open(OUTPUT_PATH, encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            print(f"🔄 Conectando ao Gist...")
+            # 2. Baixa o conteúdo
+            response = httpx.get(GIST_URL)
+
+            if response.status_code != 200:
+                print(f"❌ Erro ao baixar: {response.status_code}")
+                return False
+
+            data = response.json()
+
+        problems = check(data)
+        if problems:
+            print("❌ Catálogo reprovado. Nada foi gravado:")
+            for problem in problems:
+                print(f"   - {problem}")
+            return False
+
+        for key in pending_keys(data):
+            print(f"⚠️ Chave '{key}' ainda sem texto no Gist (aguardando o dono do conteúdo). Envio será pulado.")
+
         # 3. Salva no disco (sobrescreve o local)
         # ensure_ascii=False garante que acentos fiquem corretos (não virem \u00e1)
-        with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-            
-        print(f"✅ Sucesso! O arquivo local foi atualizado com a versão do Gist.")
+        if not offline:
+            with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+
+        with open(OUTPUT_PATH, "rb") as f:
+            build_artifact(f.read(), data)
+
+        print(f"✅ Sucesso! {len(data)} mensagens validadas.")
         print(f"📂 Caminho: {OUTPUT_PATH}")
-        print("🚀 Agora basta dar 'git add' e 'git commit' para salvar no repositório.")
+        if not offline:
+            print("🚀 Agora basta dar 'git add' e 'git commit' no messages.json para salvar no repositório.")
+        return True
 
     except Exception as e:
         print(f"❌ Falha crítica: {e}")
+        return False
 
 if __name__ == "__main__":
-    sync()
\ No newline at end of file
+    sys.exit(0 if sync(offline="--offline" in sys.argv) else 1)
@@ -1,19 +1,28 @@
 import logging
 from app.infrastructure.celery import celery_app
-from app.services.bot.memory.session import SessionManager
+from app.services.bot.memory.session import SessionManager, SessionConflictError
+from app.services.bot.effects import DeferredHuggy, run_effects
+from app.services.bot.outbox import Outbox
 from app.integrations.huggy.service import HuggyService
 from app.core.timeouts import TIMEOUT_POLICES
+from app.infrastructure.timers import TimerService
 
 logger = logging.getLogger(__name__)
 
+def _schedule_next(chat_id: int, state: str, sent_at_timestamp: int):
+    new_rule = TIMEOUT_POLICES.get(state)
+    if new_rule:
+        TimerService().schedule("inactivity", chat_id, new_rule['delay'], [chat_id, state, sent_at_timestamp])
+
 @celery_app.task(name="check_inactivity")
 def check_inactivity(chat_id: int, expected_state: str, sent_at_timestamp: int):
     session = SessionManager()
     huggy = HuggyService()
 
     # 1. Validações (Se usuário já falou ou mudou de estado, aborta)
-    current_state = session.get_state(chat_id)
-    last_interaction = session.get_last_interaction(chat_id)
+    chat_session = session.load(chat_id)
+    current_state = chat_session.state
+    last_interaction = chat_session.last_interaction
 
     if current_state != expected_state:
         logger.info(f"🛑 [Monitor] Chat {chat_id} mudou de estado ({current_state}). Task cancelada.")
@@ -28,24 +37,37 @@ def check_inactivity(chat_id: int, expected_state: str, sent_at_timestamp: int):
 
     logger.info(f"⏰ [Timeout] Executando ({rule['action']}) para Chat {chat_id}")
 
-    if rule['action'] == "TRANSITION":
-        huggy.send_message(chat_id, rule['message_key'])
+    deferred = DeferredHuggy(chat_session, huggy, priority="low")
 
-        session.set_state(chat_id, rule['new_state'])
+    if rule['action'] == "TRANSITION":
+        deferred.send_message(chat_id, rule['message_key'])
 
-        new_rule = TIMEOUT_POLICES.get(rule['new_state'])
-        if new_rule:
-            check_inactivity.apply_async(
-                args=[chat_id, rule['new_state'], sent_at_timestamp],
-                countdown=new_rule['delay']
-            )
+        chat_session.set_state(rule['new_state'])
+        chat_session.emit("schedule_next", chat_id, rule['new_state'], sent_at_timestamp)
     
     elif rule['action'] == "KILL":
-        huggy.send_message(chat_id, rule['message_key'])
+        deferred.send_message(chat_id, rule['message_key'])
 
         if rule.get('tabulation_key'):
             tab_id = huggy.tabulations.get(rule['tabulation_key'])
             if tab_id:
-                huggy.finish_attendance(chat_id, tabulation_id=tab_id)
-        
-        session.clear_session(chat_id)
\ No newline at end of file
+                deferred.finish_attendance(chat_id, tabulation_id=tab_id)
+
+        chat_session.set_state("FINISHED")
+        chat_session.emit("clear_session", chat_id)
+
+    # 2. Transição atômica: se o usuário respondeu (ou outro worker agiu) entre a
+    # leitura e aqui, o CAS falha e nenhum efeito é executado.
+    # Os comandos da Huggy vão para a outbox com prioridade 'low': lembretes de timeout
+    # ficam atrás das respostas ao vivo no rate limit.
+    try:
+        chat_session.commit()
+    except SessionConflictError as e:
+        logger.info(f"🛑 [Monitor] Chat {chat_id} mudou durante o timeout ({e.current_state}). Task cancelada.")
+        return
+
+    run_effects(huggy, chat_session.pop_effects(), {
+        "schedule_next": _schedule_next,
+        "clear_session": session.clear_session,
+    })
+    Outbox().dispatch(chat_id)
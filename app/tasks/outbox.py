@@ -0,0 +1,52 @@
+import logging
+from app.infrastructure.celery import celery_app
+from app.services.bot.outbox import Outbox, OutboxRetryLater
+from app.integrations.huggy.service import HuggyService
+
+logger = logging.getLogger(__name__)
+
+@celery_app.task(
+        name="drain_outbox",
+        bind=True,
+        acks_late=True,
+        ignore_result=True,
+        max_retries=None  # o teto é por comando (OUTBOX_MAX_ATTEMPTS), não por task
+        )
+def drain_outbox(self, chat_id: int):
+    """
+    Executa, em ordem, os comandos da Huggy gravados na outbox do chat.
+    Uma falha transitória reagenda a task: só o comando que falhou é repetido.
+    """
+    services = {}
+
+    def execute(command: dict):
+        priority = command.get("priority", "high")
+        if priority not in services:
+            services[priority] = HuggyService(priority=priority)
+        return getattr(services[priority], command["op"])(*command["args"], **command["kwargs"])
+
+    try:
+        sent = Outbox().drain(chat_id, execute)
+    except OutboxRetryLater as e:
+        raise self.retry(countdown=e.countdown)
+
+    if sent:
+        logger.debug(f"📬 [Outbox] Chat {chat_id}: {sent} comando(s) executado(s).")
+    return sent
+
+@celery_app.task(name="sweep_outbox", ignore_result=True)
+def sweep_outbox():
+    """
+    Disparado pelo Celery Beat. Redrena chats com comandos parados (broker fora no
+    commit, worker morto no meio da drenagem, retry perdido).
+    """
+    chat_ids = Outbox().stale_chats()
+    if not chat_ids:
+        return 0
+
+    with celery_app.producer_or_acquire() as producer:
+        for chat_id in chat_ids:
+            celery_app.send_task("drain_outbox", args=[chat_id], producer=producer)
+
+    logger.warning(f"📮 [Outbox] {len(chat_ids)} chat(s) com comandos parados reenfileirado(s).")
+    return len(chat_ids)
@@ -36,4 +36,32 @@ def process_webhook_event(self, payload: dict):
         logger.error(f"❌ Erro FATAL na task {self.request.id}: {str(e)}")
         # Não damos raise aqui para não gerar loop de retry em erros de código (ex: KeyError)
         # Em um sistema avançado, aqui enviaríamos para uma Dead Letter Queue.
-        return f"Failed: {str(e)}"
\ No newline at end of file
+        return f"Failed: {str(e)}"
+
+def enqueue_webhook_events(payloads: list) -> list:
+    """
+    Publica os eventos de um POST em lote: UMA conexão/canal do broker (producer)
+    para todos, em vez de adquirir uma do pool a cada .delay().
+    Cada evento continua sendo roteado para a fila-shard do seu chat.
+    """
+    if not payloads:
+        return []
+
+    with celery_app.producer_or_acquire() as producer:
+        return [process_webhook_event.apply_async(args=[payload], producer=producer) for payload in payloads]
+
+@celery_app.task(
+        name="flush_debounced_messages",
+        acks_late=True,
+        ignore_result=True,
+        autoretry_for=(httpx.HTTPError, ConnectionError, TimeoutError),
+        retry_backoff=True,
+        retry_backoff_max=60,
+        max_retries=5
+        )
+def flush_debounced_messages(chat_id: int, token: int, join: str):
+    """
+    Fim da janela de debounce de um chat: agrupa o buffer e processa UMA vez.
+    """
+    from app.events.handlers import IncomingMessageService
+    IncomingMessageService().flush(chat_id, token, join)
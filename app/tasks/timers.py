@@ -0,0 +1,41 @@
+import logging
+from app.infrastructure.celery import celery_app
+from app.infrastructure.timers import TimerService, TIMER_TASKS
+
+logger = logging.getLogger(__name__)
+
+# Teto de lotes por namespace em cada execução (o próximo tick continua de onde parou)
+MAX_BATCHES_PER_SWEEP = 20
+
+@celery_app.task(name="sweep_timers", ignore_result=True)
+def sweep_timers():
+    """
+    Disparado pelo Celery Beat a cada TIMER_SWEEP_INTERVAL segundos.
+    Retira os timers vencidos do Redis em lotes e enfileira as tasks correspondentes.
+    """
+    timers = TimerService()
+    fired = 0
+
+    for namespace, task_name in TIMER_TASKS.items():
+        for _ in range(MAX_BATCHES_PER_SWEEP):
+            entries = timers.pop_due(namespace)
+            if not entries:
+                break
+
+            try:
+                with celery_app.producer_or_acquire() as producer:
+                    for chat_id, args in entries:
+                        celery_app.send_task(task_name, args=args, producer=producer)
+            except Exception as e:
+                # Devolve o lote: as tasks checam estado/versão, então um reenvio parcial é inofensivo
+                logger.error(f"❌ [Timers] Falha ao enfileirar '{namespace}' ({len(entries)} timers): {e}")
+                timers.requeue(namespace, entries)
+                break
+
+            fired += len(entries)
+            if len(entries) < timers.batch_size:
+                break
+
+    if fired:
+        logger.info(f"⏰ [Timers] {fired} timer(s) vencido(s) enfileirado(s).")
+    return fired
@@ -1,4 +1,7 @@
+import os
 import re
+import hmac
+import hashlib
 from datetime import datetime, timedelta
 import holidays
 
@@ -37,6 +40,24 @@ def clean_digits(text: str) -> str:
     """Retorna apenas os números da string"""
     return re.sub(r'[^0-9]', '', text)
 
+def cpf_hash_secret() -> bytes:
+    """
+    Segredo do HMAC do CPF (CPF_HASH_SECRET). Obrigatório: sem ele o hash vira um
+    HMAC sem chave sobre ~10^11 CPFs, revertido por força bruta.
+    Checado no boot da API e dos workers.
+    """
+    secret = os.getenv("CPF_HASH_SECRET")
+    if not secret:
+        raise ValueError("CPF_HASH_SECRET não configurado: o hash do CPF nas chaves do Redis seria reversível.")
+    return secret.encode()
+
+def hash_cpf(cpf: str) -> str:
+    """
+    Identificador do CPF para chaves do Redis (o CPF em claro nunca vira chave).
+    HMAC-SHA256 com CPF_HASH_SECRET: só 10^11 CPFs possíveis, um SHA puro seria reversível.
+    """
+    return hmac.new(cpf_hash_secret(), clean_digits(cpf).encode(), hashlib.sha256).hexdigest()[:32]
+
 MESES = {
     1: 'janeiro', 2: 'fevereiro', 3: 'março', 4: 'abril',
     5: 'maio', 6: 'junho', 7: 'julho', 8: 'agosto',
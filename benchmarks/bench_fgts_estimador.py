@@ -0,0 +1,95 @@
+"""
+Benchmark: chamadas ao /fgts/calculo evitadas pelo estimador local.
+
+Gera uma população SINTÉTICA de extratos (1 a 5 parcelas, valores de R$ 20 a R$ 3.000)
+e roda o TabelaSelector com e sem o EstimadorFGTS, contando as simulações remotas.
+A "Facta" aqui é uma função local que aprova se o líquido (outra convenção de prazo)
+passar do mínimo: mede chamadas evitadas, não latência de rede.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_fgts_estimador [n_extratos]
+"""
+import os
+import sys
+import random
+import time
+from datetime import date, timedelta
+from benchmarks.redis_probe import bench_redis
+
+TABELAS = [
+    {"codigo": 1, "taxa": 1.80, "nome": "A"},
+    {"codigo": 2, "taxa": 1.50, "nome": "B", "tac": 30},
+    {"codigo": 3, "taxa": 1.99, "nome": "C"},
+]
+MINIMO = 100.0
+
+def populacao(n: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    hoje = date.today()
+    extratos = []
+    for _ in range(n):
+        primeiro = hoje + timedelta(days=rng.randint(20, 330))
+        parcelas = []
+        for i in range(1, rng.randint(1, 5) + 1):
+            valor = round(rng.choice([rng.uniform(20, 150), rng.uniform(150, 3000)]), 2)
+            repasse = primeiro + timedelta(days=365 * (i - 1))
+            parcelas.append({f"dataRepasse_{i}": repasse.strftime("%d/%m/%Y"), f"valor_{i}": valor})
+        extratos.append(parcelas)
+    return extratos
+
+def facta_calculo_local(parcelas):
+    """Aprova se o líquido (meses de calendário) >= mínimo."""
+    hoje = date.today()
+
+    def simular(tabela):
+        total = iof = 0.0
+        for i, parcela in enumerate(parcelas, start=1):
+            d, m, a = map(int, parcela[f"dataRepasse_{i}"].split("/"))
+            repasse = date(a, m, d)
+            meses = (repasse.year - hoje.year) * 12 + (repasse.month - hoje.month) + (repasse.day - hoje.day) / 30
+            vp = parcela[f"valor_{i}"] / (1 + tabela["taxa"] / 100) ** meses
+            total += vp
+            iof += vp * 0.000082 * min((repasse - hoje).days, 365)
+        liquido = total - iof - 0.0038 * total - tabela.get("tac", 0)
+        if liquido >= MINIMO:
+            return {"status": "APROVADO", "tabela": tabela, "valor_liquido": liquido}
+        return {"status": "REPROVADO", "tabela": tabela}
+    return simular
+
+def rodar(extratos: list, estimador: bool):
+    from app.integrations.facta.fgts.tabelas import TabelaSelector
+
+    os.environ["FGTS_ESTIMADOR"] = "true" if estimador else "false"
+    os.environ["FGTS_ESTIMADOR_DESCARTE"] = "true" if estimador else "false"
+    selector = TabelaSelector(TABELAS)
+    selector._remember_winner = lambda key, tabela: None  # sem cache de vencedora: isola o efeito do estimador
+
+    chamadas = aprovados = 0
+    inicio = time.perf_counter()
+    for parcelas in extratos:
+        simular = facta_calculo_local(parcelas)
+
+        def contar(tabela, _simular=simular):
+            nonlocal chamadas
+            chamadas += 1
+            return _simular(tabela)
+
+        saldo = sum(p[f"valor_{i}"] for i, p in enumerate(parcelas, start=1))
+        resultado = selector.selecionar(saldo, contar, parcelas=parcelas)
+        aprovados += resultado["status"] == "APROVADO"
+    return chamadas, aprovados, (time.perf_counter() - inicio) * 1000
+
+def main(n: int = 2000):
+    extratos = populacao(n)
+    with bench_redis():
+        base_chamadas, base_aprovados, _ = rodar(extratos, estimador=False)
+        chamadas, aprovados, ms = rodar(extratos, estimador=True)
+
+    print(f"📊 {n} extratos sintéticos x {len(TABELAS)} tabelas (mínimo R$ {MINIMO:.0f})")
+    print(f"Sem estimador: {base_chamadas} chamadas ao /fgts/calculo | {base_aprovados} aprovados")
+    print(f"Com estimador: {chamadas} chamadas ao /fgts/calculo | {aprovados} aprovados")
+    print(f"Evitadas: {base_chamadas - chamadas} ({(base_chamadas - chamadas) / base_chamadas:.1%}) | aprovações perdidas: {base_aprovados - aprovados}")
+    print(f"Custo local total: {ms:.1f} ms ({ms / n * 1000:.1f} µs por extrato, incluindo o seletor)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
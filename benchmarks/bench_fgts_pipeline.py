@@ -0,0 +1,78 @@
+"""
+Benchmark: latência de uma simulação FGTS aprovada, sequencial vs pipeline.
+
+Sobe uma Facta falsa local (latência fixa por requisição) e mede
+FGTSService.consultar_melhor_oportunidade de ponta a ponta:
+- Sequencial: saldo -> cálculo -> conta bancária (3 idas à Facta)
+- Pipeline:   conta bancária em paralelo com saldo -> cálculo (2 idas no caminho crítico)
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_fgts_pipeline [n_simulacoes] [latencia_ms]
+"""
+import os
+import sys
+import json
+import statistics
+import time
+from benchmarks.redis_probe import bench_redis
+from benchmarks.standin import StandInServer
+
+def facta_standin(method: str, path: str, body: bytes):
+    rota = path.split("?")[0]
+    if rota == "/gera-token":
+        return 200, {"erro": False, "token": "TOKEN_BENCH"}
+    if rota == "/fgts/saldo":
+        return 200, {"erro": False, "retorno": {
+            "saldo_total": "3.000,00",
+            "dataRepasse_1": "01/08/2026", "valor_1": "1.000,00",
+            "dataRepasse_2": "01/08/2027", "valor_2": "1.000,00",
+        }}
+    if rota == "/fgts/calculo":
+        return 200, {"permitido": "SIM", "valor_liquido": "1.500,00", "taxa": 1.8, "tabela": 62170}
+    if rota == "/proposta/consulta-cliente":
+        return 200, {"erro": False, "cliente": [{"BANCO": "260", "AGENCIA": "1", "CONTA": "12345", "TIPO_CONTA": "C"}]}
+    return 404, {}
+
+def resumo(nome: str, amostras: list):
+    amostras = sorted(amostras)
+    p99 = amostras[max(int(len(amostras) * 0.99) - 1, 0)]
+    print(f"{nome:<12} p50={statistics.median(amostras):8.1f}ms  p99={p99:8.1f}ms  média={statistics.mean(amostras):8.1f}ms")
+
+def medir(n: int, pipeline: bool, offset: int) -> list:
+    from app.services.products.fgts_service import FGTSService
+
+    os.environ["FGTS_PIPELINE"] = "true" if pipeline else "false"
+    service = FGTSService()
+    amostras = []
+    for i in range(n):
+        cpf = f"{offset + i:011d}"  # CPF novo a cada simulação: sem hit no SaldoCache
+        inicio = time.perf_counter()
+        oferta = service.consultar_melhor_oportunidade(cpf)
+        amostras.append((time.perf_counter() - inicio) * 1000)
+        assert oferta.message_key == "com_saldo_conta", oferta
+    return amostras
+
+def main(n: int = 30, latencia_ms: float = 50.0):
+    with bench_redis(), StandInServer(facta_standin, latency=latencia_ms / 1000) as facta:
+        os.environ["FACTA_API_URL"] = facta.url
+        os.environ.setdefault("FACTA_USER", "bench")
+        os.environ.setdefault("FACTA_PASSWORD", "bench")
+        os.environ.pop("FACTA_PROXY_URL", None)
+
+        from app.infrastructure.http_clients import HttpClientRegistry
+        HttpClientRegistry.reset_after_fork()
+
+        medir(1, pipeline=False, offset=0)  # aquece token + pool
+
+        print(f"📊 {n} simulações aprovadas | Facta falsa com {latencia_ms:.0f}ms por requisição")
+        resumo("Sequencial", medir(n, pipeline=False, offset=1_000))
+        resumo("Pipeline", medir(n, pipeline=True, offset=2_000))
+        print(f"Requisições por rota: {json.dumps(facta.hits)}")
+
+        HttpClientRegistry.close_all()
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 30,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 50.0,
+    )
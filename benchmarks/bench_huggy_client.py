@@ -0,0 +1,60 @@
+"""
+Benchmark: latência por chamada da Huggy (cliente novo por chamada vs pool do worker).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_huggy_client [n_chamadas]
+"""
+import os
+import statistics
+import sys
+import time
+import httpx
+from benchmarks.standin import StandInServer
+from app.integrations.huggy.client import HuggyClient
+from app.infrastructure.http_clients import HttpClientRegistry
+
+def huggy_standin(method: str, path: str, body: bytes):
+    return 200, {}
+
+def medir(fn, n: int) -> list:
+    amostras = []
+    for i in range(n):
+        inicio = time.perf_counter()
+        fn(i)
+        amostras.append((time.perf_counter() - inicio) * 1000)
+    return amostras
+
+def resumo(nome: str, amostras: list):
+    amostras = sorted(amostras)
+    p50 = statistics.median(amostras)
+    p99 = amostras[int(len(amostras) * 0.99) - 1]
+    print(f"{nome:<28} p50={p50:7.3f}ms  p99={p99:7.3f}ms  média={statistics.mean(amostras):7.3f}ms")
+
+def main(n: int = 500):
+    with StandInServer(huggy_standin) as server:
+        base_url = f"{server.url}/v3/companies/351946"
+
+        # ANTES: um httpx.Client (handshake novo) por chamada
+        def antes(i):
+            with httpx.Client(timeout=10.0) as client:
+                client.put(f"{base_url}/chats/{i}/workflow", json={"stepId": 1})
+
+        # DEPOIS: HuggyClient usando o pool compartilhado do processo
+        # (sem o rate limit, que é medido à parte em bench_huggy_rate_limit)
+        os.environ["HUGGY_RATE_LIMIT"] = "false"
+        huggy = HuggyClient()
+        huggy.base_url = base_url
+
+        def depois(i):
+            huggy.update_workflow_step(i, 1)
+
+        depois(0)  # aquece o pool (equivalente ao worker_process_init)
+
+        print(f"📊 {n} chamadas PUT /workflow contra {server.url}")
+        resumo("Antes (cliente por chamada)", medir(antes, n))
+        resumo("Depois (pool do worker)", medir(depois, n))
+
+    HttpClientRegistry.close_all()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,91 @@
+"""
+Benchmark: vários workers disparando chamadas à Huggy, sem vs com o rate limit distribuído.
+
+Sobe uma Huggy falsa local que aplica o próprio limite (token bucket) e devolve 429
+acima dele. Mede, para N threads martelando PUT /workflow durante alguns segundos:
+- vazão aceita (req/s), quantidade de 429 e a espera média imposta pelo limiter.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_huggy_rate_limit [duracao_s] [threads] [limite_req_s]
+"""
+import os
+import sys
+import threading
+import time
+from benchmarks.redis_probe import bench_redis
+from benchmarks.standin import StandInServer
+
+class HuggyComLimite:
+    """Huggy falsa: aceita até 'rate' req/s (burst 'capacity'); o excedente leva 429."""
+    def __init__(self, rate: float, capacity: float):
+        self.rate, self.capacity = rate, capacity
+        self.tokens, self.ts = capacity, time.monotonic()
+        self.status = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, body):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+            status = 200 if self.tokens >= 1 else 429
+            if status == 200:
+                self.tokens -= 1
+            self.status[status] = self.status.get(status, 0) + 1
+        return status, {}
+
+def rodar(nome: str, limitar: bool, duracao: float, threads: int, limite: float):
+    from app.integrations.huggy.client import HuggyClient
+    from app.infrastructure.http_clients import HttpClientRegistry
+    from app.infrastructure.metrics import Metrics
+
+    # Limiter configurado com 10% de folga abaixo do limite da Huggy
+    burst = max(int(limite / 4), 1)
+    os.environ["HUGGY_RATE_LIMIT"] = "true" if limitar else "false"
+    os.environ["HUGGY_RATE_WORKFLOW"] = str(limite * 0.9)
+    os.environ["HUGGY_BURST_WORKFLOW"] = str(burst)
+    huggy_falsa = HuggyComLimite(rate=limite, capacity=burst + threads)
+
+    with StandInServer(huggy_falsa) as server:
+        fim = time.monotonic() + duracao
+
+        def worker():
+            client = HuggyClient()
+            client.base_url = server.url
+            while time.monotonic() < fim:
+                client.update_workflow_step(1, 1)
+
+        inicio = time.monotonic()
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        decorrido = time.monotonic() - inicio
+
+    HttpClientRegistry.close_all()
+
+    aceitas, rejeitadas = huggy_falsa.status.get(200, 0), huggy_falsa.status.get(429, 0)
+    counters = Metrics.snapshot()
+    throttled = int(counters.get("huggy_throttled:workflow", 0))
+    espera = counters.get("huggy_throttle_wait_ms:workflow", 0) / throttled if throttled else 0
+    print(f"{nome:<22} aceitas={aceitas / decorrido:7.1f} req/s  429={rejeitadas:6d}  "
+          f"throttled={throttled:5d}  espera média={espera:6.1f}ms")
+
+def main(duracao: float = 5.0, threads: int = 16, limite: float = 10.0):
+    import logging
+    logging.disable(logging.ERROR)  # os 429 do cenário "sem limite" poluiriam a saída
+
+    print(f"📊 {threads} threads x {duracao:.0f}s, Huggy aceitando {limite:.0f} req/s")
+    with bench_redis():
+        rodar("Sem rate limit", False, duracao, threads, limite)
+    with bench_redis():
+        rodar("Com rate limit", True, duracao, threads, limite)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        float(args[0]) if len(args) > 0 else 5.0,
+        int(args[1]) if len(args) > 1 else 16,
+        float(args[2]) if len(args) > 2 else 10.0,
+    )
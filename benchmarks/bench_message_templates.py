@@ -0,0 +1,77 @@
+"""
+Microbenchmark: resolução de template no send_message (sem HTTP).
+
+- Antes: redis.from_url a cada chamada + GET do catálogo inteiro + json.loads + format.
+- Catálogo: MessageLoader.get (catálogo em memória, revalidado por carimbo de versão) + format.
+- Compilado: MessageLoader.get_compiled + build_payload (campos e payload estático prontos).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_message_templates [n]
+    REDIS_BENCH_URL=redis://localhost:6379/15 python -m benchmarks.bench_message_templates
+"""
+import json
+import os
+import sys
+import time
+import redis
+from benchmarks.redis_probe import bench_redis, count_round_trips
+
+CHAVE = "com_saldo"
+VARIAVEIS = {"valor": "R$ 1.234,56", "banco": "Banco X"}
+
+def legado(key: str) -> dict:
+    """Reproduz o MessageLoader.get + montagem do payload antigos."""
+    r = redis.from_url(os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0"), decode_responses=True)
+    template = json.loads(r.get("bot:content:messages")).get(key, {})
+    payload = {"text": template.get("text", "").format(**VARIAVEIS)}
+    if "options" in template:
+        payload["options"] = template["options"]
+    if template.get("file"):
+        payload["file"] = template["file"]
+    payload["isInternal"] = template.get("isInternal", False)
+    return payload
+
+def catalogo(key: str) -> dict:
+    from app.services.bot.content.message_loader import MessageLoader
+    template = MessageLoader.get(key)
+    payload = {"text": template.get("text", "").format(**VARIAVEIS)}
+    if "options" in template:
+        payload["options"] = template["options"]
+    if template.get("file"):
+        payload["file"] = template["file"]
+    payload["isInternal"] = template.get("isInternal", False)
+    return payload
+
+def compilado(key: str) -> dict:
+    from app.services.bot.content.message_loader import MessageLoader
+    return MessageLoader.get_compiled(key).build_payload(VARIAVEIS)
+
+def medir(funcao, n: int):
+    with count_round_trips() as rtt:
+        inicio = time.perf_counter()
+        for _ in range(n):
+            funcao(CHAVE)
+        total = time.perf_counter() - inicio
+    return total * 1e6 / n, rtt.count / n
+
+def main(n: int = 5000):
+    from app.services.bot.content.message_loader import MessageLoader
+
+    with bench_redis():
+        MessageLoader.reset()
+        mensagens = MessageLoader.load_local()
+        r = MessageLoader._get_redis()
+        r.set(MessageLoader.REDIS_KEY, json.dumps(mensagens, ensure_ascii=False))
+        r.set(MessageLoader.FRESH_KEY, 1, ex=MessageLoader.TTL)
+        r.incr(MessageLoader.VERSION_KEY)
+
+        compilado(CHAVE)  # aquece o catálogo do processo
+
+        print(f"Catálogo: {len(mensagens)} mensagens, {len(json.dumps(mensagens, ensure_ascii=False))} bytes")
+        print(f"{'':<10}{'µs/msg':>10}{'RTT/msg':>10}")
+        for nome, funcao in (("Antes", legado), ("Catálogo", catalogo), ("Compilado", compilado)):
+            us, rtt = medir(funcao, n)
+            print(f"{nome:<10}{us:>10.2f}{rtt:>10.3f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,71 @@
+"""
+Benchmark: memória ocupada no Redis por N conversas, layout antigo vs hash.
+
+Layout antigo: 3 strings com TTL cada (chat:{id}:state / :context / :last_interaction)
+Layout novo:   1 hash listpack com 1 TTL (chat:{id})
+
+Precisa de um Redis REAL (o fakeredis não mede memória):
+    REDIS_BENCH_URL=redis://localhost:6379/15 python -m benchmarks.bench_session_memory [n_chats]
+
+⚠️ Use um DB vazio/descartável: as chaves de teste são apagadas ao final.
+"""
+import json
+import os
+import sys
+import time
+import redis
+
+PREFIX = "benchmem"
+CONTEXT = json.dumps({"cpf": "52998224725"}, separators=(",", ":"))
+BATCH = 5000
+
+def used_memory(r) -> int:
+    return int(r.info("memory")["used_memory"])
+
+def popular(r, n: int, layout: str):
+    agora = int(time.time())
+    for inicio in range(0, n, BATCH):
+        pipe = r.pipeline(transaction=False)
+        for chat_id in range(inicio, min(inicio + BATCH, n)):
+            if layout == "antigo":
+                pipe.set(f"{PREFIX}:{chat_id}:state", "FGTS_AGUARDANDO_CPF", ex=86400)
+                pipe.set(f"{PREFIX}:{chat_id}:context", CONTEXT, ex=86400)
+                pipe.set(f"{PREFIX}:{chat_id}:last_interaction", agora, ex=86400)
+            else:
+                key = f"{PREFIX}:{chat_id}"
+                pipe.hset(key, mapping={"state": "FGTS_AGUARDANDO_CPF", "context": CONTEXT, "last_interaction": agora})
+                pipe.expire(key, 86400)
+        pipe.execute()
+
+def limpar(r):
+    for keys in iter(lambda: r.keys(f"{PREFIX}:*")[:BATCH], []):
+        r.delete(*keys)
+
+def medir(r, n: int, layout: str) -> int:
+    limpar(r)
+    antes = used_memory(r)
+    popular(r, n, layout)
+    depois = used_memory(r)
+    if layout == "hash":
+        print(f"   encoding do hash: {r.object('encoding', f'{PREFIX}:0')}")
+    limpar(r)
+    return depois - antes
+
+def main(n: int = 100_000):
+    url = os.getenv("REDIS_BENCH_URL")
+    if not url:
+        print("❌ Defina REDIS_BENCH_URL (Redis real, DB descartável).")
+        sys.exit(1)
+
+    r = redis.from_url(url)
+    print(f"📊 {n} conversas em {url}")
+
+    antigo = medir(r, n, "antigo")
+    novo = medir(r, n, "hash")
+
+    print(f"Layout antigo (3 chaves): {antigo / 1024 / 1024:8.2f} MB  ({antigo / n:6.1f} B/chat)")
+    print(f"Layout hash   (1 chave) : {novo / 1024 / 1024:8.2f} MB  ({novo / n:6.1f} B/chat)")
+    print(f"Economia: {100 * (1 - novo / antigo):.1f}%")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
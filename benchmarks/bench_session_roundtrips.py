@@ -0,0 +1,73 @@
+"""
+Microbenchmark: round trips ao Redis por mensagem, para cada estado do Engine.
+
+Compara a sequência antiga (touch/get_state/get_context/set_context/set_state avulsos)
+com a Unit of Work (begin + commit).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_session_roundtrips
+"""
+from unittest import mock
+from benchmarks.redis_probe import bench_redis, count_round_trips
+from app.schemas.credit import AnalysisStatus, CreditOffer
+
+CPF_VALIDO = "52998224725"
+
+# (estado inicial, input do usuário)
+CENARIOS = [
+    ("START", "oi"),
+    ("MENU_APRESENTACAO", "2"),
+    ("MENU_APRESENTACAO", "texto livre"),
+    ("CLT_AGUARDANDO_CPF", CPF_VALIDO),
+    ("CLT_AGUARDANDO_CPF", "123"),
+    ("CLT_AGUARDANDO_TEMPO_REGISTRO", "1"),
+    ("FGTS_AGUARDANDO_CPF", CPF_VALIDO),
+    ("FINISHED", "oi"),
+]
+
+def legado(r, chat_id: int, grava_contexto: bool, muda_estado: bool):
+    """Reproduz os comandos que o Engine fazia antes da Unit of Work (chaves avulsas)."""
+    r.set(f"bench:{chat_id}:last_interaction", 1, ex=86400)
+    r.get(f"bench:{chat_id}:state")
+    r.get(f"bench:{chat_id}:context")
+    if grava_contexto:
+        r.set(f"bench:{chat_id}:context", "{}", ex=86400)
+    if muda_estado:
+        r.set(f"bench:{chat_id}:state", "X", ex=86400)
+
+def main():
+    from app.services.bot.engine import BotEngine
+    from app.services.bot.memory.session import SessionManager
+
+    oferta = CreditOffer(status=AnalysisStatus.SEM_SALDO, message_key="sem_saldo")
+
+    with bench_redis(), \
+         mock.patch("app.services.bot.engine.HuggyService"), \
+         mock.patch("app.services.bot.engine.FGTSService") as fgts, \
+         mock.patch.object(BotEngine, "_schedule_timeout"):
+
+        fgts.return_value.consultar_melhor_oportunidade.return_value = oferta
+        engine = BotEngine()
+        session = SessionManager()
+
+        # Aquece o script Lua (o 1º EVALSHA do processo faz SCRIPT LOAD)
+        engine.process(0, "oi")
+
+        print(f"{'Estado':<32}{'Input':<14}{'Antes':>6}{'Depois':>8}")
+        for chat_id, (estado, texto) in enumerate(CENARIOS, start=1):
+            session.set_state(chat_id, estado)
+
+            with count_round_trips() as rtt:
+                engine.process(chat_id, texto)
+            depois = rtt.count
+
+            novo_estado = session.get_state(chat_id)
+            grava_contexto = texto == CPF_VALIDO and estado != "FINISHED"
+            with count_round_trips() as rtt:
+                legado(session.redis_client, chat_id, grava_contexto, novo_estado != estado)
+            antes = rtt.count
+
+            print(f"{estado:<32}{texto[:12]:<14}{antes:>6}{depois:>8}")
+
+if __name__ == "__main__":
+    main()
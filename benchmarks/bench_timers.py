@@ -0,0 +1,81 @@
+"""
+Benchmark: 100k conversas ociosas com timer pendente.
+
+Mede:
+- tempo para agendar N timers (ZSET) e para varrer os vencidos em lotes (Lua);
+- memória Python do processo durante a varredura (fica limitada ao lote,
+  não cresce com N: nada de ETA tasks presas na memória do worker);
+- memória do Redis (só com REDIS_BENCH_URL; o fakeredis não mede).
+
+⚠️ Os tempos só valem com Redis real: o fakeredis (e o Lua via lupa) é ordens de
+grandeza mais lento. Sem REDIS_BENCH_URL, olhe só as contagens e a memória Python.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_timers [n]
+    REDIS_BENCH_URL=redis://localhost:6379/15 python -m benchmarks.bench_timers 100000
+"""
+import sys
+import time
+import tracemalloc
+from benchmarks.redis_probe import bench_redis
+
+BATCH = 5000
+
+def _used_memory(r):
+    try:
+        return int(r.info("memory")["used_memory"])
+    except Exception:
+        return None  # fakeredis
+
+def main(n: int = 100_000):
+    from app.infrastructure.timers import TimerService
+
+    with bench_redis():
+        timers = TimerService()
+        r = timers.redis_client
+        r.delete(timers._get_key("bench"), timers._get_payload_key("bench"))
+        memoria_antes = _used_memory(r)
+
+        inicio = time.perf_counter()
+        agora = time.time()
+        for comeco in range(0, n, BATCH):
+            pipe = r.pipeline(transaction=False)
+            for chat_id in range(comeco, min(comeco + BATCH, n)):
+                # metade vence agora, metade daqui a 5h
+                vence = agora - 1 if chat_id % 2 == 0 else agora + 18000
+                pipe.zadd(timers._get_key("bench"), {chat_id: vence})
+                pipe.hset(timers._get_payload_key("bench"), chat_id, f'[{chat_id},"MENU_APRESENTACAO",0]')
+            pipe.execute()
+        agendar = time.perf_counter() - inicio
+
+        memoria_redis = _used_memory(r) - memoria_antes if memoria_antes is not None else None
+
+        # Reagendar o MESMO chat não cria timer novo (substitui)
+        for _ in range(100):
+            timers.schedule("bench", 1, 18000, [1, "MENU_APRESENTACAO", 0])
+
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        disparados, lotes = 0, 0
+        while True:
+            lote = timers.pop_due("bench")
+            if not lote:
+                break
+            disparados += len(lote)
+            lotes += 1
+        varrer = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"Timers pendentes         : {n}")
+        print(f"Agendar (pipeline)       : {agendar:.2f} s")
+        print(f"Vencidos disparados      : {disparados} em {lotes} lotes de até {timers.batch_size} ({varrer:.2f} s)")
+        print(f"Ainda pendentes          : {timers.pending('bench')}")
+        print(f"Pico de memória Python   : {pico / 1024:.0f} KB durante a varredura (limitado pelo lote)")
+        if memoria_redis:
+            print(f"Memória no Redis         : {memoria_redis / 1024 / 1024:.1f} MB ({memoria_redis / n:.0f} B/timer)")
+
+        r.delete(timers._get_key("bench"), timers._get_payload_key("bench"))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
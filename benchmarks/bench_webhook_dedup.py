@@ -0,0 +1,39 @@
+"""
+Microbenchmark: custo do índice de idempotência por webhook.
+
+Mede a latência de WebhookDeduplicator.is_duplicate (1 pipeline: SET NX EX + contador).
+Com Redis real na mesma rede, o alvo é < 1 ms (p99).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_webhook_dedup [n]
+    REDIS_BENCH_URL=redis://localhost:6379/15 python -m benchmarks.bench_webhook_dedup
+"""
+import sys
+import time
+from benchmarks.redis_probe import bench_redis, count_round_trips
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    return ordenadas[min(int(len(ordenadas) * p), len(ordenadas) - 1)]
+
+def main(n: int = 5000):
+    from app.infrastructure.idempotency import WebhookDeduplicator
+
+    with bench_redis():
+        dedup = WebhookDeduplicator()
+        tempos = []
+
+        with count_round_trips() as rtt:
+            dedup.is_duplicate("receivedAllMessage", {"id": "aquecimento", "chat": {"id": 1}})
+        print(f"Round trips por webhook novo: {rtt.count}")
+
+        for i in range(n):
+            evento = {"id": f"bench-{i % (n // 2)}", "chat": {"id": i}}  # metade são reentregas
+            inicio = time.perf_counter()
+            dedup.is_duplicate("receivedAllMessage", evento)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        print(f"{n} checagens | p50 {percentil(tempos, 0.5):.3f} ms | p99 {percentil(tempos, 0.99):.3f} ms")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,47 @@
+"""
+Microbenchmark: custo de enfileirar os eventos de UM POST da Huggy (1, 10 e 100 eventos).
+
+- Antes: um .delay() por evento (cada um adquire conexão/canal do pool do broker).
+- Depois: enqueue_webhook_events (um producer para o lote inteiro).
+
+Usa o broker em memória do kombu por padrão (mede só o overhead do cliente).
+Para medir contra o Redis real:
+    BENCH_BROKER_URL=redis://localhost:6379/15 python -m benchmarks.bench_webhook_enqueue
+"""
+import os
+import time
+
+TAMANHOS = (1, 10, 100)
+REPETICOES = 50
+
+def _payloads(n: int) -> list:
+    return [{"messages": {"receivedAllMessage": [{"id": f"m{i}", "chat": {"id": i}, "body": "oi"}]}} for i in range(n)]
+
+def _medir(funcao, payloads) -> float:
+    inicio = time.perf_counter()
+    for _ in range(REPETICOES):
+        funcao(payloads)
+    return (time.perf_counter() - inicio) * 1000 / REPETICOES
+
+def main():
+    from app.infrastructure.celery import celery_app
+    from app.tasks.processor import enqueue_webhook_events, process_webhook_event
+
+    celery_app.conf.broker_url = os.getenv("BENCH_BROKER_URL", "memory://")
+    print(f"🧪 Broker: {celery_app.conf.broker_url}")
+
+    def um_por_evento(payloads):
+        for payload in payloads:
+            process_webhook_event.delay(payload)
+
+    enqueue_webhook_events(_payloads(1))  # aquece conexão/pool
+
+    print(f"{'Eventos':>8}{'Antes (ms)':>14}{'Depois (ms)':>14}")
+    for n in TAMANHOS:
+        payloads = _payloads(n)
+        antes = _medir(um_por_evento, payloads)
+        depois = _medir(enqueue_webhook_events, payloads)
+        print(f"{n:>8}{antes:>14.3f}{depois:>14.3f}")
+
+if __name__ == "__main__":
+    main()
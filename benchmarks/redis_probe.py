@@ -0,0 +1,61 @@
+"""
+Contador de round trips (RTT) ao Redis para os microbenchmarks.
+
+Cada comando avulso = 1 RTT. Cada pipeline/MULTI-EXEC executado = 1 RTT.
+Usa o Redis real se REDIS_BENCH_URL estiver definido; senão, fakeredis.
+"""
+import os
+from contextlib import contextmanager
+from unittest import mock
+import redis
+from redis.client import Pipeline
+
+class RoundTripCounter:
+    def __init__(self):
+        self.count = 0
+
+    def reset(self):
+        self.count = 0
+
+@contextmanager
+def count_round_trips():
+    counter = RoundTripCounter()
+    original_execute_command = redis.Redis.execute_command
+    original_pipeline_execute = Pipeline.execute
+
+    def execute_command(self, *args, **kwargs):
+        if not isinstance(self, Pipeline):
+            counter.count += 1
+        return original_execute_command(self, *args, **kwargs)
+
+    def pipeline_execute(self, *args, **kwargs):
+        counter.count += 1
+        return original_pipeline_execute(self, *args, **kwargs)
+
+    with mock.patch.object(redis.Redis, "execute_command", execute_command), \
+         mock.patch.object(Pipeline, "execute", pipeline_execute):
+        yield counter
+
+@contextmanager
+def bench_redis():
+    """
+    Aponta o 'redis.from_url' do app para o Redis do benchmark.
+    """
+    from app.infrastructure.redis_client import reset_redis
+    url = os.getenv("REDIS_BENCH_URL")
+
+    if url:
+        real_from_url = redis.from_url
+        factory = lambda _url, **kwargs: real_from_url(url, **kwargs)
+        label = url
+    else:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        factory = lambda _url, decode_responses=False, **kwargs: fakeredis.FakeRedis(server=server, decode_responses=decode_responses)
+        label = "fakeredis (defina REDIS_BENCH_URL para usar um Redis real)"
+
+    reset_redis()
+    with mock.patch("redis.from_url", side_effect=factory):
+        print(f"🧪 Redis: {label}")
+        yield
+    reset_redis()
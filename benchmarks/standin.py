@@ -0,0 +1,85 @@
+"""
+Servidores HTTP locais (stand-ins) para os benchmarks.
+Simulam as APIs externas (Huggy, Facta) sem sair da máquina.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Tuple
+
+# (status, body) devolvido por uma rota: handler(method, path, body_bytes)
+# Com pass_headers=True: handler(method, path, body_bytes, request_headers) e pode
+# devolver (status, body, response_headers).
+RouteHandler = Callable[..., Tuple]
+
+class StandInServer:
+    """
+    Sobe um ThreadingHTTPServer em 127.0.0.1 numa porta livre.
+    Conta as requisições por rota e aplica latência artificial opcional.
+    """
+    def __init__(self, handler: RouteHandler, latency: float = 0.0, pass_headers: bool = False):
+        self.handler = handler
+        self.latency = latency
+        self.pass_headers = pass_headers
+        self.hits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _count(self, path: str):
+        with self._lock:
+            self.hits[path] = self.hits.get(path, 0) + 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                path = self.path.split("?")[0]
+                server._count(path)
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if server.pass_headers:
+                    result = server.handler(self.command, self.path, body, dict(self.headers))
+                else:
+                    result = server.handler(self.command, self.path, body)
+                status, data = result[0], result[1]
+                extra_headers = result[2] if len(result) > 2 else {}
+
+                raw = json.dumps(data).encode() if data is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            do_GET = do_POST = do_PUT = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,37 @@
+from app.events.dispatcher import EventDispatcher
+from app.tasks import processor
+
+def _message(chat_id, body="oi"):
+    return {"chat": {"id": chat_id}, "body": body}
+
+def test_dispatch_handles_every_event_in_order(mocker):
+    mocker.patch.object(EventDispatcher, "shoud_ignore_event_data", return_value=False)
+    incoming = mocker.patch("app.events.dispatcher.IncomingMessageService").return_value
+    closed = mocker.patch("app.events.dispatcher.ClosedChatService").return_value
+
+    EventDispatcher.dispatch({"messages": {
+        "receivedAllMessage": [_message(1, "a"), _message(2, "b")],
+        "closedChat": [{"id": 3}],
+    }})
+
+    assert [c.args[0]["body"] for c in incoming.handle.call_args_list] == ["a", "b"]
+    closed.handle.assert_called_once_with(3)
+
+def test_should_filter_payload_only_when_no_event_survives(mocker):
+    mocker.patch.object(EventDispatcher, "shoud_ignore_event_data", side_effect=lambda e: e["chat"]["id"] != 2)
+
+    assert EventDispatcher.should_filter_payload({"messages": {"receivedAllMessage": [_message(1)]}}) is True
+    assert EventDispatcher.should_filter_payload({"messages": {"receivedAllMessage": [_message(1), _message(2)]}}) is False
+    assert EventDispatcher.should_filter_payload({"messages": {}}) is True
+
+def test_enqueue_reuses_one_producer(mocker):
+    acquire = mocker.patch.object(processor.celery_app, "producer_or_acquire")
+    producer = acquire.return_value.__enter__.return_value
+    apply_async = mocker.patch.object(processor.process_webhook_event, "apply_async")
+    events = [{"messages": {"closedChat": [{"id": i}]}} for i in range(3)]
+
+    processor.enqueue_webhook_events(events)
+
+    acquire.assert_called_once()
+    assert apply_async.call_count == 3
+    assert all(c.kwargs["producer"] is producer for c in apply_async.call_args_list)
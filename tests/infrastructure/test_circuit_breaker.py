@@ -0,0 +1,106 @@
+import httpx
+import pytest
+from app.infrastructure.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.infrastructure.metrics import Metrics
+
+@pytest.fixture
+def breaker(fake_redis, monkeypatch):
+    monkeypatch.setenv("TESTE_CIRCUIT_MIN_CALLS", "4")
+    monkeypatch.setenv("TESTE_TIMEOUT_MIN", "0.05")
+    return CircuitBreaker("teste", "endpoint", max_timeout=10.0)
+
+def resposta(status: int) -> httpx.Response:
+    return httpx.Response(status, request=httpx.Request("GET", "http://teste"))
+
+def falha(timeout):
+    raise httpx.ReadTimeout("lento demais")
+
+def test_opens_after_error_rate_and_fails_fast(breaker, mocker):
+    for _ in range(4):
+        with pytest.raises(httpx.ReadTimeout):
+            breaker.call(falha)
+
+    send = mocker.Mock(return_value=resposta(200))
+    with pytest.raises(CircuitOpenError):
+        breaker.call(send)
+
+    send.assert_not_called()
+    counters = Metrics.snapshot()
+    assert counters["circuit_open:teste:endpoint"] == 1
+    assert counters["circuit_rejected:teste:endpoint"] == 1
+    assert CircuitBreaker.tripped() == ["teste:endpoint"]
+
+def test_below_min_calls_does_not_open(breaker):
+    for _ in range(3):
+        with pytest.raises(httpx.ReadTimeout):
+            breaker.call(falha)
+
+    assert breaker.call(lambda timeout: resposta(200)).status_code == 200
+
+def test_server_errors_count_as_failures_but_client_errors_do_not(breaker):
+    for _ in range(4):
+        breaker.call(lambda timeout: resposta(404))
+    assert CircuitBreaker.tripped() == []
+
+    for _ in range(4):  # 4 ok + 4 falhas = 50% da janela
+        breaker.call(lambda timeout: resposta(503))
+    assert CircuitBreaker.tripped() == ["teste:endpoint"]
+
+def test_half_open_sends_single_probe_and_closes_on_success(breaker, fake_redis, mocker):
+    for _ in range(4):
+        with pytest.raises(httpx.ReadTimeout):
+            breaker.call(falha)
+    fake_redis.delete("circuit:teste:endpoint:open")  # passou o CIRCUIT_OPEN_SECONDS
+
+    # Enquanto a chamada de teste está em voo, as outras continuam falhando rápido
+    def probe(timeout):
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda timeout: resposta(200))
+        return resposta(200)
+
+    assert breaker.call(probe).status_code == 200
+    assert CircuitBreaker.tripped() == []
+
+    # Fechado e com a janela limpa: uma falha isolada não reabre
+    with pytest.raises(httpx.ReadTimeout):
+        breaker.call(falha)
+    assert breaker.call(lambda timeout: resposta(200)).status_code == 200
+
+def test_failed_probe_reopens(breaker, fake_redis):
+    for _ in range(4):
+        with pytest.raises(httpx.ReadTimeout):
+            breaker.call(falha)
+    fake_redis.delete("circuit:teste:endpoint:open")
+
+    with pytest.raises(httpx.ReadTimeout):
+        breaker.call(falha)
+
+    assert fake_redis.exists("circuit:teste:endpoint:open")
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda timeout: resposta(200))
+
+def test_timeout_follows_observed_p99(breaker, fake_redis):
+    """Sem amostras usa o teto fixo; com histórico, p99 x multiplicador"""
+    timeouts = []
+    breaker.call(lambda timeout: timeouts.append(timeout) or resposta(200))
+    assert timeouts == [10.0]
+
+    fake_redis.delete("circuit:teste:endpoint:latency")
+    fake_redis.rpush("circuit:teste:endpoint:latency", *([100.0] * 99 + [200.0]))
+    breaker._timeout_at = 0  # força releitura das amostras
+
+    breaker.call(lambda timeout: timeouts.append(timeout) or resposta(200))
+    assert timeouts[-1] == pytest.approx(0.15)
+
+def test_timeout_never_exceeds_configured_ceiling(breaker, fake_redis):
+    fake_redis.rpush("circuit:teste:endpoint:latency", *([30000.0] * 50))
+
+    assert breaker.call(lambda timeout: resposta(200) if timeout == 10.0 else None).status_code == 200
+
+def test_fail_open_when_redis_is_down(mocker):
+    mocker.patch("app.infrastructure.circuit_breaker.get_redis", side_effect=ConnectionError("redis fora"))
+    breaker = CircuitBreaker("teste", "endpoint", max_timeout=7.0)
+    timeouts = []
+
+    assert breaker.call(lambda timeout: timeouts.append(timeout) or resposta(200)).status_code == 200
+    assert timeouts == [7.0]
@@ -0,0 +1,43 @@
+import pytest
+import httpx
+from app.infrastructure.http_clients import HttpClientRegistry, build_limits, use_http2
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    HttpClientRegistry.reset_after_fork()
+    yield
+    HttpClientRegistry.close_all()
+
+def test_registry_reuses_same_client():
+    """O mesmo processo deve receber sempre o MESMO pool"""
+    HttpClientRegistry.register("teste", lambda: httpx.Client())
+
+    first = HttpClientRegistry.get("teste")
+    second = HttpClientRegistry.get("teste")
+
+    assert first is second
+
+def test_registry_recreates_after_close():
+    HttpClientRegistry.register("teste", lambda: httpx.Client())
+
+    first = HttpClientRegistry.get("teste")
+    HttpClientRegistry.close_all()
+
+    assert first.is_closed
+    assert HttpClientRegistry.get("teste") is not first
+
+def test_build_limits_from_env(monkeypatch):
+    monkeypatch.setenv("HUGGY_HTTP_MAX_CONNECTIONS", "50")
+    monkeypatch.setenv("HUGGY_HTTP_MAX_KEEPALIVE", "25")
+
+    limits = build_limits("HUGGY")
+
+    assert limits.max_connections == 50
+    assert limits.max_keepalive_connections == 25
+
+def test_http2_falls_back_without_h2(monkeypatch, mocker):
+    """Se o pacote 'h2' não existir, não pode quebrar o worker"""
+    monkeypatch.setenv("HUGGY_HTTP2", "true")
+    mocker.patch("app.infrastructure.http_clients._http2_available", return_value=False)
+
+    assert use_http2("HUGGY") is False
@@ -0,0 +1,60 @@
+import time
+from app.infrastructure.idempotency import WebhookDeduplicator
+from app.infrastructure.metrics import Metrics
+
+def _msg(msg_id=None, chat_id=123, body="oi"):
+    data = {"chat": {"id": chat_id}, "body": body}
+    if msg_id:
+        data["id"] = msg_id
+    return data
+
+def test_same_message_id_is_dropped_once_seen(fake_redis):
+    dedup = WebhookDeduplicator()
+
+    assert dedup.is_duplicate("receivedAllMessage", _msg("m-1")) is False
+    assert dedup.is_duplicate("receivedAllMessage", _msg("m-1")) is True
+    assert dedup.is_duplicate("receivedAllMessage", _msg("m-2")) is False
+
+    counters = Metrics.snapshot()
+    assert counters["webhook_duplicates_dropped"] == 1
+    assert counters["webhook_events_checked"] == 3
+
+def test_fallback_uses_chat_and_body_with_short_ttl(fake_redis):
+    dedup = WebhookDeduplicator()
+
+    assert dedup.is_duplicate("receivedAllMessage", _msg(body="1")) is False
+    assert dedup.is_duplicate("receivedAllMessage", _msg(body="1")) is True
+    # Outro texto ou outro chat não colidem
+    assert dedup.is_duplicate("receivedAllMessage", _msg(body="2")) is False
+    assert dedup.is_duplicate("receivedAllMessage", _msg(chat_id=456, body="1")) is False
+
+    key, ttl = dedup.fingerprint("receivedAllMessage", _msg(body="1"))
+    assert ttl == dedup.fallback_ttl
+    assert 0 < fake_redis.ttl(key) <= dedup.fallback_ttl
+
+def test_closed_chat_is_keyed_by_chat_id(fake_redis):
+    dedup = WebhookDeduplicator()
+    assert dedup.is_duplicate("closedChat", {"id": 99}) is False
+    assert dedup.is_duplicate("closedChat", {"id": 99}) is True
+
+def test_redis_failure_fails_open(mocker, fake_redis):
+    dedup = WebhookDeduplicator()
+    mocker.patch.object(dedup.redis_client, "pipeline", side_effect=ConnectionError("down"))
+    assert dedup.is_duplicate("receivedAllMessage", _msg("m-1")) is False
+
+def test_lookup_is_a_single_round_trip(mocker, fake_redis):
+    dedup = WebhookDeduplicator()
+    pipeline = mocker.spy(dedup.redis_client, "pipeline")
+    inicio = time.perf_counter()
+    dedup.is_duplicate("receivedAllMessage", _msg("m-rtt"))
+    assert pipeline.call_count == 1
+    assert time.perf_counter() - inicio < 0.05
+
+def test_release_forgets_claimed_events(fake_redis):
+    dedup = WebhookDeduplicator()
+    assert dedup.find_duplicates([("receivedAllMessage", _msg("m-3")), ("closedChat", {"id": 7})]) == [False, False]
+
+    dedup.release([("receivedAllMessage", _msg("m-3"))])
+
+    assert dedup.is_duplicate("receivedAllMessage", _msg("m-3")) is False
+    assert dedup.is_duplicate("closedChat", {"id": 7}) is True
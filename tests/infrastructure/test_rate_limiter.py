@@ -0,0 +1,106 @@
+import time
+import threading
+from benchmarks.standin import StandInServer
+from app.infrastructure.rate_limiter import RateLimiter
+from app.infrastructure.metrics import Metrics
+from app.infrastructure.http_clients import HttpClientRegistry
+
+LIMITS = {"default": (10, 2)}
+
+def test_burst_then_throttle(fake_redis):
+    limiter = RateLimiter("teste", LIMITS)
+
+    assert limiter.acquire("messages") == 0.0
+    assert limiter.acquire("messages") == 0.0
+    waited = limiter.acquire("messages")  # balde vazio: ~1/10 s até o próximo token
+
+    assert 0.05 < waited < 0.3
+    counters = Metrics.snapshot()
+    assert counters["teste_throttled:messages"] == 1
+    assert counters["teste_throttle_wait_ms:messages"] > 50
+
+def test_families_have_independent_buckets(fake_redis):
+    limiter = RateLimiter("teste", LIMITS)
+    limiter.acquire("messages")
+    limiter.acquire("messages")
+
+    assert limiter.acquire("close") == 0.0
+
+def test_low_priority_queues_behind_live_traffic(fake_redis, monkeypatch):
+    """Com o balde abaixo da reserva, 'low' espera e 'high' passa direto"""
+    monkeypatch.setenv("TESTE_RATE_MESSAGES", "5")
+    monkeypatch.setenv("TESTE_BURST_MESSAGES", "4")
+    limiter = RateLimiter("teste", LIMITS)  # reserva padrão: 50% do burst
+    limiter.acquire("messages")
+    limiter.acquire("messages")  # sobram 2 tokens (< 1 + reserva de 2)
+
+    assert limiter.acquire("messages", priority="high") == 0.0
+    assert limiter.acquire("messages", priority="low") > 0.2
+
+def test_env_overrides_limits(monkeypatch, fake_redis):
+    monkeypatch.setenv("TESTE_RATE_FLOW", "3")
+    monkeypatch.setenv("TESTE_BURST_FLOW", "7")
+
+    assert RateLimiter("teste", LIMITS).limits("flow") == (3.0, 7.0)
+
+def test_fail_open_when_redis_is_down(mocker, fake_redis):
+    limiter = RateLimiter("teste", LIMITS)
+    mocker.patch.object(limiter, "_take", side_effect=ConnectionError("redis fora"))
+
+    assert limiter.acquire("messages") == 0.0
+
+class HuggyComLimite:
+    """Huggy falsa com o próprio token bucket: devolve 429 se o cliente passar do limite."""
+    def __init__(self, rate: float, capacity: float):
+        self.rate, self.capacity = rate, capacity
+        self.tokens, self.ts = capacity, time.monotonic()
+        self.status = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, body):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+            status = 200 if self.tokens >= 1 else 429
+            if status == 200:
+                self.tokens -= 1
+            self.status[status] = self.status.get(status, 0) + 1
+        return status, {}
+
+def test_load_sustains_rate_below_limit_without_429(fake_redis, monkeypatch):
+    """8 workers martelando o mesmo endpoint: vazão ~= limite configurado e zero 429"""
+    from app.integrations.huggy.client import HuggyClient
+
+    limite, burst, workers, duracao = 40, 5, 8, 1.5
+    monkeypatch.setenv("HUGGY_RATE_WORKFLOW", str(limite))
+    monkeypatch.setenv("HUGGY_BURST_WORKFLOW", str(burst))
+    # Folga de 'workers' no balde da Huggy falsa: requisições liberadas em momentos
+    # diferentes podem chegar juntas (ex: todas esperando o connect inicial).
+    huggy_falsa = HuggyComLimite(rate=limite * 1.1, capacity=burst + workers)
+    HttpClientRegistry.reset_after_fork()
+
+    with StandInServer(huggy_falsa) as server:
+        fim = time.monotonic() + duracao
+        enviados = []
+
+        def worker():
+            client = HuggyClient()
+            client.base_url = server.url
+            while time.monotonic() < fim:
+                enviados.append(client.update_workflow_step(1, 1))
+
+        inicio = time.monotonic()
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        decorrido = time.monotonic() - inicio
+
+    HttpClientRegistry.close_all()
+
+    assert huggy_falsa.status.get(429, 0) == 0
+    vazao = (huggy_falsa.status[200] - burst) / decorrido
+    assert limite * 0.8 <= vazao <= limite * 1.05
+    assert Metrics.snapshot()["huggy_throttled:workflow"] > 0
@@ -0,0 +1,104 @@
+import queue
+import random
+import threading
+import time
+from app.infrastructure.routing import (
+    jump_consistent_hash, route_task, queue_for_chat, worker_queues, DEFAULT_QUEUE
+)
+
+def _payload(chat_id: int, seq: int) -> dict:
+    return {"messages": {"receivedAllMessage": [{"chat": {"id": chat_id}, "body": str(seq)}]}}
+
+def test_single_shard_keeps_legacy_queue(monkeypatch):
+    monkeypatch.setenv("CELERY_QUEUE_SHARDS", "1")
+
+    route = route_task("process_webhook_event", [_payload(10, 0)], {}, {})
+
+    assert route == {"queue": DEFAULT_QUEUE}
+
+def test_same_chat_always_same_shard(monkeypatch):
+    monkeypatch.setenv("CELERY_QUEUE_SHARDS", "8")
+
+    webhook = route_task("process_webhook_event", [_payload(777, 0)], {}, {})
+    timeout = route_task("check_inactivity", [777, "MENU_APRESENTACAO", 0], {}, {})
+
+    assert webhook == timeout
+    assert webhook["queue"].startswith(f"{DEFAULT_QUEUE}-")
+
+def test_closed_chat_routes_by_chat_id(monkeypatch):
+    monkeypatch.setenv("CELERY_QUEUE_SHARDS", "8")
+    closed = {"messages": {"closedChat": [{"id": 777}]}}
+
+    assert route_task("process_webhook_event", [closed], {}, {}) == {"queue": queue_for_chat(777)}
+
+def test_resharding_moves_few_chats():
+    """N -> N+1 shards: só ~1/(N+1) dos chats mudam de fila"""
+    chats = range(20000)
+    moved = sum(1 for c in chats if jump_consistent_hash(c, 8) != jump_consistent_hash(c, 9))
+
+    assert moved / len(chats) < 0.15  # esperado ~11%
+
+def test_worker_queues_includes_legacy(monkeypatch):
+    monkeypatch.setenv("CELERY_QUEUE_SHARDS", "3")
+
+    assert worker_queues() == "main-queue,main-queue-0,main-queue-1,main-queue-2"
+
+def test_ordering_holds_under_concurrency(monkeypatch):
+    """
+    Carga: 8 shards consumidos em paralelo (1 consumidor serial por shard),
+    150 chats x 10 mensagens intercaladas, com latência aleatória de processamento.
+    Cada chat deve ver suas mensagens exatamente na ordem de chegada.
+    """
+    monkeypatch.setenv("CELERY_QUEUE_SHARDS", "8")
+    shards = {f"{DEFAULT_QUEUE}-{i}": queue.Queue() for i in range(8)}
+    processed = {}
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+
+    # Producer: mensagens intercaladas entre chats
+    for seq in range(10):
+        for chat_id in range(150):
+            payload = _payload(chat_id, seq)
+            q = route_task("process_webhook_event", [payload], {}, {})["queue"]
+            shards[q].put(payload)
+
+    def consumer(q: queue.Queue):
+        while True:
+            try:
+                payload = q.get_nowait()
+            except queue.Empty:
+                return
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(random.uniform(0, 0.0005))
+            event = payload["messages"]["receivedAllMessage"][0]
+            with lock:
+                processed.setdefault(event["chat"]["id"], []).append(int(event["body"]))
+                active["now"] -= 1
+
+    threads = [threading.Thread(target=consumer, args=(q,)) for q in shards.values()]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    assert len(processed) == 150
+    assert all(seqs == list(range(10)) for seqs in processed.values())
+    assert active["peak"] > 1  # shards realmente em paralelo
+
+def test_outbox_drain_goes_to_dedicated_queue(monkeypatch):
+    monkeypatch.setenv("CELERY_QUEUE_SHARDS", "8")
+
+    assert route_task("drain_outbox", [777], {}, {}) == {"queue": "outbound-queue"}
+
+    monkeypatch.setenv("OUTBOX_QUEUE", "huggy-out")
+    assert route_task("drain_outbox", [777], {}, {}) == {"queue": "huggy-out"}
+
+def test_beat_sweeps_go_to_maintenance_queue(monkeypatch):
+    """Com shards ninguém consome a 'main-queue': as varreduras não podem cair nela"""
+    monkeypatch.setenv("CELERY_QUEUE_SHARDS", "8")
+
+    assert route_task("sweep_timers", [], {}, {}) == {"queue": "maintenance-queue"}
+    assert route_task("sweep_outbox", [], {}, {}) == {"queue": "maintenance-queue"}
+
+    monkeypatch.setenv("MAINTENANCE_QUEUE", "sweeps")
+    assert route_task("sweep_timers", [], {}, {}) == {"queue": "sweeps"}
@@ -0,0 +1,70 @@
+import time
+from app.infrastructure.timers import TimerService
+
+def test_new_timer_replaces_previous_for_same_chat(fake_redis):
+    timers = TimerService()
+    timers.schedule("inactivity", 1, 600, [1, "MENU_APRESENTACAO", 100])
+    timers.schedule("inactivity", 1, 300, [1, "CPF_TIMEOUT", 200])
+
+    assert timers.pending("inactivity") == 1
+    assert timers.pop_due("inactivity", now=time.time() + 400) == [(1, [1, "CPF_TIMEOUT", 200])]
+    assert timers.pending("inactivity") == 0
+
+def test_pop_due_respects_deadline_and_batch(fake_redis):
+    timers = TimerService()
+    for chat_id in range(10):
+        timers.schedule("inactivity", chat_id, chat_id * 10, [chat_id])
+
+    first = timers.pop_due("inactivity", now=time.time() + 45, limit=3)
+    second = timers.pop_due("inactivity", now=time.time() + 45, limit=3)
+
+    assert [c for c, _ in first] == [0, 1, 2]
+    assert [c for c, _ in second] == [3, 4]
+    assert timers.pending("inactivity") == 5
+
+def test_cancel_and_namespaces_are_independent(fake_redis):
+    timers = TimerService()
+    timers.schedule("inactivity", 1, 0, [1])
+    timers.schedule("debounce", 1, 0, [1, 7, ""])
+
+    timers.cancel("inactivity", 1)
+
+    assert timers.pop_due("inactivity") == []
+    assert timers.pop_due("debounce") == [(1, [1, 7, ""])]
+
+def test_requeue_does_not_override_newer_timer(fake_redis):
+    timers = TimerService()
+    timers.schedule("inactivity", 1, 0, [1, "OLD"])
+    popped = timers.pop_due("inactivity")
+    timers.schedule("inactivity", 1, 600, [1, "NEW"])
+
+    timers.requeue("inactivity", popped)
+
+    assert timers.pop_due("inactivity") == []
+    assert timers.pop_due("inactivity", now=time.time() + 700) == [(1, [1, "NEW"])]
+
+def test_sweep_enqueues_due_timers_with_their_task(fake_redis, mocker):
+    from app.tasks import timers as timer_tasks
+
+    send_task = mocker.patch.object(timer_tasks.celery_app, "send_task")
+    mocker.patch.object(timer_tasks.celery_app, "producer_or_acquire")
+    service = TimerService()
+    service.schedule("inactivity", 1, 0, [1, "MENU_APRESENTACAO", 100])
+    service.schedule("debounce", 2, 0, [2, 5, ""])
+    service.schedule("inactivity", 3, 600, [3, "MENU_APRESENTACAO", 100])
+
+    assert timer_tasks.sweep_timers() == 2
+
+    sent = {(c.args[0], tuple(c.kwargs["args"])) for c in send_task.call_args_list}
+    assert sent == {("check_inactivity", (1, "MENU_APRESENTACAO", 100)), ("flush_debounced_messages", (2, 5, ""))}
+    assert service.pending("inactivity") == 1
+
+def test_sweep_puts_batch_back_when_broker_fails(fake_redis, mocker):
+    from app.tasks import timers as timer_tasks
+
+    mocker.patch.object(timer_tasks.celery_app, "producer_or_acquire", side_effect=ConnectionError("broker down"))
+    service = TimerService()
+    service.schedule("inactivity", 1, 0, [1, "MENU_APRESENTACAO", 100])
+
+    assert timer_tasks.sweep_timers() == 0
+    assert service.pending("inactivity") == 1
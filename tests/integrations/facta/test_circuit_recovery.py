@@ -0,0 +1,66 @@
+import time
+import pytest
+from benchmarks.standin import StandInServer
+from app.infrastructure.circuit_breaker import CircuitBreaker
+from app.infrastructure.http_clients import HttpClientRegistry
+from app.integrations.facta.auth import FactaAuth
+from app.integrations.facta.fgts.client import FactaFGTSAdapter
+
+def facta_falsa(method: str, path: str, body: bytes):
+    if path.split("?")[0] == "/fgts/saldo":
+        return 200, {"erro": False, "retorno": {"saldo_total": "1.000,00"}}
+    return 404, {}
+
+@pytest.fixture
+def facta(mocker, monkeypatch, fake_redis):
+    """Facta falsa com latência ajustável durante o teste (server.latency)."""
+    mocker.patch.object(FactaAuth, "get_valid_token", return_value="TOKEN_FAKE")
+    mocker.patch.object(CircuitBreaker, "LATENCY_REFRESH_SECONDS", 0)
+    monkeypatch.delenv("FACTA_PROXY_URL", raising=False)
+    monkeypatch.setenv("FACTA_CIRCUIT_MIN_CALLS", "5")
+    monkeypatch.setenv("FACTA_CIRCUIT_ERROR_RATE", "0.15")
+    monkeypatch.setenv("FACTA_CIRCUIT_OPEN_SECONDS", "1")
+    monkeypatch.setenv("FACTA_TIMEOUT_MIN", "0.1")
+
+    with StandInServer(facta_falsa, latency=0.05) as server:
+        monkeypatch.setenv("FACTA_API_URL", server.url)
+        HttpClientRegistry.reset_after_fork()
+        yield server
+        HttpClientRegistry.close_all()
+
+def consultar(cpf: int):
+    inicio = time.monotonic()
+    status = FactaFGTSAdapter().consultar_saldo(str(cpf))["status"]
+    return status, time.monotonic() - inicio
+
+def test_degradation_fails_fast_and_recovers(facta):
+    saldo = lambda: facta.hits.get("/fgts/saldo", 0)
+
+    # 1. Saudável: com 20 amostras o timeout converge para p99 (~50 ms) x 1.5,
+    #    bem abaixo dos 30 s fixos
+    for cpf in range(21):
+        assert consultar(cpf)[0] == "SUCESSO"
+    assert CircuitBreaker.for_endpoint("facta", "fgts/saldo", 30.0).timeout() < 0.2
+
+    # 2. Facta degrada (2 s por requisição): cada chamada desiste no timeout adaptativo,
+    #    com 4 falhas em 25 chamadas (16%) o circuito abre e as seguintes nem saem da máquina
+    facta.latency = 2.0
+    for cpf in range(100, 104):
+        status, duracao = consultar(cpf)
+        assert status == "ERRO_TECNICO"
+        assert duracao < 1.0
+    assert CircuitBreaker.tripped() == ["facta:fgts/saldo"]
+
+    chamadas_antes = saldo()
+    for cpf in range(200, 210):
+        status, duracao = consultar(cpf)
+        assert status == "ERRO_TECNICO"
+        assert duracao < 0.05
+    assert saldo() == chamadas_antes
+
+    # 3. Facta volta: passado o CIRCUIT_OPEN_SECONDS, a chamada de teste fecha o circuito
+    facta.latency = 0.05
+    time.sleep(1.1)
+    assert consultar(300)[0] == "SUCESSO"
+    assert CircuitBreaker.tripped() == []
+    assert all(consultar(cpf)[0] == "SUCESSO" for cpf in range(400, 405))
@@ -0,0 +1,74 @@
+import os
+import json
+from datetime import date, datetime
+import pytest
+from app.integrations.facta.fgts.estimador import EstimadorFGTS, estimar_liquido
+from app.utils.formatters import parse_valor_monetario
+
+# Atenção: o fixture é SINTÉTICO (ver campo "origem"); trocar por gravações reais da Facta.
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "fgts_calculo_respostas.json")
+
+with open(FIXTURE, encoding="utf-8") as f:
+    CASOS = json.load(f)["casos"]
+
+TOLERANCIA = 0.05
+
+def _hoje(caso) -> date:
+    return datetime.strptime(caso["data_consulta"], "%d/%m/%Y").date()
+
+@pytest.mark.parametrize("caso", [c for c in CASOS if c["resposta"]["permitido"] == "SIM"], ids=lambda c: c["nome"])
+def test_estimate_tracks_recorded_valor_liquido(caso):
+    [estimado] = estimar_liquido(caso["parcelas"], [{"codigo": 1, "taxa": caso["taxa"]}], hoje=_hoje(caso))
+    real = parse_valor_monetario(caso["resposta"]["valor_liquido"])
+
+    assert abs(estimado - real) / real <= TOLERANCIA
+    assert not EstimadorFGTS().sem_chance(estimado)  # nunca descarta uma aprovação
+
+@pytest.mark.parametrize("caso", [c for c in CASOS if c["resposta"]["permitido"] != "SIM"], ids=lambda c: c["nome"])
+def test_hopeless_cases_are_short_circuited(caso):
+    [estimado] = estimar_liquido(caso["parcelas"], [{"codigo": 1, "taxa": caso["taxa"]}], hoje=_hoje(caso))
+
+    assert EstimadorFGTS().sem_chance(estimado)
+
+def test_estimates_every_table_in_one_pass():
+    parcelas = CASOS[0]["parcelas"]
+    tabelas = [{"codigo": 1, "taxa": 1.99}, {"codigo": 2, "taxa": 1.50}, {"codigo": 3, "taxa": 1.50, "tac": 50}]
+
+    baixa, alta, com_tarifa = estimar_liquido(parcelas, tabelas, hoje=_hoje(CASOS[0]))
+
+    assert alta > baixa
+    assert com_tarifa == pytest.approx(alta - 50)
+
+def test_priorizar_only_orders_by_default():
+    """Sem gravações reais da Facta o estimador não descarta ninguém"""
+    caso = next(c for c in CASOS if c["nome"] == "aprovado_perto_do_minimo")
+    tabelas = [{"codigo": 1, "taxa": 1.80}, {"codigo": 2, "taxa": 1.50}, {"codigo": 3, "taxa": 1.80, "tac": 80}]
+
+    ordem = EstimadorFGTS().priorizar(caso["parcelas"], tabelas, hoje=_hoje(caso))
+
+    assert [t["codigo"] for t in ordem] == [2, 1, 3]
+
+def test_priorizar_drops_hopeless_and_orders_by_estimate(monkeypatch):
+    monkeypatch.setenv("FGTS_ESTIMADOR_DESCARTE", "true")
+    caso = next(c for c in CASOS if c["nome"] == "aprovado_perto_do_minimo")
+    tabelas = [{"codigo": 1, "taxa": 1.80}, {"codigo": 2, "taxa": 1.50}, {"codigo": 3, "taxa": 1.80, "tac": 80}]
+
+    ordem = EstimadorFGTS().priorizar(caso["parcelas"], tabelas, hoje=_hoje(caso))
+
+    assert [t["codigo"] for t in ordem] == [2, 1]
+
+def test_short_circuit_skips_remote_calculo(fake_redis, monkeypatch):
+    """Estimativa sem chance: nenhuma chamada ao /fgts/calculo e REPROVADO (-> SEM_SALDO)"""
+    from app.integrations.facta.fgts.tabelas import TabelaSelector
+    from app.infrastructure.metrics import Metrics
+    monkeypatch.setenv("FGTS_ESTIMADOR_DESCARTE", "true")
+    monkeypatch.setattr(TabelaSelector, "_executor", None)
+    chamadas = []
+
+    resultado = TabelaSelector([{"codigo": 1, "taxa": 1.8}, {"codigo": 2, "taxa": 1.5}]).selecionar(
+        60.0, chamadas.append, parcelas=[{"dataRepasse_1": "01/09/2099", "valor_1": 60.0}]
+    )
+
+    assert resultado["status"] == "REPROVADO"
+    assert chamadas == []
+    assert Metrics.snapshot()["fgts_calculo_evitado"] == 2
@@ -28,4 +28,17 @@ def test_interpretar_retorno_limite_excedido():
 def test_interpretar_retorno_desconhecido():
     adapter = FactaFGTSAdapter()
     resp = {"erro": True, "codigo": 999, "mensagem": "Erro maluco do sistema"}
-    assert adapter._interpretar_retorno(resp) == "RETORNO_DESCONHECIDO"
\ No newline at end of file
+    assert adapter._interpretar_retorno(resp) == "RETORNO_DESCONHECIDO"
+
+def test_consultar_saldo_usa_transporte_compartilhado(mocker, mock_auth):
+    """O saldo deve usar o pool da Facta com o timeout do endpoint"""
+    mock_client = mocker.MagicMock()
+    mock_client.get.return_value.json.return_value = {"erro": False, "retorno": {"saldo_total": "1.000,00"}}
+    mocker.patch("app.integrations.facta.fgts.client.get_facta_client", return_value=mock_client)
+
+    adapter = FactaFGTSAdapter()
+    resp = adapter.consultar_saldo("12345678900")
+
+    assert resp["status"] == "SUCESSO"
+    timeout = mock_client.get.call_args.kwargs["timeout"]
+    assert timeout.read == 30.0
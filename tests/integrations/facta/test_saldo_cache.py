@@ -0,0 +1,81 @@
+import pytest
+from app.integrations.facta.fgts.client import FactaFGTSAdapter
+from app.integrations.facta.fgts.saldo_cache import SaldoCache, status_ttl
+from app.infrastructure.metrics import Metrics
+
+CPF = "12345678909"
+
+@pytest.fixture
+def facta_saldo(mocker, fake_redis):
+    """Adapter com Auth mockada e /fgts/saldo simulado (conta as chamadas)."""
+    mocker.patch("app.integrations.facta.fgts.client.FactaAuth").return_value.get_valid_token.return_value = "TOKEN_FAKE"
+    client = mocker.MagicMock()
+    mocker.patch("app.integrations.facta.fgts.client.get_facta_client", return_value=client)
+
+    def respond(payload):
+        client.get.return_value.json.return_value = payload
+        client.get.side_effect = None
+
+    return client, respond
+
+def test_sucesso_is_cached_and_counted(facta_saldo, fake_redis):
+    client, respond = facta_saldo
+    respond({"erro": False, "retorno": {"saldo_total": "1.000,00"}})
+    adapter = FactaFGTSAdapter()
+
+    first = adapter.consultar_saldo(CPF)
+    second = adapter.consultar_saldo(CPF)
+
+    assert first == second
+    assert second["status"] == "SUCESSO"
+    assert client.get.call_count == 1
+
+    counters = Metrics.snapshot()
+    assert counters[SaldoCache.HIT_COUNTER] == 1
+    assert counters[SaldoCache.MISS_COUNTER] == 1
+    assert SaldoCache.hit_ratio(counters) == 0.5
+
+def test_erro_tecnico_is_never_cached(facta_saldo):
+    client, _ = facta_saldo
+    client.get.side_effect = ConnectionError("proxy caiu")
+    adapter = FactaFGTSAdapter()
+
+    assert adapter.consultar_saldo(CPF)["status"] == "ERRO_TECNICO"
+    assert adapter.consultar_saldo(CPF)["status"] == "ERRO_TECNICO"
+    assert client.get.call_count == 2
+
+def test_terminal_status_uses_longer_ttl(facta_saldo, fake_redis):
+    _, respond = facta_saldo
+    respond({"erro": True, "codigo": 9, "mensagem": "Trabalhador não possui adesão ao saque aniversário vigente"})
+
+    FactaFGTSAdapter().consultar_saldo(CPF)
+
+    key = SaldoCache()._get_key(CPF)
+    assert status_ttl("SEM_ADESAO") > status_ttl("SUCESSO")
+    assert status_ttl("SUCESSO") < fake_redis.ttl(key) <= status_ttl("SEM_ADESAO")
+
+def test_status_ttl_env_override(monkeypatch):
+    monkeypatch.setenv("FGTS_SALDO_CACHE_TTL_SUCESSO", "42")
+    assert status_ttl("SUCESSO") == 42
+    assert status_ttl("ERRO_TECNICO") == 0
+    assert status_ttl("LIMITE_EXCEDIDO_CONSULTAS_FGTS") == 0
+
+def test_cpf_is_not_stored_in_clear(facta_saldo, fake_redis):
+    _, respond = facta_saldo
+    respond({"erro": False, "retorno": {}})
+
+    FactaFGTSAdapter().consultar_saldo(CPF)
+
+    keys = [key.decode() for key in fake_redis.keys("fgts:saldo:*")]
+    assert len(keys) == 1
+    assert CPF not in keys[0]
+
+def test_purge_one_and_all(fake_redis):
+    cache = SaldoCache()
+    cache.set(CPF, {"status": "SUCESSO", "dados": {}})
+    cache.set("98765432100", {"status": "SEM_SALDO"})
+
+    assert cache.purge(CPF) == 1
+    assert cache.get(CPF) is None
+    assert cache.purge() == 1
+    assert fake_redis.keys("fgts:saldo:*") == []
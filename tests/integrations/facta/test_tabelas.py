@@ -0,0 +1,138 @@
+import time
+from datetime import date
+import threading
+import pytest
+from app.integrations.facta.fgts.tabelas import TabelaSelector
+
+TABELAS = [
+    {"codigo": 1, "taxa": 1.80, "nome": "Gold"},
+    {"codigo": 2, "taxa": 1.50, "nome": "Silver"},
+    {"codigo": 3, "taxa": 1.99, "nome": "Bronze"},
+    {"codigo": 4, "taxa": 1.20, "nome": "Premium", "saldo_min": 5000},
+]
+
+VALOR_POR_TABELA = {1: 1500.0, 2: 1400.0, 3: 1550.0, 4: 1700.0}
+
+@pytest.fixture(autouse=True)
+def fresh_executor(monkeypatch, fake_redis):
+    monkeypatch.setattr(TabelaSelector, "_executor", None)
+
+class FakeCalculo:
+    """/fgts/calculo falso: conta chamadas e o pico de simulações simultâneas."""
+    def __init__(self, delay=0.0, reprovadas=()):
+        self.delay = delay
+        self.reprovadas = set(reprovadas)
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, tabela):
+        with self._lock:
+            self.calls.append(tabela["codigo"])
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if tabela["codigo"] in self.reprovadas:
+            return {"status": "REPROVADO", "tabela": tabela, "msg_original": "Não permitido"}
+        return {"status": "APROVADO", "tabela": tabela, "valor_liquido": VALOR_POR_TABELA[tabela["codigo"]]}
+
+def test_picks_highest_valor_liquido_among_eligible():
+    calculo = FakeCalculo()
+
+    best = TabelaSelector(TABELAS).selecionar(3000.0, calculo)
+
+    assert best["tabela"]["codigo"] == 3
+    assert sorted(calculo.calls) == [1, 2, 3]  # Premium não é elegível para 3000
+
+def test_fan_out_is_concurrent_and_bounded(monkeypatch):
+    monkeypatch.setenv("FACTA_FGTS_TABLE_FANOUT", "2")
+    calculo = FakeCalculo(delay=0.2)
+
+    inicio = time.monotonic()
+    TabelaSelector(TABELAS).selecionar(6000.0, calculo)
+    duracao = time.monotonic() - inicio
+
+    assert calculo.peak == 2
+    assert duracao < 0.6  # 4 tabelas, 2 por vez: ~0.4s (sequencial seria 0.8s)
+
+def test_winner_is_cached_per_saldo_bucket():
+    calculo = FakeCalculo()
+    selector = TabelaSelector(TABELAS)
+
+    selector.selecionar(3100.0, calculo)
+    calculo.calls.clear()
+    best = selector.selecionar(3300.0, calculo)  # mesma faixa de 500
+
+    assert calculo.calls == [3]
+    assert best["tabela"]["codigo"] == 3
+
+    calculo.calls.clear()
+    selector.selecionar(3600.0, calculo)  # outra faixa: nova fan-out
+    assert len(calculo.calls) == 3
+
+def test_cached_winner_rejected_falls_back_to_fan_out():
+    selector = TabelaSelector(TABELAS)
+    selector.selecionar(3000.0, FakeCalculo())
+
+    calculo = FakeCalculo(reprovadas={3})
+    best = selector.selecionar(3000.0, calculo)
+
+    assert calculo.calls[0] == 3
+    assert best["tabela"]["codigo"] == 1
+
+def test_cached_single_table_rejected_is_not_simulated_twice():
+    """Se a vencedora cacheada é a única elegível, a reprovação dela já é a resposta"""
+    unica = [{"codigo": 62170, "taxa": 1.80, "nome": "Única"}]
+    selector = TabelaSelector(unica)
+    selector.redis_client.set(selector._get_key(3000.0), "62170")
+
+    calculo = FakeCalculo(reprovadas={62170})
+    best = selector.selecionar(3000.0, calculo)
+
+    assert calculo.calls == [62170]
+    assert best["status"] == "REPROVADO"
+
+def test_objective_menor_taxa(monkeypatch):
+    monkeypatch.setenv("FACTA_FGTS_TABLE_OBJECTIVE", "menor_taxa")
+
+    best = TabelaSelector(TABELAS).selecionar(3000.0, FakeCalculo())
+
+    assert best["tabela"]["codigo"] == 2
+
+def test_all_rejected_returns_reprovado():
+    best = TabelaSelector(TABELAS).selecionar(3000.0, FakeCalculo(reprovadas={1, 2, 3}))
+
+    assert best["status"] == "REPROVADO"
+
+def test_adapter_simular_calculo_uses_best_table(mocker, monkeypatch):
+    """O adapter manda taxa/tabela de cada candidata e devolve a vencedora"""
+    import json
+    from app.integrations.facta.fgts.client import FactaFGTSAdapter
+
+    monkeypatch.setenv("FACTA_FGTS_TABLES", json.dumps(TABELAS[:2]))
+    mocker.patch("app.integrations.facta.fgts.client.FactaAuth").return_value.get_valid_token.return_value = "TOKEN_FAKE"
+
+    def post(url, json=None, **kwargs):
+        response = mocker.Mock()
+        response.json.return_value = {"permitido": "SIM", "valor_liquido": str(VALOR_POR_TABELA[json["tabela"]])}
+        return response
+
+    client = mocker.MagicMock()
+    client.post.side_effect = post
+    mocker.patch("app.integrations.facta.fgts.client.get_facta_client", return_value=client)
+
+    proximo_ano = date.today().year + 1
+    dados_saldo = {
+        "saldo_total": "2.000,00",
+        "dataRepasse_1": f"01/08/{proximo_ano}", "valor_1": "1.000,00",
+        "dataRepasse_2": f"01/08/{proximo_ano + 1}", "valor_2": "1.000,00",
+    }
+
+    resultado = FactaFGTSAdapter().simular_calculo("123.456.789-09", dados_saldo)
+
+    assert resultado["status"] == "APROVADO"
+    assert resultado["tabela"]["codigo"] == 1
+    assert {c.kwargs["json"]["tabela"] for c in client.post.call_args_list} == {1, 2}
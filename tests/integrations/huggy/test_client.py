@@ -0,0 +1,75 @@
+import pytest
+from app.integrations.huggy.client import HuggyClient
+
+@pytest.fixture
+def mock_http(mocker):
+    http = mocker.MagicMock()
+    mocker.patch("app.integrations.huggy.client.HttpClientRegistry.get", return_value=http)
+    return http
+
+def test_update_workflow_uses_shared_pool(mock_http):
+    """Todas as chamadas devem passar pelo pool do worker, sem abrir cliente novo"""
+    mock_http.put.return_value.status_code = 200
+
+    huggy = HuggyClient()
+    assert huggy.update_workflow_step(123, 10) is True
+    assert huggy.update_workflow_step(456, 10) is True
+
+    assert mock_http.put.call_count == 2
+    url = mock_http.put.call_args.args[0]
+    assert url.endswith("/chats/456/workflow")
+
+def test_trigger_flow_returns_false_on_404(mock_http):
+    mock_http.post.return_value.status_code = 404
+
+    huggy = HuggyClient()
+
+    assert huggy.trigger_flow(123, 99) is False
+
+def test_send_message_uses_compiled_template(mock_http, mocker):
+    from app.services.bot.content.templates import CompiledMessage
+
+    message = CompiledMessage("com_saldo_conta", {"text": "R$ {valor}\n{dados_bancarios}", "options": [{"id": "1"}]})
+    mocker.patch("app.integrations.huggy.client.MessageLoader.get_compiled", return_value=message)
+
+    assert HuggyClient().send_message(9, "com_saldo_conta", {"valor": "10,00", "dados_bancarios": "Ag 1"}) is True
+
+    payload = mock_http.post.call_args.kwargs["json"]
+    assert payload == {"text": "R$ 10,00\nAg 1", "options": [{"id": "1"}], "isInternal": False}
+
+def test_send_message_unknown_key_is_not_sent(mock_http, mocker):
+    mocker.patch("app.integrations.huggy.client.MessageLoader.get_compiled", return_value=None)
+
+    assert HuggyClient().send_message(9, "nao_existe") is False
+    mock_http.post.assert_not_called()
+
+def _response(status: int):
+    import httpx
+    return httpx.Response(status, request=httpx.Request("PUT", "https://api.huggy.app"))
+
+CHAMADAS = {
+    "workflow": ("put", lambda huggy: huggy.update_workflow_step(123, 10)),
+    "close": ("put", lambda huggy: huggy.close_chat(123, tabulation_id=7)),
+    "flow": ("post", lambda huggy: huggy.trigger_flow(123, 99)),
+}
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+@pytest.mark.parametrize("chamada", CHAMADAS.keys())
+def test_overload_and_server_errors_raise_for_outbox_retry(mock_http, fake_redis, chamada, status):
+    """429/5xx não podem virar 'recusado' (False): a outbox precisa repetir o comando"""
+    import httpx
+    from app.services.bot.outbox import is_transient
+    method, call = CHAMADAS[chamada]
+    getattr(mock_http, method).return_value = _response(status)
+
+    with pytest.raises(httpx.HTTPStatusError) as erro:
+        call(HuggyClient())
+    assert is_transient(erro.value)
+
+@pytest.mark.parametrize("status", [400, 404])
+@pytest.mark.parametrize("chamada", CHAMADAS.keys())
+def test_refusals_return_false(mock_http, fake_redis, chamada, status):
+    method, call = CHAMADAS[chamada]
+    getattr(mock_http, method).return_value = _response(status)
+
+    assert call(HuggyClient()) is False
@@ -0,0 +1,88 @@
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+PAYLOAD = {"messages": {"closedChat": [{"id": 321}]}}
+
+def _mock_enqueue(mocker):
+    def fake_enqueue(events):
+        return [MagicMock(id=f"task-{i}") for i, _ in enumerate(events)]
+    return mocker.patch("app.routers.webhooks.enqueue_webhook_events", side_effect=fake_enqueue)
+
+def _message(msg_id, chat_id, entrypoint="ok"):
+    return {
+        "id": msg_id, "body": "oi", "senderType": "whatsapp-enterprise",
+        "chat": {"id": chat_id, "entrypoint": entrypoint, "situation": "auto"},
+    }
+
+def test_redelivery_is_not_enqueued_twice(mocker, fake_redis):
+    enqueue = _mock_enqueue(mocker)
+
+    first = client.post("/webhook", json=PAYLOAD)
+    second = client.post("/webhook", json=PAYLOAD)
+
+    assert first.json()["status"] == "received"
+    assert second.json() == {"status": "ignored", "reason": "Duplicate delivery"}
+    enqueue.assert_called_once_with([PAYLOAD])
+
+def test_batched_payload_enqueues_every_surviving_event(mocker, fake_redis):
+    mocker.patch("app.events.dispatcher.EventDispatcher.TARGET_ENTRYPOINT", "ok")
+    enqueue = _mock_enqueue(mocker)
+    payload = {"messages": {
+        "receivedAllMessage": [_message("a", 1), _message("b", 2, entrypoint="outro"), _message("c", 3)],
+        "closedChat": [{"id": 4}],
+    }}
+
+    response = client.post("/webhook", json=payload)
+
+    (events,), _ = enqueue.call_args
+    assert events == [
+        {"messages": {"receivedAllMessage": [_message("a", 1)]}},
+        {"messages": {"receivedAllMessage": [_message("c", 3)]}},
+        {"messages": {"closedChat": [{"id": 4}]}},
+    ]
+    assert response.json()["task_ids"] == ["task-0", "task-1", "task-2"]
+
+def test_partial_redelivery_enqueues_only_new_events(mocker, fake_redis):
+    mocker.patch("app.events.dispatcher.EventDispatcher.TARGET_ENTRYPOINT", "ok")
+    enqueue = _mock_enqueue(mocker)
+
+    client.post("/webhook", json={"messages": {"receivedAllMessage": [_message("a", 1)]}})
+    client.post("/webhook", json={"messages": {"receivedAllMessage": [_message("a", 1), _message("b", 1)]}})
+
+    (events,), _ = enqueue.call_args
+    assert events == [{"messages": {"receivedAllMessage": [_message("b", 1)]}}]
+
+def test_admin_metrics_exposes_duplicate_counter(mocker, fake_redis):
+    _mock_enqueue(mocker)
+    client.post("/webhook", json=PAYLOAD)
+    client.post("/webhook", json=PAYLOAD)
+
+    response = client.get("/admin/metrics", headers={"x-admin-token": "TEST_SECRET_TOKEN"})
+    assert response.status_code == 200
+    assert response.json()["counters"]["webhook_duplicates_dropped"] == 1
+
+def test_failed_enqueue_does_not_swallow_redelivery(mocker, fake_redis):
+    enqueue = mocker.patch("app.routers.webhooks.enqueue_webhook_events", side_effect=ConnectionError("broker fora"))
+
+    first = client.post("/webhook", json=PAYLOAD)
+    assert first.status_code == 500
+
+    enqueue.side_effect = lambda events: [MagicMock(id="task-0")]
+    second = client.post("/webhook", json=PAYLOAD)
+
+    assert second.json()["status"] == "received"
+    assert enqueue.call_count == 2
+
+def test_event_without_content_is_skipped(mocker, fake_redis):
+    enqueue = _mock_enqueue(mocker)
+    # Falha no pré-filtro devolve o payload bruto, que não rende evento nenhum
+    mocker.patch("app.routers.webhooks.EventDispatcher.split_payload", return_value=[{"messages": []}])
+
+    response = client.post("/webhook", json={"messages": []})
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ignored", "reason": "No events in payload"}
+    enqueue.assert_not_called()
@@ -0,0 +1,70 @@
+import time
+import pytest
+from app.services.bot.memory.debounce import MessageDebouncer
+from app.core.debounce import DEBOUNCE_POLICIES
+
+POLICY_CPF = DEBOUNCE_POLICIES["FGTS_AGUARDANDO_CPF"]
+
+@pytest.fixture
+def debouncer(fake_redis, monkeypatch):
+    monkeypatch.setenv("BOT_DEBOUNCE_ENABLED", "true")
+    return MessageDebouncer()
+
+def test_only_latest_token_drains_the_buffer(debouncer):
+    first = debouncer.buffer(1, "529.982", POLICY_CPF)
+    last = debouncer.buffer(1, "247-25", POLICY_CPF)
+
+    # Flush da 1ª mensagem chega depois de outra mensagem: não entrega nada
+    assert debouncer.drain(1, first) is None
+
+    messages = debouncer.drain(1, last)
+    assert messages == ["529.982", "247-25"]
+    assert debouncer.coalesce(messages, POLICY_CPF["join"]) == "529.982247-25"
+
+    # Buffer já entregue: não processa de novo
+    assert debouncer.drain(1, last) is None
+
+def test_menu_keeps_last_message():
+    assert MessageDebouncer.coalesce(["oi", "2"], "last") == "2"
+
+def test_disabled_by_default(fake_redis):
+    assert MessageDebouncer().policy_for("FGTS_AGUARDANDO_CPF") is None
+
+def test_handler_buffers_instead_of_processing(debouncer, mocker):
+    from app.events.handlers import IncomingMessageService
+
+    engine = mocker.patch("app.services.bot.engine.BotEngine").return_value
+    engine.session.get_state.return_value = "FGTS_AGUARDANDO_CPF"
+    service = IncomingMessageService()
+    service.handle({"chat": {"id": 5}, "body": "529.982"})
+    service.handle({"chat": {"id": 5}, "body": "247-25"})
+
+    engine.process.assert_not_called()
+    # Um único timer pendente (o da última mensagem) e ele já venceu após a janela
+    assert service.timers.pending("debounce") == 1
+    [(chat_id, args)] = service.timers.pop_due("debounce", now=time.time() + 10)
+    assert chat_id == 5
+
+    service.flush(*args)
+    engine.process.assert_called_once_with(5, "529.982247-25")
+
+def test_closed_chat_drops_pending_buffer(debouncer, mocker):
+    from app.events.handlers import IncomingMessageService, ClosedChatService
+
+    mocker.patch("app.events.handlers.HuggyService")
+    mocker.patch("app.events.handlers.Outbox.dispatch")
+    engine = mocker.patch("app.services.bot.engine.BotEngine").return_value
+    engine.session.get_state.return_value = "FGTS_AGUARDANDO_CPF"
+    service = IncomingMessageService()
+    service.handle({"chat": {"id": 6}, "body": "1"})
+    service.handle({"chat": {"id": 7}, "body": "529.982"})
+    # O flush do chat 7 já saiu do ZSET (sweeper) quando o fechamento chega
+    [(_, args_6), (_, args_7)] = sorted(service.timers.pop_due("debounce", now=time.time() + 10))
+    service.handle({"chat": {"id": 6}, "body": "2"})
+
+    ClosedChatService().handle(6)
+    ClosedChatService().handle(7)
+
+    assert service.timers.pending("debounce") == 0
+    service.flush(*args_7)
+    engine.process.assert_not_called()
@@ -0,0 +1,152 @@
+import httpx
+import pytest
+from app.services.bot.engine import BotEngine
+from app.services.bot.memory.session import SessionManager
+from app.services.bot.outbox import OutboxRetryLater
+from app.schemas.credit import CreditOffer, AnalysisStatus
+
+def _drain_inline(engine):
+    """Faz o papel da task drain_outbox: executa os comandos no mock da Huggy."""
+    def dispatch(chat_id):
+        try:
+            engine.outbox.drain(chat_id, lambda c: getattr(engine.huggy, c["op"])(*c["args"], **c["kwargs"]))
+        except OutboxRetryLater:
+            pass  # a task reagendaria a si mesma
+    return dispatch
+
+@pytest.fixture
+def engine(mocker, fake_redis):
+    mocker.patch("app.services.bot.engine.HuggyService")
+    mocker.patch("app.services.bot.engine.FGTSService")
+    mocker.patch.object(BotEngine, "_schedule_timeout")
+    engine = BotEngine()
+    mocker.patch.object(engine.outbox, "dispatch", side_effect=_drain_inline(engine))
+    return engine
+
+def test_start_sends_menu_after_commit(engine):
+    engine.process(1, "oi")
+
+    assert SessionManager().get_state(1) == "MENU_APRESENTACAO"
+    engine.huggy.send_message.assert_called_once_with(1, "menu_bem_vindo")
+    engine._schedule_timeout.assert_called_once()
+
+def test_concurrent_transition_does_not_duplicate_effects(engine, mocker):
+    """
+    Outro worker muda o estado entre a leitura e o commit:
+    a tentativa perdida não manda nada e a mensagem é reavaliada sobre o estado novo.
+    """
+    manager = engine.session
+    manager.set_state(2, "MENU_APRESENTACAO")
+
+    original_begin = manager.begin
+    calls = {"n": 0}
+
+    def begin_with_race(chat_id):
+        chat_session = original_begin(chat_id)
+        calls["n"] += 1
+        if calls["n"] == 1:
+            SessionManager().set_state(chat_id, "CLT_AGUARDANDO_CPF")  # worker concorrente
+        return chat_session
+
+    mocker.patch.object(manager, "begin", side_effect=begin_with_race)
+
+    engine.process(2, "2")
+
+    assert calls["n"] == 2  # reavaliou sobre o estado novo
+    engine.huggy.send_message.assert_called_once_with(2, "cpf_invalido")
+    assert manager.get_state(2) == "CLT_CPF_INVALIDO"
+
+def test_conflict_with_finished_chat_is_not_reevaluated(engine, mocker):
+    manager = engine.session
+    manager.set_state(5, "MENU_APRESENTACAO")
+    original_begin = manager.begin
+    begin = mocker.patch.object(manager, "begin")
+
+    def begin_with_race(chat_id):
+        chat_session = original_begin(chat_id)
+        SessionManager().set_state(chat_id, "FINISHED")  # worker concorrente
+        return chat_session
+
+    begin.side_effect = begin_with_race
+
+    engine.process(5, "2")
+
+    assert begin.call_count == 1
+    engine.huggy.send_message.assert_not_called()
+    assert manager.get_state(5) == "FINISHED"
+
+def test_chat_closed_during_simulation_is_not_restarted(engine):
+    """
+    closedChat limpa a sessão enquanto a Facta é consultada: o commit final conflita
+    contra START e a mensagem do CPF NÃO é reprocessada como se fosse um chat novo.
+    """
+    engine.session.set_state(6, "FGTS_AGUARDANDO_CPF")
+
+    def facta_lenta(cpf):
+        SessionManager().load(6).close()  # closedChat no meio da simulação
+        return CreditOffer(status=AnalysisStatus.SEM_ADESAO, message_key="sem_adesao")
+
+    engine.fgts_service.consultar_melhor_oportunidade.side_effect = facta_lenta
+
+    engine.process(6, "529.982.247-25")
+
+    # 'iniciando_simulacao' já tinha ido (drenagem inline no commit da reivindicação)
+    sent = [call.args[1] for call in engine.huggy.send_message.call_args_list]
+    assert sent == ["iniciando_simulacao"]
+    assert engine.fgts_service.consultar_melhor_oportunidade.call_count == 1
+    assert engine.session.get_state(6) == "START"
+    assert engine.outbox.pending(6) == []
+
+def test_huggy_failure_retries_only_the_failed_command(engine):
+    """
+    A Huggy cai depois da simulação: a Facta não é consultada de novo e só o
+    comando que falhou (e os seguintes, em ordem) é reenviado.
+    """
+    engine.session.set_state(3, "FGTS_AGUARDANDO_CPF")
+    engine.fgts_service.consultar_melhor_oportunidade.return_value = CreditOffer(
+        status=AnalysisStatus.APROVADO, message_key="com_saldo", variables={"valor": "R$ 1.000,00"}
+    )
+    engine.huggy.send_message.side_effect = [True, httpx.ConnectError("huggy fora"), True]
+
+    engine.process(3, "529.982.247-25")
+
+    assert engine.session.get_state(3) == "FINISHED"
+    assert [c["op"] for c in engine.outbox.pending(3)] == ["send_message", "move_to_aprovado", "start_auto_distribution"]
+    engine.huggy.move_to_aprovado.assert_not_called()
+
+    engine.outbox.drain(3, lambda c: getattr(engine.huggy, c["op"])(*c["args"], **c["kwargs"]))
+
+    assert engine.outbox.pending(3) == []
+    sent = [call.args[1] for call in engine.huggy.send_message.call_args_list]
+    assert sent == ["iniciando_simulacao", "com_saldo", "com_saldo"]
+    engine.huggy.move_to_aprovado.assert_called_once_with(3)
+    engine.huggy.start_auto_distribution.assert_called_once_with(3)
+    engine.fgts_service.consultar_melhor_oportunidade.assert_called_once()
+
+def test_conflicting_commit_leaves_outbox_empty(engine, mocker):
+    manager = engine.session
+    manager.set_state(4, "MENU_APRESENTACAO")
+    original_begin = manager.begin
+
+    def begin_with_race(chat_id):
+        chat_session = original_begin(chat_id)
+        SessionManager().set_state(chat_id, "FINISHED")
+        return chat_session
+
+    mocker.patch.object(manager, "begin", side_effect=begin_with_race)
+
+    engine.process(4, "1")
+
+    assert engine.outbox.pending(4) == []
+
+def test_schedule_timeout_replaces_or_cancels_chat_timer(mocker, fake_redis):
+    mocker.patch("app.services.bot.engine.HuggyService")
+    mocker.patch("app.services.bot.engine.FGTSService")
+    engine = BotEngine()
+
+    engine._schedule_timeout(1, "MENU_APRESENTACAO", 100)
+    engine._schedule_timeout(1, "MENU_TIMEOUT_1", 200)
+    assert engine.timers.pending("inactivity") == 1
+
+    engine._schedule_timeout(1, "FINISHED", 300)  # sem regra: nada pendente
+    assert engine.timers.pending("inactivity") == 0
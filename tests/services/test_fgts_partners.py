@@ -0,0 +1,116 @@
+import time
+import threading
+import httpx
+import pytest
+from benchmarks.standin import StandInServer
+from app.services.products.fgts_partners import FGTSPartner, PartnerUnavailable
+from app.services.products.fgts_service import FGTSService
+from app.schemas.credit import CreditOffer, AnalysisStatus
+
+class HttpPartner(FGTSPartner):
+    """Parceiro de teste: GET {url}/simulacao -> {"aprovado": bool, "valor_liquido": float}"""
+    def __init__(self, name, url, hedge_after=None):
+        self.name = name
+        super().__init__()
+        self.url = url
+        self.hedge_after = hedge_after
+        self.client = httpx.Client()
+
+    def simular(self, cpf, deadline):
+        try:
+            resp = self.client.get(f"{self.url}/simulacao", params={"cpf": cpf}, timeout=max(deadline - time.monotonic(), 0.01))
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            raise PartnerUnavailable(str(e))
+        data = resp.json()
+        if not data["aprovado"]:
+            return CreditOffer(status=AnalysisStatus.SEM_SALDO, message_key="sem_saldo")
+        return CreditOffer(
+            status=AnalysisStatus.APROVADO,
+            message_key="com_saldo",
+            valor_liquido=data["valor_liquido"],
+            banco_origem=self.name,
+        )
+
+def banco(valor_liquido=None, status=200):
+    def handler(method, path, body):
+        if status != 200:
+            return status, {"erro": "indisponível"}
+        return 200, {"aprovado": valor_liquido is not None, "valor_liquido": valor_liquido}
+    return handler
+
+@pytest.fixture(autouse=True)
+def fresh_executor(monkeypatch, fake_redis):
+    monkeypatch.setattr(FGTSService, "_executor", None)
+
+def _consultar(partners, cpf="12345678909"):
+    inicio = time.monotonic()
+    oferta = FGTSService(partners=partners).consultar_melhor_oportunidade(cpf)
+    return oferta, time.monotonic() - inicio
+
+def test_partners_run_in_parallel_and_best_offer_wins():
+    with StandInServer(banco(1200.0), latency=0.1) as rapido, StandInServer(banco(1500.0), latency=0.4) as lento:
+        oferta, duracao = _consultar([HttpPartner("rapido", rapido.url), HttpPartner("lento", lento.url)])
+
+    assert oferta.banco_origem == "lento"
+    assert oferta.valor_liquido == 1500.0
+    assert duracao < 0.48  # o maior dos dois, não a soma (0.5s)
+
+def test_latency_budget_returns_first_acceptable(monkeypatch):
+    monkeypatch.setenv("FGTS_LATENCY_BUDGET", "0.2")
+    with StandInServer(banco(1200.0), latency=0.05) as rapido, StandInServer(banco(1500.0), latency=1.0) as lento:
+        oferta, duracao = _consultar([HttpPartner("rapido", rapido.url), HttpPartner("lento", lento.url)])
+
+    assert oferta.banco_origem == "rapido"
+    assert duracao < 0.5
+
+def test_slow_partner_hits_deadline_and_is_degraded(monkeypatch, fake_redis):
+    monkeypatch.setenv("FGTS_PIPELINE_DEADLINE", "0.3")
+    with StandInServer(banco(1200.0), latency=0.05) as rapido, StandInServer(banco(1500.0), latency=1.0) as lento:
+        partners = [HttpPartner("rapido", rapido.url), HttpPartner("lento", lento.url)]
+
+        oferta, duracao = _consultar(partners)
+        assert oferta.banco_origem == "rapido"
+        assert duracao < 0.8
+        assert fake_redis.exists("fgts:partner:degraded:lento")
+
+        # Enquanto degradado, o lento nem é consultado
+        oferta, _ = _consultar(partners, cpf="98765432100")
+        assert oferta.banco_origem == "rapido"
+        assert lento.hits["/simulacao"] == 1
+
+def test_failing_partner_is_degraded_and_other_answer_is_used(fake_redis):
+    with StandInServer(banco(status=503)) as fora, StandInServer(banco(None), latency=0.05) as recusa:
+        oferta, _ = _consultar([HttpPartner("fora", fora.url), HttpPartner("recusa", recusa.url)])
+
+    assert oferta.status == AnalysisStatus.SEM_SALDO
+    assert fake_redis.exists("fgts:partner:degraded:fora")
+    assert not fake_redis.exists("fgts:partner:degraded:recusa")
+
+def test_all_partners_down_returns_technical_error():
+    with StandInServer(banco(status=503)) as fora:
+        oferta, _ = _consultar([HttpPartner("fora", fora.url)])
+
+    assert oferta.status == AnalysisStatus.RETORNO_DESCONHECIDO
+    assert oferta.is_internal is True
+    assert "fora" in oferta.variables["erro"]
+
+def test_hedge_fires_second_attempt_for_slow_partner():
+    """1ª requisição trava, a 2ª (hedge) responde na hora: fica a que chegar primeiro"""
+    chamadas = []
+    lock = threading.Lock()
+
+    def instavel(method, path, body):
+        with lock:
+            chamadas.append(path)
+            primeira = len(chamadas) == 1
+        if primeira:
+            time.sleep(1.0)
+        return 200, {"aprovado": True, "valor_liquido": 900.0}
+
+    with StandInServer(instavel) as servidor:
+        oferta, duracao = _consultar([HttpPartner("instavel", servidor.url, hedge_after=0.15)])
+
+    assert oferta.valor_liquido == 900.0
+    assert len(chamadas) == 2
+    assert duracao < 0.6
@@ -1,3 +1,4 @@
+import time
 import pytest
 from app.services.products.fgts_service import FGTSService
 from app.schemas.credit import AnalysisStatus
@@ -6,7 +7,25 @@ from app.schemas.credit import AnalysisStatus
 @pytest.fixture
 def mock_facta_service(mocker):
     # O patch deve ser onde a classe é IMPORTADA/USADA
-    return mocker.patch("app.services.products.fgts_service.FactaFGTSService")
+    return mocker.patch("app.services.products.fgts_partners.FactaFGTSService")
+
+@pytest.fixture(autouse=True)
+def mock_dados_cadastrais(mocker):
+    mock = mocker.patch("app.services.products.fgts_partners.FactaDadosCadastrais")
+    mock.return_value.buscar_conta_bancaria.return_value = None
+    return mock
+
+APROVADO = {
+    "aprovado": True,
+    "motivo": "VALOR_DISPONÍVEL",
+    "detalhes": {"valor_liquido": 1500.0, "taxa": 1.8, "tabela": 62170, "simulacao_id": "1"}
+}
+
+def _lento(resultado, segundos):
+    def _call(cpf):
+        time.sleep(segundos)
+        return resultado
+    return _call
 
 def test_service_catch_all_generic_error(mock_facta_service):
     """Testa se o Service captura erros desconhecidos sem crashar"""
@@ -45,4 +64,59 @@ def test_service_limite_excedido(mock_facta_service):
 
     # 👇 Verificando com as constantes do seu código
     assert oferta.status == AnalysisStatus.LIMITE_EXCEDIDO_CONSULTAS_FGTS
-    assert oferta.message_key == "limite_excedido_fgts"
\ No newline at end of file
+    assert oferta.message_key == "limite_excedido_fgts"
+
+def test_pipeline_overlaps_bank_account_with_simulation(mock_facta_service, mock_dados_cadastrais):
+    """Conta bancária roda junto com saldo -> cálculo: o tempo total é o maior dos dois, não a soma"""
+    mock_facta_service.return_value.simular_antecipacao.side_effect = _lento(APROVADO, 0.3)
+    mock_dados_cadastrais.return_value.buscar_conta_bancaria.side_effect = _lento(
+        {"texto_formatado": "Nubank\nAgência: 0001\nConta corrente: 123-4"}, 0.3
+    )
+
+    inicio = time.monotonic()
+    oferta = FGTSService().consultar_melhor_oportunidade("12345678900")
+    duracao = time.monotonic() - inicio
+
+    assert oferta.message_key == "com_saldo_conta"
+    assert "Nubank" in oferta.variables["dados_bancarios"]
+    assert duracao < 0.5
+
+def test_pipeline_discards_bank_account_when_saldo_fails(mock_facta_service, mock_dados_cadastrais):
+    mock_facta_service.return_value.simular_antecipacao.return_value = {"aprovado": False, "motivo": "SEM_SALDO"}
+    mock_dados_cadastrais.return_value.buscar_conta_bancaria.side_effect = _lento({"texto_formatado": "x"}, 2.0)
+
+    inicio = time.monotonic()
+    oferta = FGTSService().consultar_melhor_oportunidade("12345678900")
+
+    assert oferta.status == AnalysisStatus.SEM_SALDO
+    assert time.monotonic() - inicio < 1.0
+
+def test_pipeline_deadline_returns_technical_error(mock_facta_service, monkeypatch):
+    monkeypatch.setenv("FGTS_PIPELINE_DEADLINE", "0.2")
+    mock_facta_service.return_value.simular_antecipacao.side_effect = _lento(APROVADO, 1.0)
+
+    inicio = time.monotonic()
+    oferta = FGTSService().consultar_melhor_oportunidade("12345678900")
+
+    assert oferta.status == AnalysisStatus.RETORNO_DESCONHECIDO
+    assert time.monotonic() - inicio < 0.6
+
+def test_pipeline_approved_without_account_when_lookup_is_late(mock_facta_service, mock_dados_cadastrais, monkeypatch):
+    """Oferta aprovada não se perde se só a conta bancária atrasar"""
+    monkeypatch.setenv("FGTS_PIPELINE_DEADLINE", "0.3")
+    mock_facta_service.return_value.simular_antecipacao.return_value = APROVADO
+    mock_dados_cadastrais.return_value.buscar_conta_bancaria.side_effect = _lento({"texto_formatado": "x"}, 1.0)
+
+    oferta = FGTSService().consultar_melhor_oportunidade("12345678900")
+
+    assert oferta.status == AnalysisStatus.APROVADO
+    assert oferta.message_key == "com_saldo"
+
+def test_sequential_mode_when_pipeline_disabled(mock_facta_service, mock_dados_cadastrais, monkeypatch):
+    monkeypatch.setenv("FGTS_PIPELINE", "false")
+    mock_facta_service.return_value.simular_antecipacao.return_value = {"aprovado": False, "motivo": "SEM_ADESAO"}
+
+    oferta = FGTSService().consultar_melhor_oportunidade("12345678900")
+
+    assert oferta.status == AnalysisStatus.SEM_ADESAO
+    mock_dados_cadastrais.return_value.buscar_conta_bancaria.assert_not_called()
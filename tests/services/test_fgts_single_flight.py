@@ -0,0 +1,115 @@
+import threading
+from datetime import date
+import pytest
+from benchmarks.standin import StandInServer
+from app.infrastructure.http_clients import HttpClientRegistry
+from app.infrastructure.single_flight import SingleFlight
+from app.integrations.facta.auth import FactaAuth
+from app.services.products.fgts_service import FGTSService
+from app.schemas.credit import AnalysisStatus
+
+PROXIMO_ANO = date.today().year + 1
+
+def facta_falsa(method: str, path: str, body: bytes):
+    rota = path.split("?")[0]
+    if rota == "/gera-token":
+        return 200, {"erro": False, "token": "TOKEN_FAKE"}
+    if rota == "/fgts/saldo":
+        return 200, {"erro": False, "retorno": {
+            "saldo_total": "2.000,00",
+            "dataRepasse_1": f"01/08/{PROXIMO_ANO}", "valor_1": "1.000,00",
+            "dataRepasse_2": f"01/08/{PROXIMO_ANO + 1}", "valor_2": "1.000,00",
+        }}
+    if rota == "/fgts/calculo":
+        return 200, {"permitido": "SIM", "valor_liquido": "1.500,00"}
+    if rota == "/proposta/consulta-cliente":
+        return 200, {"erro": True}
+    return 404, {}
+
+@pytest.fixture
+def facta(mocker, monkeypatch, fake_redis):
+    """Facta falsa local (200 ms por requisição) + TokenManager sobre o fakeredis."""
+    from app.infrastructure.token_manager import TokenManager
+    mocker.patch.object(TokenManager, "_instance", None)
+    FactaAuth.reset_cache()
+    monkeypatch.delenv("FACTA_PROXY_URL", raising=False)
+
+    with StandInServer(facta_falsa, latency=0.2) as server:
+        monkeypatch.setenv("FACTA_API_URL", server.url)
+        HttpClientRegistry.reset_after_fork()
+        yield server
+        HttpClientRegistry.close_all()
+    FactaAuth.reset_cache()
+
+def _simular_em_paralelo(cpfs):
+    ofertas = []
+
+    def run(cpf):
+        ofertas.append(FGTSService().consultar_melhor_oportunidade(cpf))
+
+    threads = [threading.Thread(target=run, args=(cpf,)) for cpf in cpfs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(15)
+    return ofertas
+
+def test_concurrent_same_cpf_calls_facta_once(facta):
+    ofertas = _simular_em_paralelo(["12345678909"] * 5)
+
+    assert len(ofertas) == 5
+    assert all(o.status == AnalysisStatus.APROVADO for o in ofertas)
+    assert {o.valor_liquido for o in ofertas} == {1500.0}
+    assert facta.hits["/fgts/saldo"] == 1
+    assert facta.hits["/fgts/calculo"] == 1
+
+def test_different_cpfs_run_independently(facta):
+    ofertas = _simular_em_paralelo(["12345678909", "98765432100"])
+
+    assert len(ofertas) == 2
+    assert facta.hits["/fgts/saldo"] == 2
+
+def test_waiter_takes_over_when_leader_fails(fake_redis):
+    """Dono falhou: quem esperava assume e executa (não fica pendurado até o lease)"""
+    flight = SingleFlight("teste", lease_seconds=5)
+    lider_comecou = threading.Event()
+    execucoes = []
+
+    def falha():
+        execucoes.append("lider")
+        lider_comecou.set()
+        threading.Event().wait(0.2)
+        raise RuntimeError("Facta fora")
+
+    def lider():
+        with pytest.raises(RuntimeError):
+            flight.run("cpf", falha, dumps=str, loads=str)
+
+    thread = threading.Thread(target=lider)
+    thread.start()
+    lider_comecou.wait(2)
+
+    resultado = flight.run("cpf", lambda: execucoes.append("seguidor") or "ok", dumps=str, loads=str)
+    thread.join(2)
+
+    assert resultado == "ok"
+    assert execucoes == ["lider", "seguidor"]
+
+def test_waiter_ignores_result_from_previous_run(fake_redis):
+    """Resultado de uma rodada anterior (ainda no TTL) não vale para quem espera a rodada atual"""
+    flight = SingleFlight("teste", lease_seconds=5)
+    flight.run("cpf", lambda: "antigo", dumps=str, loads=str)
+
+    lider_comecou = threading.Event()
+
+    def lider():
+        flight.run("cpf", lambda: lider_comecou.set() or threading.Event().wait(0.2) or "novo", dumps=str, loads=str)
+
+    thread = threading.Thread(target=lider)
+    thread.start()
+    lider_comecou.wait(2)
+
+    resultado = flight.run("cpf", lambda: "local", dumps=str, loads=str)
+    thread.join(2)
+
+    assert resultado == "novo"
@@ -0,0 +1,164 @@
+import json
+import pytest
+from app.services.bot.content.message_loader import MessageLoader, PUBLISH_CATALOG_LUA
+
+CATALOG = {"menu_bem_vindo": {"text": "Olá!"}, "pedir_cpf": {"text": "Seu CPF?"}}
+
+@pytest.fixture(autouse=True)
+def fresh_loader():
+    MessageLoader.reset()
+    yield
+    MessageLoader.reset()
+
+@pytest.fixture
+def redis_catalog(fake_redis):
+    fake_redis.set(MessageLoader.REDIS_KEY, json.dumps(CATALOG))
+    fake_redis.set(MessageLoader.VERSION_KEY, 1)
+    return fake_redis
+
+def test_get_is_served_from_memory_within_window(redis_catalog, mocker):
+    r = MessageLoader._get_redis()
+    pipeline = mocker.spy(r, "pipeline")
+
+    for _ in range(100):
+        assert MessageLoader.get("pedir_cpf") == {"text": "Seu CPF?"}
+
+    # 1ª chamada: carimbo + blob. As outras 99 não tocam o Redis.
+    assert pipeline.call_count == 2
+
+def test_revalidation_only_checks_version_when_unchanged(redis_catalog, mocker):
+    MessageLoader.get("pedir_cpf")
+    MessageLoader._checked_at = 0  # janela expirou
+    parse = mocker.spy(json, "loads")
+
+    assert MessageLoader.get("pedir_cpf") == {"text": "Seu CPF?"}
+    parse.assert_not_called()
+
+def test_version_bump_swaps_catalog(redis_catalog):
+    assert MessageLoader.get("pedir_cpf") == {"text": "Seu CPF?"}
+
+    redis_catalog.set(MessageLoader.REDIS_KEY, json.dumps({"pedir_cpf": {"text": "CPF, por favor"}}))
+    redis_catalog.incr(MessageLoader.VERSION_KEY)
+    MessageLoader._checked_at = 0
+
+    assert MessageLoader.get("pedir_cpf") == {"text": "CPF, por favor"}
+
+def test_cold_start_serves_local_file_while_refreshing(fake_redis, mocker):
+    import threading
+    gist_respondeu = threading.Event()
+
+    def slow_fetch(etag):
+        gist_respondeu.wait(timeout=5)
+        return CATALOG, '"v1"', False
+
+    fetch = mocker.patch.object(MessageLoader, "_fetch_conditional", side_effect=slow_fetch)
+
+    # Nada no Redis: responde na hora com o messages.json...
+    assert MessageLoader.get("menu_bem_vindo")["text"].startswith("Olá, boas vindas")
+    gist_respondeu.set()
+    MessageLoader._refresh_thread.join(timeout=5)
+
+    # ...e o refresh em background publica e troca o catálogo do processo
+    fetch.assert_called_once_with(None)
+    assert MessageLoader.get("menu_bem_vindo") == {"text": "Olá!"}
+    assert json.loads(fake_redis.get(MessageLoader.REDIS_KEY)) == CATALOG
+    assert fake_redis.get(MessageLoader.ETAG_KEY) == b'"v1"'
+    assert fake_redis.get(MessageLoader.VERSION_KEY) == b"1"
+
+def test_falls_back_to_local_file_without_redis_or_remote(mocker):
+    mocker.patch.object(MessageLoader, "_get_redis", side_effect=ConnectionError("down"))
+    mocker.patch.object(MessageLoader, "fetch_remote", return_value={})
+
+    assert MessageLoader.get("menu_bem_vindo")["text"].startswith("Olá")
+
+def _gist_server(catalog, etag='"v1"', latency=0.0):
+    from benchmarks.standin import StandInServer
+
+    def handler(method, path, body, headers):
+        if headers.get("If-None-Match") == etag:
+            return 304, None, {"ETag": etag}
+        return 200, catalog, {"ETag": etag}
+
+    return StandInServer(handler, latency=latency, pass_headers=True)
+
+def test_200_concurrent_misses_fetch_the_gist_once(redis_catalog, monkeypatch):
+    """
+    200 processos com o catálogo vencido ao mesmo tempo: só UM busca o Gist,
+    e ninguém espera por ele (todos servem o catálogo antigo).
+    """
+    import threading
+    import time
+
+    novo = {"pedir_cpf": {"text": "CPF, por favor"}}
+    with _gist_server(novo, latency=0.3) as server:
+        monkeypatch.setenv("MESSAGES_URL", f"{server.url}/messages.json")
+        barrier = threading.Barrier(200)
+        durations = []
+
+        def worker():
+            barrier.wait()
+            inicio = time.perf_counter()
+            MessageLoader._revalidate()  # direto: simula processos distintos, sem o lock local
+            durations.append(time.perf_counter() - inicio)
+
+        threads = [threading.Thread(target=worker) for _ in range(200)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        MessageLoader._refresh_thread.join(timeout=5)
+
+        assert server.hits == {"/messages.json": 1}
+        assert max(durations) < 0.3  # ninguém bloqueou na latência do Gist
+        assert MessageLoader.get("pedir_cpf") == {"text": "CPF, por favor"}
+
+        # Frescor vence de novo: GET condicional -> 304, sem versão nova
+        version = MessageLoader._version
+        redis_catalog.delete(MessageLoader.FRESH_KEY)
+        MessageLoader._checked_at = 0
+        MessageLoader.get("pedir_cpf")
+        MessageLoader._refresh_thread.join(timeout=5)
+
+        assert server.hits == {"/messages.json": 2}
+        assert redis_catalog.exists(MessageLoader.FRESH_KEY)
+        assert MessageLoader._version == version
+
+def test_failed_refresh_keeps_last_good_catalog(redis_catalog, mocker):
+    mocker.patch.object(MessageLoader, "_fetch_conditional", return_value=(None, None, False))
+
+    assert MessageLoader.get("pedir_cpf") == {"text": "Seu CPF?"}
+    MessageLoader._refresh_thread.join(timeout=5)
+
+    assert MessageLoader.get("pedir_cpf") == {"text": "Seu CPF?"}
+    # Lock fica até expirar: backoff antes da próxima tentativa
+    assert redis_catalog.exists(MessageLoader.REFRESH_LOCK_KEY)
+
+def test_publish_broadcasts_and_listener_hot_swaps(fake_redis):
+    """Outro processo publica: o listener troca o catálogo deste processo em < 1s"""
+    import time
+
+    assert MessageLoader.get("menu_bem_vindo")  # catálogo local carregado
+    MessageLoader.start_listener()
+    try:
+        time.sleep(0.2)  # listener inscrito
+        # Publicação vinda de "outro processo": grava e avisa pelo script, sem instalar aqui
+        fake_redis.eval(
+            PUBLISH_CATALOG_LUA, 4,
+            MessageLoader.REDIS_KEY, MessageLoader.FRESH_KEY, MessageLoader.ETAG_KEY, MessageLoader.VERSION_KEY,
+            json.dumps(CATALOG), 600, "", MessageLoader.CHANNEL,
+        )
+
+        deadline = time.monotonic() + 1.0
+        while MessageLoader._version != "1" and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert MessageLoader._version == "1"
+        assert MessageLoader.get("menu_bem_vindo") == {"text": "Olá!"}
+    finally:
+        MessageLoader.stop_listener()
+
+def test_publish_rejects_invalid_catalog(fake_redis):
+    from app.services.bot.content.message_loader import InvalidCatalogError
+
+    with pytest.raises(InvalidCatalogError):
+        MessageLoader.publish({"pedir_cpf": {"text": ["não", "é", "texto"]}})
+
+    assert not fake_redis.exists(MessageLoader.VERSION_KEY)
@@ -0,0 +1,196 @@
+import threading
+import httpx
+import pytest
+from app.infrastructure.metrics import Metrics
+from app.services.bot.memory.session import SessionManager, SessionConflictError
+from app.services.bot.outbox import Outbox, OutboxRetryLater
+
+def _commit(chat_id: int, *ops):
+    chat_session = SessionManager().begin(chat_id)
+    for op in ops:
+        chat_session.emit_outbound(op, chat_id)
+    chat_session.set_state("PROXIMO")
+    chat_session.commit()
+    return chat_session
+
+class Huggy:
+    """Executor falso: registra as chamadas e falha conforme 'failures' ({op: [exceção, ...]})."""
+    def __init__(self, failures: dict = None):
+        self.calls = []
+        self.failures = failures or {}
+
+    def __call__(self, command: dict):
+        pending = self.failures.get(command["op"])
+        if pending:
+            raise pending.pop(0)
+        self.calls.append(command["op"])
+        return True
+
+def test_commit_persists_commands_with_transition(fake_redis):
+    _commit(1, "send_message", "start_auto_distribution")
+
+    commands = Outbox().pending(1)
+    assert [c["op"] for c in commands] == ["send_message", "start_auto_distribution"]
+    assert [c["id"] for c in commands] == ["1:0", "1:1"]
+    assert fake_redis.zscore(Outbox.PENDING_KEY, 1) is not None
+
+def test_conflicting_commit_persists_nothing(fake_redis):
+    manager = SessionManager()
+    chat_session = manager.begin(2)
+    chat_session.emit_outbound("send_message", 2, "menu_bem_vindo")
+    chat_session.set_state("MENU_APRESENTACAO")
+    manager.set_state(2, "FINISHED")  # outro worker
+
+    with pytest.raises(SessionConflictError):
+        chat_session.commit()
+
+    assert Outbox().pending(2) == []
+
+def test_drain_runs_in_order_and_clears_pending(fake_redis):
+    _commit(3, "send_message", "move_to_aprovado", "start_auto_distribution")
+    huggy = Huggy()
+
+    assert Outbox().drain(3, huggy) == 3
+
+    assert huggy.calls == ["send_message", "move_to_aprovado", "start_auto_distribution"]
+    assert Outbox().pending(3) == []
+    assert fake_redis.zscore(Outbox.PENDING_KEY, 3) is None
+    assert Metrics.snapshot()["outbox_sent"] == 3
+
+def test_transient_failure_retries_only_failed_command(fake_redis):
+    _commit(4, "send_message", "move_to_aprovado", "start_auto_distribution")
+    huggy = Huggy({"move_to_aprovado": [httpx.ConnectError("huggy fora")]})
+    outbox = Outbox()
+
+    with pytest.raises(OutboxRetryLater) as retry:
+        outbox.drain(4, huggy)
+    assert retry.value.attempts == 1
+    assert retry.value.countdown == 2
+    assert [c["op"] for c in outbox.pending(4)] == ["move_to_aprovado", "start_auto_distribution"]
+
+    assert outbox.drain(4, huggy) == 2
+    assert huggy.calls == ["send_message", "move_to_aprovado", "start_auto_distribution"]
+
+def test_permanent_error_goes_to_dead_letter_and_queue_moves_on(fake_redis):
+    _commit(5, "nao_existe", "send_message")
+    huggy = Huggy({"nao_existe": [AttributeError("HuggyService não tem 'nao_existe'")]})
+    outbox = Outbox()
+
+    assert outbox.drain(5, huggy) == 2
+
+    assert huggy.calls == ["send_message"]
+    dead = outbox.dead_letters()
+    assert [(d["chat_id"], d["op"]) for d in dead] == [(5, "nao_existe")]
+    assert Metrics.snapshot()["outbox_dead"] == 1
+
+def test_exhausted_attempts_go_to_dead_letter(fake_redis, monkeypatch):
+    monkeypatch.setenv("OUTBOX_MAX_ATTEMPTS", "2")
+    _commit(6, "send_message", "start_auto_distribution")
+    huggy = Huggy({"send_message": [httpx.ReadTimeout("lento"), httpx.ReadTimeout("lento")]})
+    outbox = Outbox()
+
+    with pytest.raises(OutboxRetryLater):
+        outbox.drain(6, huggy)
+    assert outbox.drain(6, huggy) == 2
+
+    assert huggy.calls == ["start_auto_distribution"]
+    assert [d["op"] for d in outbox.dead_letters()] == ["send_message"]
+
+def test_one_drainer_per_chat(fake_redis):
+    """Dois workers drenando o mesmo chat: cada comando sai uma vez, em ordem"""
+    _commit(7, *[f"op_{i}" for i in range(20)])
+    calls, lock = [], threading.Lock()
+
+    def execute(command):
+        with lock:
+            calls.append(command["op"])
+
+    threads = [threading.Thread(target=Outbox().drain, args=(7, execute)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [f"op_{i}" for i in range(20)]
+
+def test_stale_chats_are_found_by_sweeper(fake_redis, monkeypatch):
+    monkeypatch.setenv("OUTBOX_STALE_AFTER", "30")
+    _commit(8, "send_message")
+    score = fake_redis.zscore(Outbox.PENDING_KEY, 8)
+
+    assert Outbox().stale_chats(now=score + 10) == []
+    assert Outbox().stale_chats(now=score + 31) == [8]
+
+def test_client_error_is_permanent_but_rate_limit_is_retried(fake_redis):
+    request = httpx.Request("POST", "http://huggy")
+    rejected = httpx.HTTPStatusError("400", request=request, response=httpx.Response(400, request=request))
+    throttled = httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, request=request))
+    _commit(9, "send_message", "start_auto_distribution")
+    huggy = Huggy({"send_message": [rejected], "start_auto_distribution": [throttled]})
+    outbox = Outbox()
+
+    with pytest.raises(OutboxRetryLater):
+        outbox.drain(9, huggy)
+    assert [d["op"] for d in outbox.dead_letters()] == ["send_message"]
+
+    assert outbox.drain(9, huggy) == 1
+    assert huggy.calls == ["start_auto_distribution"]
+
+def test_open_circuit_and_rate_limit_do_not_spend_attempts(fake_redis, monkeypatch):
+    """Queda longa da Huggy (circuito aberto, 429) atrasa a fila, mas não joga nada na dead letter"""
+    from app.infrastructure.circuit_breaker import CircuitOpenError
+    monkeypatch.setenv("OUTBOX_MAX_ATTEMPTS", "2")
+    monkeypatch.setenv("OUTBOX_THROTTLE_SECONDS", "30")
+    request = httpx.Request("POST", "http://huggy")
+    throttled = httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, request=request))
+    _commit(10, "send_message")
+    huggy = Huggy({"send_message": [CircuitOpenError("aberto")] * 5 + [throttled]})
+    outbox = Outbox()
+
+    for _ in range(6):
+        with pytest.raises(OutboxRetryLater) as retry:
+            outbox.drain(10, huggy)
+        assert retry.value.attempts == 0
+        assert retry.value.countdown == 30
+
+    assert outbox.dead_letters() == []
+    assert outbox.drain(10, huggy) == 1
+    assert huggy.calls == ["send_message"]
+
+def test_replay_dead_returns_commands_to_their_chats(fake_redis, mocker):
+    dispatch = mocker.patch.object(Outbox, "dispatch")
+    _commit(11, "nao_existe", "send_message")
+    huggy = Huggy({"nao_existe": [AttributeError("sem 'nao_existe'")]})
+    outbox = Outbox()
+    outbox.drain(11, huggy)
+
+    assert outbox.replay_dead() == [11]
+
+    assert outbox.dead_letters() == []
+    assert [c["op"] for c in outbox.pending(11)] == ["nao_existe"]
+    dispatch.assert_called_once_with(11)
+    assert outbox.drain(11, huggy) == 1
+    assert huggy.calls == ["send_message", "nao_existe"]
+
+def test_closed_chat_replaces_outbox_with_workflow_exit(fake_redis, mocker):
+    """closedChat: nada da fila vai para o chat fechado; só a saída do workflow (via outbox)"""
+    from app.events.handlers import ClosedChatService
+    huggy = mocker.patch("app.events.handlers.HuggyService").return_value
+    dispatch = mocker.patch("app.events.handlers.Outbox.dispatch")
+    _commit(10, "send_message", "finish_attendance")
+    fake_redis.hset(Outbox.attempts_key_for(10), "1:0", 3)
+
+    ClosedChatService().handle(10)
+
+    huggy.remove_from_workflow.assert_not_called()  # nada síncrono
+    [command] = Outbox().pending(10)
+    assert (command["op"], command["args"], command["priority"]) == ("remove_from_workflow", [10], "low")
+    assert not fake_redis.exists(Outbox.attempts_key_for(10))
+    assert not fake_redis.exists(SessionManager()._get_key(10))
+    assert fake_redis.zscore(Outbox.PENDING_KEY, 10) is not None
+    dispatch.assert_called_once_with(10)
+
+    executed = Huggy()
+    assert Outbox().drain(10, executed) == 1
+    assert executed.calls == ["remove_from_workflow"]
+    assert fake_redis.zscore(Outbox.PENDING_KEY, 10) is None
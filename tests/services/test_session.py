@@ -0,0 +1,100 @@
+import json
+from app.services.bot.memory.session import SessionManager
+
+def test_begin_loads_state_and_context(fake_redis):
+    fake_redis.hset("chat:1", mapping={"state": "MENU_APRESENTACAO", "context": json.dumps({"cpf": "123"})})
+
+    chat_session = SessionManager().begin(1)
+
+    assert chat_session.state == "MENU_APRESENTACAO"
+    assert chat_session.context == {"cpf": "123"}
+    # touch feito no mesmo round trip
+    assert int(fake_redis.hget("chat:1", "last_interaction")) == chat_session.interaction_time
+
+def test_begin_defaults_to_start(fake_redis):
+    chat_session = SessionManager().begin(2)
+
+    assert chat_session.state == "START"
+    assert chat_session.context == {}
+
+def test_mutations_are_buffered_until_commit(fake_redis):
+    chat_session = SessionManager().begin(3)
+
+    chat_session.set_context({"cpf": "999"})
+    chat_session.set_state("FINISHED")
+
+    # Nada gravado antes do commit
+    assert fake_redis.hget("chat:3", "state") is None
+
+    assert chat_session.commit() is True
+    assert fake_redis.hget("chat:3", "state") == b"FINISHED"
+    assert json.loads(fake_redis.hget("chat:3", "context")) == {"cpf": "999"}
+
+def test_commit_without_changes_skips_redis(fake_redis):
+    chat_session = SessionManager().begin(4)
+
+    assert chat_session.commit() is False
+
+def test_session_uses_single_hash_with_one_ttl(fake_redis):
+    manager = SessionManager()
+    manager.set_state(5, "MENU_APRESENTACAO")
+    manager.touch(5)
+
+    assert fake_redis.keys("chat:5*") == [b"chat:5"]
+    assert fake_redis.ttl("chat:5") > 0
+
+def test_clear_session_removes_everything(fake_redis):
+    """last_interaction não pode mais sobrar por 24h"""
+    manager = SessionManager()
+    manager.begin(6)
+    manager.set_state(6, "FINISHED")
+    fake_redis.set("chat:6:last_interaction", 1)  # resto do layout antigo
+
+    manager.clear_session(6)
+
+    assert fake_redis.keys("chat:6*") == []
+
+def test_lazy_migration_from_legacy_keys(fake_redis):
+    fake_redis.set("chat:7:state", "FGTS_AGUARDANDO_CPF")
+    fake_redis.set("chat:7:context", json.dumps({"cpf": "111"}))
+    fake_redis.set("chat:7:last_interaction", 100)
+
+    manager = SessionManager()
+    chat_session = manager.begin(7)
+
+    assert chat_session.state == "FGTS_AGUARDANDO_CPF"
+    assert chat_session.context == {"cpf": "111"}
+
+    chat_session.commit()
+
+    assert fake_redis.keys("chat:7*") == [b"chat:7"]
+    assert manager.get_state(7) == "FGTS_AGUARDANDO_CPF"
+
+def test_commit_conflict_when_other_worker_transitions(fake_redis):
+    """Dois workers leem o mesmo estado: só o primeiro commit vale"""
+    import pytest
+    from app.services.bot.memory.session import SessionConflictError
+
+    manager = SessionManager()
+    manager.set_state(8, "MENU_APRESENTACAO")
+
+    worker_a = manager.begin(8)
+    worker_b = manager.begin(8)
+
+    worker_a.set_state("FGTS_AGUARDANDO_CPF")
+    worker_a.commit()
+
+    worker_b.set_state("CLT_AGUARDANDO_CPF")
+    with pytest.raises(SessionConflictError) as exc:
+        worker_b.commit()
+
+    assert exc.value.current_state == "FGTS_AGUARDANDO_CPF"
+    assert manager.get_state(8) == "FGTS_AGUARDANDO_CPF"
+
+def test_commit_bumps_version(fake_redis):
+    manager = SessionManager()
+    chat_session = manager.begin(9)
+    chat_session.set_state("MENU_APRESENTACAO")
+    chat_session.commit()
+
+    assert manager.begin(9).version == chat_session.version == 1
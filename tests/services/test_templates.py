@@ -0,0 +1,45 @@
+import json
+import os
+import pytest
+from app.services.bot.content.templates import CompiledMessage, TemplateError, compile_catalog
+
+def test_fields_are_parsed_once_and_rendered():
+    message = CompiledMessage("com_saldo", {"text": "R$ {valor} pelo {banco}"})
+
+    assert message.fields == {"valor", "banco"}
+    assert message.render({"valor": "1,00", "banco": "Facta", "extra": 1}) == "R$ 1,00 pelo Facta"
+
+def test_static_payload_is_prebuilt():
+    options = [{"id": "1", "title": "Sim"}]
+    message = CompiledMessage("timeout_1_cpf", {"text": "Oi {{:)}}", "options": options, "file": "http://img"})
+
+    assert message.build_payload() == {"text": "Oi {:)}", "options": options, "isInternal": False, "file": "http://img"}
+    assert message.build_payload(file_url="http://outra", force_internal=True)["file"] == "http://outra"
+    assert message.build_payload(force_internal=True)["isInternal"] is True
+    assert message.static_payload["isInternal"] is False  # não é mutado pelo envio
+
+def test_missing_variable_sends_raw_text(caplog):
+    message = CompiledMessage("com_saldo", {"text": "R$ {valor}"})
+
+    assert message.render({}) == "R$ {valor}"
+    assert "Falta variável" in caplog.text
+
+@pytest.mark.parametrize("catalog", [
+    {"pedir_cpf": {"text": "Oi {nome}, seu CPF?"}},            # variável que o código não fornece
+    {"com_saldo": {"text": "R$ {valor} em {data}"}},          # variável de outra mensagem
+    {"com_saldo": {"text": "R$ {valor"}},                     # chave desbalanceada
+    {"com_saldo": {"text": "R$ {0}"}},                        # posicional
+])
+def test_broken_catalogs_are_rejected(catalog):
+    with pytest.raises(TemplateError):
+        compile_catalog(catalog)
+
+def test_lenient_mode_sends_broken_template_as_literal():
+    compiled = compile_catalog({"pedir_cpf": {"text": "Oi {nome}"}}, strict=False)
+    assert compiled["pedir_cpf"].render({"nome": "x"}) == "Oi {nome}"
+
+def test_shipped_messages_json_honours_the_contract():
+    import app.services.bot.content.message_loader as loader
+    path = os.path.join(os.path.dirname(loader.__file__), "messages.json")
+    with open(path, encoding="utf-8") as f:
+        compile_catalog(json.load(f))
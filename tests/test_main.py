@@ -1,18 +1,35 @@
+import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 
 client = TestClient(app)
 
-def test_admin_refresh_success(mock_redis):
-    """Deve funcionar com o token correto"""
+def test_admin_refresh_success(mocker):
+    """Deve funcionar com o token correto: baixa uma vez e publica com versão"""
+    catalog = {"menu_bem_vindo": {"text": "Olá!"}}
+    fetch = mocker.patch("app.main.MessageLoader.fetch_remote", return_value=catalog)
+    publish = mocker.patch("app.main.MessageLoader.publish", return_value="7")
+
     response = client.post(
         "/admin/refresh-messages",
         headers={"x-admin-token": "TEST_SECRET_TOKEN"} # Igual ao conftest.py
     )
     assert response.status_code == 200
     assert response.json()["status"] == "success"
-    # Verifica se chamou o redis.delete
-    mock_redis.delete.assert_called_with("bot:content:messages")
+    assert response.json()["version"] == "7"
+    fetch.assert_called_once()
+    publish.assert_called_once_with(catalog)
+
+def test_admin_refresh_rejects_invalid_catalog(fake_redis, mocker):
+    """Catálogo quebrado nunca é publicado"""
+    mocker.patch("app.main.MessageLoader.fetch_remote", return_value={"menu_bem_vindo": "texto solto"})
+
+    response = client.post(
+        "/admin/refresh-messages",
+        headers={"x-admin-token": "TEST_SECRET_TOKEN"}
+    )
+    assert response.json()["status"] == "error"
+    assert not fake_redis.exists("bot:content:messages")
 
 def test_admin_refresh_unauthorized_no_token():
     """Deve falhar (401/422) se não enviar o header"""
@@ -27,4 +44,40 @@ def test_admin_refresh_unauthorized_wrong_token():
         headers={"x-admin-token": "SENHA_ERRADA"}
     )
     assert response.status_code == 401
-    assert "inválido" in response.json()["detail"]
\ No newline at end of file
+    assert "inválido" in response.json()["detail"]
+
+def test_admin_purge_saldo_cache(fake_redis):
+    """Purga o saldo cacheado de um CPF"""
+    from app.integrations.facta.fgts.saldo_cache import SaldoCache
+    SaldoCache().set("12345678909", {"status": "SEM_AUTORIZACAO"})
+
+    response = client.post(
+        "/admin/purge-saldo-cache",
+        params={"cpf": "123.456.789-09"},
+        headers={"x-admin-token": "TEST_SECRET_TOKEN"}
+    )
+    assert response.json() == {"status": "success", "removed": 1}
+    assert SaldoCache().get("12345678909") is None
+
+def test_api_does_not_start_without_cpf_hash_secret(monkeypatch, mocker):
+    """Sem o segredo o hash do CPF nas chaves do Redis seria reversível"""
+    mocker.patch("app.main.MessageLoader.start_listener")
+    monkeypatch.delenv("CPF_HASH_SECRET")
+
+    with pytest.raises(ValueError, match="CPF_HASH_SECRET"):
+        with TestClient(app):
+            pass
+
+def test_admin_replay_outbox_dead(fake_redis, mocker):
+    """Devolve a dead letter da outbox para os chats e dispara a drenagem"""
+    from app.services.bot.outbox import Outbox
+    dispatch = mocker.patch.object(Outbox, "dispatch")
+    fake_redis.lpush(Outbox.DEAD_KEY, '{"id":"7:0","op":"send_message","args":[7,"menu_bem_vindo"],"kwargs":{},"priority":"high","chat_id":7,"error":"huggy fora","dead_at":1}')
+
+    response = client.post(
+        "/admin/replay-outbox-dead",
+        headers={"x-admin-token": "TEST_SECRET_TOKEN"}
+    )
+    assert response.json() == {"status": "success", "chats": [7]}
+    assert [c["op"] for c in Outbox().pending(7)] == ["send_message"]
+    dispatch.assert_called_once_with(7)
@@ -0,0 +1,71 @@
+import json
+import pytest
+from app import sync_messages
+from app.services.bot.content import artifact
+from app.services.bot.content.message_loader import MessageLoader
+from app.services.bot.content.templates import compile_catalog
+
+@pytest.fixture
+def shipped_catalog():
+    with open(sync_messages.OUTPUT_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def test_shipped_catalog_covers_every_key_used_in_code(shipped_catalog):
+    assert sync_messages.check(shipped_catalog) == []
+
+def test_pending_content_only_warns_until_published(shipped_catalog):
+    """Texto que ainda não está no Gist não é inventado no repositório: só aviso"""
+    from app.core.messages import PENDING_CONTENT_KEYS
+
+    assert sync_messages.pending_keys(shipped_catalog) == sorted(PENDING_CONTENT_KEYS)
+
+    for key in PENDING_CONTENT_KEYS:
+        shipped_catalog[key] = {"text": "publicado pelo dono do conteúdo {data}" if key == "aniversariante" else "ok"}
+    assert sync_messages.pending_keys(shipped_catalog) == []
+    assert sync_messages.check(shipped_catalog) == []
+
+def test_missing_and_empty_keys_are_reported(shipped_catalog, mocker):
+    del shipped_catalog["cpf_invalido"]
+    mocker.patch("app.core.timeouts.TIMEOUT_POLICES", {"X": {"message_key": ""}})
+
+    problems = sync_messages.check(shipped_catalog)
+
+    assert any("'cpf_invalido'" in p and "engine.py" in p for p in problems)
+    assert any("Chave vazia" in p and "TIMEOUT_POLICES[X]" in p for p in problems)
+
+def test_invalid_template_fails_the_build(shipped_catalog):
+    shipped_catalog["pedir_cpf"]["text"] = "Oi {nome}"
+    assert sync_messages.check(shipped_catalog)[0].startswith("Catálogo inválido")
+
+def test_artifact_round_trip_skips_parsing(shipped_catalog):
+    source = json.dumps(shipped_catalog).encode()
+    blob = artifact.dump(shipped_catalog, compile_catalog(shipped_catalog), digest=artifact.source_digest(source))
+
+    messages, compiled, digest = artifact.load(blob)
+
+    assert messages == shipped_catalog
+    assert digest == artifact.source_digest(source)
+    assert compiled["com_saldo"].fields == {"valor"}
+    assert compiled["com_saldo"].render({"valor": "1,00", "banco": "X"}).startswith("Realizei a simulação e *R$ 1,00*")
+
+def test_loader_prefers_fresh_artifact_and_ignores_stale(tmp_path, shipped_catalog, mocker):
+    json_path, bin_path = tmp_path / "messages.json", tmp_path / "messages.bin"
+    json_path.write_text(json.dumps(shipped_catalog), encoding="utf-8")
+    bin_path.write_bytes(artifact.dump(shipped_catalog, compile_catalog(shipped_catalog),
+                                       digest=artifact.source_digest(json_path.read_bytes())))
+    mocker.patch.multiple(MessageLoader, _loaded=False, _local_messages={}, _local_compiled=None)
+
+    assert MessageLoader._load_artifact(str(json_path), str(bin_path)) is True
+    assert "com_saldo" in MessageLoader._local_compiled
+
+    # messages.json editado depois do build: artefato não vale mais
+    json_path.write_text(json.dumps({"x": {"text": "y"}}), encoding="utf-8")
+    assert MessageLoader._load_artifact(str(json_path), str(bin_path)) is False
+
+def test_artifact_from_other_python_is_rejected(shipped_catalog):
+    blob = artifact.dump(shipped_catalog, compile_catalog(shipped_catalog))
+    size = blob[len(artifact.MAGIC)]
+    tampered = artifact.MAGIC + bytes([4]) + b"2.99" + blob[len(artifact.MAGIC) + 1 + size:]
+
+    with pytest.raises(ValueError):
+        artifact.load(tampered)